@@ -0,0 +1,52 @@
+"""Tabela comandos (comandos enviados e tempos de resposta)
+
+Revision ID: 20261017_comandos
+Revises: 20261017_leituras_rollups
+Create Date: 2026-10-17 13:00:00
+
+Um registro por comando enviado a um dispositivo, com o id de correlação,
+o estado (enviado / confirmado / respondido / expirado / falhou) e os tempos
+até o PUBACK do broker e até a resposta do dispositivo. Mantida pelo
+rastreador de comandos (app/services/rastreio_comandos.py).
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017_comandos"
+down_revision: Union[str, None] = "20261017_leituras_rollups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "comandos",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+        sa.Column("dispositivo_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("usuario_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("acao", sa.String(), nullable=False),
+        sa.Column("topic", sa.String(), nullable=False),
+        sa.Column("payload", sa.String(), nullable=False),
+        sa.Column("qos", sa.SmallInteger(), nullable=False, server_default="0"),
+        sa.Column("estado", sa.String(), nullable=False),
+        sa.Column("enviado_em", sa.DateTime(), nullable=False),
+        sa.Column("confirmado_em", sa.DateTime(), nullable=True),
+        sa.Column("respondido_em", sa.DateTime(), nullable=True),
+        sa.Column("resposta", sa.String(), nullable=True),
+        sa.Column("broker_ms", sa.REAL(), nullable=True),
+        sa.Column("ida_volta_ms", sa.REAL(), nullable=True),
+        sa.Column("erro", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["dispositivo_id"], ["dispositivos.id"], name="comandos_dispositivo_id_fkey"),
+        sa.ForeignKeyConstraint(["usuario_id"], ["usuarios.id"], name="comandos_usuario_id_fkey"),
+    )
+    op.execute(
+        "CREATE INDEX ix_comandos_dispositivo_enviado ON comandos (dispositivo_id, enviado_em DESC)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_comandos_dispositivo_enviado", table_name="comandos")
+    op.drop_table("comandos")
@@ -0,0 +1,39 @@
+"""Índices (criado_em, id) para a paginação por cursor
+
+Revision ID: 20261017_indices_paginacao
+Revises: 20261017_comandos
+Create Date: 2026-10-17 14:00:00
+
+As listagens de usuários, lugares e dispositivos passaram a paginar por
+cursor em (criado_em, id) (app/core/paginacao.py). Com estes índices a
+comparação de linha `(criado_em, id) > cursor` + ORDER BY + LIMIT vira um
+range scan: qualquer página custa o mesmo que a primeira. Lugares e
+dispositivos ganham também a variante com o filtro usual na frente
+(usuario_id / lugar_id).
+"""
+from typing import Sequence, Union
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017_indices_paginacao"
+down_revision: Union[str, None] = "20261017_comandos"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDICES = (
+    ("ix_usuarios_criado_em_id", "usuarios", ["criado_em", "id"]),
+    ("ix_lugares_criado_em_id", "lugares", ["criado_em", "id"]),
+    ("ix_lugares_usuario_criado_em_id", "lugares", ["usuario_id", "criado_em", "id"]),
+    ("ix_dispositivos_criado_em_id", "dispositivos", ["criado_em", "id"]),
+    ("ix_dispositivos_lugar_criado_em_id", "dispositivos", ["lugar_id", "criado_em", "id"]),
+)
+
+
+def upgrade() -> None:
+    for nome, tabela, colunas in INDICES:
+        op.create_index(nome, tabela, colunas)
+
+
+def downgrade() -> None:
+    for nome, tabela, _ in reversed(INDICES):
+        op.drop_index(nome, table_name=tabela)
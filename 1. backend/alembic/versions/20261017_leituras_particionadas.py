@@ -0,0 +1,123 @@
+"""Particiona leituras por mês (RANGE em timestamp)
+
+Revision ID: 20261017_leituras_particionadas
+Revises: 20261017_leituras_tipadas
+Create Date: 2026-10-17 10:00:00
+
+Recria `leituras` como tabela particionada por mês, com uma partição
+`leituras_default` para o que cair fora das partições mensais. Cria as
+partições do mês da leitura mais antiga até 3 meses à frente; daí em diante
+quem cria/remove partições é app/services/particoes_leituras.py.
+
+Como a PK de tabela particionada precisa incluir a chave de partição, ela
+passa a ser (id, timestamp). O id vem de uma sequence, porque colunas
+identity em tabelas particionadas só existem a partir do Postgres 17.
+"""
+from typing import Sequence, Union
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017_leituras_particionadas"
+down_revision: Union[str, None] = "20261017_leituras_tipadas"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUNAS = "id, dispositivo_id, timestamp, umidade, temperatura, potencia, status, extras"
+
+
+def _renomear_tabela_atual(para: str) -> None:
+    op.rename_table("leituras", para)
+    op.execute(f"ALTER INDEX leituras_pkey RENAME TO {para}_pkey")
+    op.execute(f"ALTER INDEX ix_leituras_dispositivo_id RENAME TO ix_{para}_dispositivo_id")
+    op.execute(f"ALTER INDEX ix_leituras_timestamp RENAME TO ix_{para}_timestamp")
+    op.execute(
+        f"ALTER TABLE {para} RENAME CONSTRAINT leituras_dispositivo_id_fkey TO {para}_dispositivo_id_fkey"
+    )
+
+
+def upgrade() -> None:
+    _renomear_tabela_atual("leituras_antiga")
+    op.execute("ALTER SEQUENCE leituras_id_seq RENAME TO leituras_antiga_id_seq")
+
+    op.execute("CREATE SEQUENCE leituras_id_seq AS bigint")
+    op.execute(
+        """
+        CREATE TABLE leituras (
+            id bigint NOT NULL DEFAULT nextval('leituras_id_seq'),
+            dispositivo_id uuid NOT NULL,
+            "timestamp" timestamp without time zone NOT NULL DEFAULT NOW(),
+            umidade real,
+            temperatura real,
+            potencia smallint,
+            status smallint,
+            extras jsonb,
+            CONSTRAINT leituras_pkey PRIMARY KEY (id, "timestamp"),
+            CONSTRAINT leituras_dispositivo_id_fkey
+                FOREIGN KEY (dispositivo_id) REFERENCES dispositivos (id)
+        ) PARTITION BY RANGE ("timestamp")
+        """
+    )
+    op.execute("ALTER SEQUENCE leituras_id_seq OWNED BY leituras.id")
+
+    # partições mensais: do mês mais antigo com dados até 3 meses à frente
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            mes date := date_trunc('month', COALESCE((SELECT min("timestamp") FROM leituras_antiga), NOW()))::date;
+            ultimo date := (date_trunc('month', NOW()) + interval '3 months')::date;
+        BEGIN
+            WHILE mes <= ultimo LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF leituras FOR VALUES FROM (%L) TO (%L)',
+                    'leituras_p' || to_char(mes, 'YYYYMM'),
+                    mes,
+                    (mes + interval '1 month')::date
+                );
+                mes := (mes + interval '1 month')::date;
+            END LOOP;
+        END $$;
+        """
+    )
+    op.execute("CREATE TABLE leituras_default PARTITION OF leituras DEFAULT")
+
+    op.execute("CREATE INDEX ix_leituras_dispositivo_id ON leituras (dispositivo_id)")
+    op.execute('CREATE INDEX ix_leituras_timestamp ON leituras ("timestamp")')
+
+    op.execute(f"INSERT INTO leituras ({COLUNAS}) SELECT {COLUNAS} FROM leituras_antiga")
+    op.execute("SELECT setval('leituras_id_seq', COALESCE((SELECT max(id) FROM leituras), 0) + 1, false)")
+
+    op.execute("DROP TABLE leituras_antiga")
+
+
+def downgrade() -> None:
+    _renomear_tabela_atual("leituras_particionada")
+    op.execute("ALTER SEQUENCE leituras_id_seq RENAME TO leituras_particionada_id_seq")
+
+    op.execute(
+        """
+        CREATE TABLE leituras (
+            id bigint GENERATED BY DEFAULT AS IDENTITY,
+            dispositivo_id uuid NOT NULL,
+            "timestamp" timestamp without time zone NOT NULL DEFAULT NOW(),
+            umidade real,
+            temperatura real,
+            potencia smallint,
+            status smallint,
+            extras jsonb,
+            CONSTRAINT leituras_pkey PRIMARY KEY (id),
+            CONSTRAINT leituras_dispositivo_id_fkey
+                FOREIGN KEY (dispositivo_id) REFERENCES dispositivos (id)
+        )
+        """
+    )
+    op.execute(f"INSERT INTO leituras ({COLUNAS}) SELECT {COLUNAS} FROM leituras_particionada")
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('leituras', 'id'), "
+        "COALESCE((SELECT max(id) FROM leituras), 0) + 1, false)"
+    )
+    op.execute("CREATE INDEX ix_leituras_dispositivo_id ON leituras (dispositivo_id)")
+    op.execute('CREATE INDEX ix_leituras_timestamp ON leituras ("timestamp")')
+
+    # derruba a particionada com todas as partições
+    op.execute("DROP TABLE leituras_particionada CASCADE")
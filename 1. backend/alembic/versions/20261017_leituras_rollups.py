@@ -0,0 +1,111 @@
+"""Rollups de umidade de 1 minuto, 1 hora e 1 dia
+
+Revision ID: 20261017_leituras_rollups
+Revises: 20261017_leituras_ultimas
+Create Date: 2026-10-17 12:00:00
+
+Cria `leituras_rollup_1m`, `leituras_rollup_1h` e `leituras_rollup_1d`
+(min, max, soma, contagens e contagem dentro da faixa por dispositivo e
+bucket), mantidas daqui em diante pelo writer da ingestão
+(app/services/rollups_leituras.py), e preenche a partir do histórico:
+1m a partir de `leituras`, 1h a partir de 1m e 1d a partir de 1h.
+
+A faixa usada no preenchimento é a faixa atual do dispositivo, com a mesma
+regra de app/services/dispositivo_service.faixa_umidade.
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017_leituras_rollups"
+down_revision: Union[str, None] = "20261017_leituras_ultimas"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABELAS = ("leituras_rollup_1m", "leituras_rollup_1h", "leituras_rollup_1d")
+
+
+def _numero(expr: str) -> str:
+    return f"CASE WHEN jsonb_typeof({expr}) = 'number' THEN ({expr} #>> '{{}}')::float8 END"
+
+
+def _faixa(chave: str) -> str:
+    """
+    Primeiro valor não nulo entre config, config.controle e config.parametros;
+    não numérico vira NULL (não cai para o próximo nível).
+    """
+    niveis = [
+        ("true", f"d.config -> '{chave}'"),
+        ("jsonb_typeof(d.config -> 'controle') = 'object'", f"d.config -> 'controle' -> '{chave}'"),
+        ("jsonb_typeof(d.config -> 'parametros') = 'object'", f"d.config -> 'parametros' -> '{chave}'"),
+    ]
+    casos = " ".join(
+        f"WHEN {condicao} AND COALESCE(jsonb_typeof({expr}), 'null') <> 'null' THEN {_numero(expr)}"
+        for condicao, expr in niveis
+    )
+    return f"CASE {casos} END"
+
+
+def _criar_tabela(nome: str) -> None:
+    op.create_table(
+        nome,
+        sa.Column("dispositivo_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("leituras_total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("umidade_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("umidade_soma", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("umidade_min", sa.REAL(), nullable=True),
+        sa.Column("umidade_max", sa.REAL(), nullable=True),
+        sa.Column("dentro_faixa", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("faixa_min", sa.Float(), nullable=True),
+        sa.Column("faixa_max", sa.Float(), nullable=True),
+        sa.Column("faixa_mista", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.PrimaryKeyConstraint("dispositivo_id", "bucket", name=f"{nome}_pkey"),
+        sa.ForeignKeyConstraint(["dispositivo_id"], ["dispositivos.id"], name=f"{nome}_dispositivo_id_fkey"),
+    )
+
+
+def _reagrupar(origem: str, destino: str, unidade: str) -> None:
+    op.execute(
+        f"""
+        INSERT INTO {destino} (dispositivo_id, bucket, leituras_total, umidade_count, umidade_soma,
+                               umidade_min, umidade_max, dentro_faixa, faixa_min, faixa_max, faixa_mista)
+        SELECT dispositivo_id, date_trunc('{unidade}', bucket), sum(leituras_total), sum(umidade_count),
+               sum(umidade_soma), min(umidade_min), max(umidade_max), sum(dentro_faixa),
+               faixa_min, faixa_max, false
+        FROM {origem}
+        GROUP BY dispositivo_id, date_trunc('{unidade}', bucket), faixa_min, faixa_max
+        """
+    )
+
+
+def upgrade() -> None:
+    for nome in TABELAS:
+        _criar_tabela(nome)
+
+    op.execute(
+        f"""
+        INSERT INTO leituras_rollup_1m (dispositivo_id, bucket, leituras_total, umidade_count, umidade_soma,
+                                        umidade_min, umidade_max, dentro_faixa, faixa_min, faixa_max, faixa_mista)
+        SELECT l.dispositivo_id, date_trunc('minute', l."timestamp"), count(*), count(l.umidade),
+               COALESCE(sum(l.umidade::float8), 0), min(l.umidade), max(l.umidade),
+               count(*) FILTER (WHERE l.umidade BETWEEN f.faixa_min AND f.faixa_max),
+               f.faixa_min, f.faixa_max, false
+        FROM leituras l
+        JOIN (
+            SELECT d.id, {_faixa('umidadeMinima')} AS faixa_min, {_faixa('umidadeMaxima')} AS faixa_max
+            FROM dispositivos d
+        ) f ON f.id = l.dispositivo_id
+        GROUP BY l.dispositivo_id, date_trunc('minute', l."timestamp"), f.faixa_min, f.faixa_max
+        """
+    )
+    # dentro de um dispositivo a faixa é uma só, então o GROUP BY não duplica buckets
+    _reagrupar("leituras_rollup_1m", "leituras_rollup_1h", "hour")
+    _reagrupar("leituras_rollup_1h", "leituras_rollup_1d", "day")
+
+
+def downgrade() -> None:
+    for nome in reversed(TABELAS):
+        op.drop_table(nome)
@@ -0,0 +1,114 @@
+"""Leituras com colunas tipadas (umidade/temperatura/potencia/status) e id bigint
+
+Revision ID: 20261017_leituras_tipadas
+Revises: 20250924_init_schema
+Create Date: 2026-10-17 09:00:00
+
+A tabela antiga (id UUID + JSONB `dados`) é renomeada para `leituras_legado`
+e o conteúdo é copiado para a nova `leituras`, convertendo os campos
+conhecidos para colunas nativas. O que não puder ser convertido fica em
+`extras` (JSONB). O downgrade volta para a tabela antiga; leituras gravadas
+depois do upgrade não são copiadas de volta.
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017_leituras_tipadas"
+down_revision: Union[str, None] = "20250924_init_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# número em texto ("71.4", " 65 ", "70,5")
+_RE_NUMERO = r"'^\s*-?[0-9]+([.,][0-9]+)?\s*$'"
+_RE_INTEIRO = r"'^\s*-?[0-9]{1,5}\s*$'"
+
+
+def upgrade() -> None:
+    # 1) tira a tabela antiga do caminho (com índices e constraints)
+    op.rename_table("leituras", "leituras_legado")
+    op.execute("ALTER INDEX leituras_pkey RENAME TO leituras_legado_pkey")
+    op.execute("ALTER INDEX ix_leituras_id RENAME TO ix_leituras_legado_id")
+    op.execute("ALTER INDEX ix_leituras_dispositivo_id RENAME TO ix_leituras_legado_dispositivo_id")
+    op.execute("ALTER INDEX ix_leituras_timestamp RENAME TO ix_leituras_legado_timestamp")
+    op.execute(
+        "ALTER TABLE leituras_legado "
+        "RENAME CONSTRAINT leituras_dispositivo_id_fkey TO leituras_legado_dispositivo_id_fkey"
+    )
+
+    # 2) nova tabela tipada
+    op.create_table(
+        "leituras",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True, nullable=False),
+        sa.Column("dispositivo_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False, server_default=sa.text("NOW()")),
+        sa.Column("umidade", sa.REAL(), nullable=True),
+        sa.Column("temperatura", sa.REAL(), nullable=True),
+        sa.Column("potencia", sa.SmallInteger(), nullable=True),
+        sa.Column("status", sa.SmallInteger(), nullable=True),
+        sa.Column("extras", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.ForeignKeyConstraint(["dispositivo_id"], ["dispositivos.id"], name="leituras_dispositivo_id_fkey"),
+    )
+
+    # 3) backfill (mesma regra de models.leitura.colunas_de_dados)
+    op.execute(
+        f"""
+        INSERT INTO leituras (dispositivo_id, timestamp, umidade, temperatura, potencia, status, extras)
+        SELECT
+            dispositivo_id,
+            timestamp,
+            CASE WHEN umid_ok THEN replace(dados->>'umidade', ',', '.')::real END,
+            CASE WHEN temp_ok THEN replace(dados->>'temperatura', ',', '.')::real END,
+            CASE WHEN pot_ok THEN (dados->>'potencia')::smallint END,
+            status,
+            NULLIF(
+                dados
+                - (CASE WHEN umid_ok THEN 'umidade' ELSE '' END)
+                - (CASE WHEN temp_ok THEN 'temperatura' ELSE '' END)
+                - (CASE WHEN pot_ok THEN 'potencia' ELSE '' END)
+                - (CASE WHEN status IS NOT NULL THEN 'status' ELSE '' END),
+                '{{}}'::jsonb
+            )
+        FROM (
+            SELECT
+                dispositivo_id,
+                timestamp,
+                dados,
+                COALESCE(dados->>'umidade' ~ {_RE_NUMERO}, false) AS umid_ok,
+                COALESCE(dados->>'temperatura' ~ {_RE_NUMERO}, false) AS temp_ok,
+                CASE
+                    WHEN dados->>'potencia' ~ {_RE_INTEIRO}
+                    THEN abs((dados->>'potencia')::int) <= 32767
+                    ELSE false
+                END AS pot_ok,
+                CASE lower(trim(dados->>'status'))
+                    WHEN '1' THEN 1 WHEN 'ligado' THEN 1 WHEN 'on' THEN 1 WHEN 'true' THEN 1
+                    WHEN '0' THEN 0 WHEN 'desligado' THEN 0 WHEN 'off' THEN 0 WHEN 'false' THEN 0
+                END AS status
+            FROM leituras_legado
+        ) AS l
+        ORDER BY timestamp
+        """
+    )
+
+    op.create_index("ix_leituras_dispositivo_id", "leituras", ["dispositivo_id"], unique=False)
+    op.create_index("ix_leituras_timestamp", "leituras", ["timestamp"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_leituras_timestamp", table_name="leituras")
+    op.drop_index("ix_leituras_dispositivo_id", table_name="leituras")
+    op.drop_table("leituras")
+
+    op.execute(
+        "ALTER TABLE leituras_legado "
+        "RENAME CONSTRAINT leituras_legado_dispositivo_id_fkey TO leituras_dispositivo_id_fkey"
+    )
+    op.execute("ALTER INDEX ix_leituras_legado_timestamp RENAME TO ix_leituras_timestamp")
+    op.execute("ALTER INDEX ix_leituras_legado_dispositivo_id RENAME TO ix_leituras_dispositivo_id")
+    op.execute("ALTER INDEX ix_leituras_legado_id RENAME TO ix_leituras_id")
+    op.execute("ALTER INDEX leituras_legado_pkey RENAME TO leituras_pkey")
+    op.rename_table("leituras_legado", "leituras")
@@ -0,0 +1,64 @@
+"""Índice (dispositivo_id, timestamp DESC) e tabela leituras_ultimas
+
+Revision ID: 20261017_leituras_ultimas
+Revises: 20261017_leituras_particionadas
+Create Date: 2026-10-17 11:00:00
+
+- Troca o índice simples em dispositivo_id por um composto
+  (dispositivo_id, timestamp DESC, id DESC) INCLUDE (valores), que atende
+  "leituras do dispositivo ordenadas por tempo" sem sort.
+- Cria `leituras_ultimas` (uma linha por dispositivo), mantida pelo writer
+  da ingestão, e preenche com o último valor de cada coluna no histórico.
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017_leituras_ultimas"
+down_revision: Union[str, None] = "20261017_leituras_particionadas"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        'CREATE INDEX ix_leituras_dispositivo_timestamp ON leituras '
+        '(dispositivo_id, "timestamp" DESC, id DESC) '
+        'INCLUDE (umidade, temperatura, potencia, status)'
+    )
+    op.drop_index("ix_leituras_dispositivo_id", table_name="leituras")
+
+    op.create_table(
+        "leituras_ultimas",
+        sa.Column("dispositivo_id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("umidade", sa.REAL(), nullable=True),
+        sa.Column("temperatura", sa.REAL(), nullable=True),
+        sa.Column("potencia", sa.SmallInteger(), nullable=True),
+        sa.Column("status", sa.SmallInteger(), nullable=True),
+        sa.Column("extras", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.ForeignKeyConstraint(["dispositivo_id"], ["dispositivos.id"], name="leituras_ultimas_dispositivo_id_fkey"),
+    )
+
+    op.execute(
+        """
+        INSERT INTO leituras_ultimas (dispositivo_id, "timestamp", umidade, temperatura, potencia, status)
+        SELECT
+            dispositivo_id,
+            max("timestamp"),
+            (array_agg(umidade ORDER BY "timestamp" DESC) FILTER (WHERE umidade IS NOT NULL))[1],
+            (array_agg(temperatura ORDER BY "timestamp" DESC) FILTER (WHERE temperatura IS NOT NULL))[1],
+            (array_agg(potencia ORDER BY "timestamp" DESC) FILTER (WHERE potencia IS NOT NULL))[1],
+            (array_agg(status ORDER BY "timestamp" DESC) FILTER (WHERE status IS NOT NULL))[1]
+        FROM leituras
+        GROUP BY dispositivo_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("leituras_ultimas")
+    op.create_index("ix_leituras_dispositivo_id", "leituras", ["dispositivo_id"], unique=False)
+    op.drop_index("ix_leituras_dispositivo_timestamp", table_name="leituras")
@@ -1,36 +1,58 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app.core.deps import get_db, get_usuario_logado
-from app.core.security import verificar_senha, criar_token_acesso, gerar_hash_senha
+from app.core.cache_usuarios import cache_usuarios
+from app.core.deps import get_db, get_usuario_logado_db
+from app.core.pool_senhas import PoolSenhasOcupado, pool_senhas
+from app.core.security import criar_token_acesso
 from app.models.usuario import Usuario
 from app.schemas.token import Token
 from app.schemas.usuario import UsuarioOut, UsuarioUpdateMe, AlterarSenhaRequest
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
+def _buscar_por_email(db: Session, email: str):
+    return db.query(Usuario).filter(Usuario.email == email).first()
+
+def _gravar_novo_hash(db: Session, usuario: Usuario, senha_hash: str) -> None:
+    usuario.senha_hash = senha_hash
+    db.commit()
+
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    """
+    Async de propósito: o bcrypt roda no pool de senhas e o request só espera
+    o resultado, sem ocupar uma thread da API. As consultas vão pro threadpool.
+    """
     # username=email (padrão OAuth2)
-    usuario = db.query(Usuario).filter(Usuario.email == form_data.username).first()
-    if not usuario or not verificar_senha(form_data.password, usuario.senha_hash):
+    usuario = await run_in_threadpool(_buscar_por_email, db, form_data.username)
+    if not usuario or not await pool_senhas.verificar(form_data.password, usuario.senha_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciais inválidas")
     if getattr(usuario, "ativo", True) is False:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuário inativo")
 
+    # BCRYPT_ROUNDS mudou desde que a senha foi gravada: refaz o hash com o custo atual
+    if pool_senhas.precisa_rehash(usuario.senha_hash):
+        try:
+            novo_hash = await pool_senhas.gerar_hash(form_data.password)
+            await run_in_threadpool(_gravar_novo_hash, db, usuario, novo_hash)
+        except PoolSenhasOcupado:
+            pass    # fica para o próximo login
+
     # role no token (opcional, útil em clients)
     token = criar_token_acesso(sub=str(usuario.id), extra={"role": getattr(usuario, "role", None)})
     return {"access_token": token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UsuarioOut)
-def me(usuario: Usuario = Depends(get_usuario_logado)):
+def me(usuario: Usuario = Depends(get_usuario_logado_db)):
     return usuario
 
 @router.put("/me", response_model=UsuarioOut)
 def atualizar_me(
     dados: UsuarioUpdateMe,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado),
+    usuario_logado: Usuario = Depends(get_usuario_logado_db),
 ):
     """
     Atualiza dados básicos do usuário logado (nome e, opcionalmente, e-mail).
@@ -61,6 +83,7 @@ def atualizar_me(
 
     db.add(usuario_logado)
     db.commit()
+    cache_usuarios.invalidar(usuario_logado.id)
     db.refresh(usuario_logado)
     return usuario_logado
 
@@ -68,7 +91,7 @@ def atualizar_me(
 def alterar_senha(
     body: AlterarSenhaRequest,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado),
+    usuario_logado: Usuario = Depends(get_usuario_logado_db),
 ):
     """
     Altera a senha do usuário logado.
@@ -76,7 +99,7 @@ def alterar_senha(
     - Gera hash da nova senha
     """
     # 1) Verifica senha atual
-    if not verificar_senha(body.senha_atual, usuario_logado.senha_hash):
+    if not pool_senhas.verificar_sync(body.senha_atual, usuario_logado.senha_hash):
         raise HTTPException(status_code=400, detail="Senha atual incorreta.")
 
     # 2) validar política de senha
@@ -93,10 +116,11 @@ def alterar_senha(
         )
 
     # 3) Atualiza hash
-    usuario_logado.senha_hash = gerar_hash_senha(body.nova_senha)
+    usuario_logado.senha_hash = pool_senhas.gerar_hash_sync(body.nova_senha)
 
     db.add(usuario_logado)
     db.commit()
+    cache_usuarios.invalidar(usuario_logado.id)
 
     return {"detail": "Senha alterada com sucesso."}
 
@@ -1,53 +1,50 @@
-
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 
+from app.core.cache_usuarios import UsuarioAutenticado
 from app.core.deps import get_db, get_usuario_logado
 from app.models.usuario import Usuario
 from app.models.lugar import Lugar
 from app.models.dispositivo import Dispositivo
 from app.schemas.dashboard import ResumoDashboard
+from app.services.cache_dashboard import CHAVE_ADMIN, cache_dashboard
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
-@router.get("/resumo", response_model=ResumoDashboard)
-def obter_resumo_dashboard(
-    db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado)
-):
+
+def calcular_resumo(db: Session, usuario_logado: UsuarioAutenticado) -> ResumoDashboard:
     """
-    Retorna os contadores do dashboard.
-    - ADMIN: visão geral do sistema
-    - CLIENTE: apenas dados do próprio tenant/usuário
+    Os contadores numa consulta só: online / offline agregados com FILTER
+    sobre os dispositivos e lugares / clientes como subconsultas escalares.
     """
-
     is_admin = (usuario_logado.role or "").upper() == "ADMIN"
 
-    # Base queries
-    q_usuarios  = db.query(func.count(Usuario.id)).filter(Usuario.ativo == True)
-    q_lugares   = db.query(func.count(Lugar.id)).filter(Lugar.ativo == True)
-    q_disp_on   = db.query(func.count(Dispositivo.id)).filter(Dispositivo.ativo == True, Dispositivo.status == "online")
-    q_disp_off  = db.query(func.count(Dispositivo.id)).filter(Dispositivo.ativo == True, Dispositivo.status != "online")
+    q_lugares = select(func.count(Lugar.id)).where(Lugar.ativo == True)
+    q = select(
+        func.count(Dispositivo.id).filter(Dispositivo.status == "online"),
+        func.count(Dispositivo.id).filter(Dispositivo.status != "online"),
+    ).where(Dispositivo.ativo == True)
 
     if not is_admin:
         # Escopo por cliente (usuario_logado)
-        q_lugares   = q_lugares.filter(Lugar.usuario_id == usuario_logado.id)
-        q_disp_on   = q_disp_on.join(Lugar, Lugar.id == Dispositivo.lugar_id).filter(Lugar.usuario_id == usuario_logado.id)
-        q_disp_off  = q_disp_off.join(Lugar, Lugar.id == Dispositivo.lugar_id).filter(Lugar.usuario_id == usuario_logado.id)
+        q_lugares = q_lugares.where(Lugar.usuario_id == usuario_logado.id)
+        q = q.join(Lugar, Lugar.id == Dispositivo.lugar_id).where(Lugar.usuario_id == usuario_logado.id)
+        q = q.add_columns(q_lugares.scalar_subquery())
+
+        dispositivos_online, dispositivos_offline, lugares_ativos = db.execute(q).one()
 
         # Para clientes, "clientes ativos" = 1 (ele mesmo) se ativo; senão 0
         clientes_ativos = 1 if usuario_logado.ativo else 0
     else:
         # Para admin, conta apenas usuários com role CLIENTE (case-insensitive)
-        clientes_ativos = db.query(func.count(Usuario.id)).filter(
+        q_clientes = select(func.count(Usuario.id)).where(
             Usuario.ativo == True,
             func.lower(Usuario.role) == "cliente"
-        ).scalar()
+        )
+        q = q.add_columns(q_lugares.scalar_subquery(), q_clientes.scalar_subquery())
 
-    lugares_ativos      = q_lugares.scalar()
-    dispositivos_online = q_disp_on.scalar()
-    dispositivos_offline= q_disp_off.scalar()
+        dispositivos_online, dispositivos_offline, lugares_ativos, clientes_ativos = db.execute(q).one()
 
     return ResumoDashboard(
         clientes_ativos=clientes_ativos or 0,
@@ -55,3 +52,25 @@ def obter_resumo_dashboard(
         dispositivos_online=dispositivos_online or 0,
         dispositivos_offline=dispositivos_offline or 0
     )
+
+
+@router.get("/resumo", response_model=ResumoDashboard)
+def obter_resumo_dashboard(
+    db: Session = Depends(get_db),
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado)
+):
+    """
+    Retorna os contadores do dashboard.
+    - ADMIN: visão geral do sistema
+    - CLIENTE: apenas dados do próprio tenant/usuário
+
+    Cacheado por tenant por DASHBOARD_CACHE_TTL_S (invalidado quando
+    usuários, lugares ou dispositivos são criados / removidos).
+    """
+    is_admin = (usuario_logado.role or "").upper() == "ADMIN"
+    chave = CHAVE_ADMIN if is_admin else str(usuario_logado.id)
+    resumo = cache_dashboard.buscar(chave)
+    if resumo is None:
+        resumo = calcular_resumo(db, usuario_logado)
+        cache_dashboard.guardar(chave, resumo)
+    return resumo
@@ -1,32 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session, joinedload
 from uuid import UUID
 from typing import List, Optional, Dict, Any, Tuple
 from pydantic import BaseModel
-import paho.mqtt.client as mqtt
 
 from app.models.dispositivo import Dispositivo
 from app.models.lugar import Lugar
-from app.models.usuario import Usuario
-from app.schemas.dispositivo import DispositivoCreate, DispositivoOut, DispositivoComandoIn, DispositivoUpdateLugar
+from app.models.comando import Comando
+from app.core.cache_usuarios import UsuarioAutenticado
+from app.schemas.dispositivo import (
+    DispositivoCreate,
+    DispositivoOut,
+    DispositivoComandoIn,
+    DispositivosComandoLoteIn,
+    DispositivoUpdateLugar,
+    EstadoDispositivoOut,
+)
+from app.schemas.comando import ComandoOut
+from app.core.config import settings
 from app.core.deps import get_usuario_logado, get_db
+from app.core.paginacao import anunciar_proximo, fechar_pagina, paginar_keyset
+from app.services.dispositivo_service import extrair_umidades
+from app.services.cache_dashboard import cache_dashboard
+from app.services.estado_dispositivos import estado_dispositivos
+from app.services.mqtt_publisher import MqttIndisponivel, MqttTimeout, publicador_mqtt
+from app.services.rastreio_comandos import rastreio_comandos
+from app.services.roteamento_dispositivos import base_topic_de, expressao_base_topic, indice_roteamento
 
 router = APIRouter(prefix="/dispositivos", tags=["dispositivos"])
 
-MQTT_HOST = "broker.hivemq.com"
-MQTT_PORT = 1883
-
-mqtt_client = mqtt.Client()
-
-def publish_mqtt(topic: str, payload: str, retain: bool = False):
-    """
-    Publica uma mensagem MQTT no broker configurado.
-    Mantém um único client global bem simples.
-    """
-    if not mqtt_client.is_connected():
-        mqtt_client.connect(MQTT_HOST, MQTT_PORT, 60)
-    mqtt_client.publish(topic, payload, retain=retain)
-
 def extrair_topic_comando(config: Dict[str, Any]) -> Optional[str]:
     """
     Tenta descobrir o tópico de comando a partir do JSON de config do dispositivo.
@@ -62,42 +64,81 @@ def extrair_topic_comando(config: Dict[str, Any]) -> Optional[str]:
 
     return None
 
-def _extrair_umidades(config: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
+def resolver_comando(tipo: Optional[str], config: Optional[Dict[str, Any]], acao: str) -> Tuple[str, str]:
     """
-    Tenta extrair umidadeMinima / umidadeMaxima do JSON de config.
-
-    Procura nesses lugares, nessa ordem:
-      1) config["umidadeMinima"] / config["umidadeMaxima"]
-      2) config["controle"]["umidadeMinima"] / ["umidadeMaxima"]
-      3) config["parametros"]["umidadeMinima"] / ["umidadeMaxima"]
+    (tópico, payload) MQTT de uma ação para um dispositivo, de acordo com o
+    tipo e o firmware. HTTPException 400 se o tipo não aceita comandos, se
+    falta o tópico no config ou se a ação é inválida para o tipo.
     """
-    umid_min = None
-    umid_max = None
-
-    # 1) raiz
-    if "umidadeMinima" in config:
-        umid_min = config["umidadeMinima"]
-    if "umidadeMaxima" in config:
-        umid_max = config["umidadeMaxima"]
-
-    # 2) controle
-    controle = config.get("controle")
-    if isinstance(controle, dict):
-        if umid_min is None and "umidadeMinima" in controle:
-            umid_min = controle["umidadeMinima"]
-        if umid_max is None and "umidadeMaxima" in controle:
-            umid_max = controle["umidadeMaxima"]
-
-    # 3) parametros
-    parametros = config.get("parametros")
-    if isinstance(parametros, dict):
-        if umid_min is None and "umidadeMinima" in parametros:
-            umid_min = parametros["umidadeMinima"]
-        if umid_max is None and "umidadeMaxima" in parametros:
-            umid_max = parametros["umidadeMaxima"]
-
-    return umid_min, umid_max
+    cfg = config or {}
+    tipo = (tipo or "").strip()
+    acao_norm = acao.strip().lower()
+
+    # Descobre o tópico de comando
+    topic_cmd: Optional[str] = None
+
+    if tipo == "umidificador_3p":
+        # 1) tenta pegar do config
+        topic_cmd = extrair_topic_comando(cfg)
+        # 2) se não tiver nada configurado, usa o tópico fixo
+        if not topic_cmd:
+            topic_cmd = "alissondev007/umidificador/comando"
+
+    elif tipo == "tomada_inteligente":
+        # Para a tomada, cada dispositivo tem seu baseTopic próprio,
+        # então aqui a config PRECISA ter isso preenchido
+        topic_cmd = extrair_topic_comando(cfg)
+        if not topic_cmd:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    "Config MQTT do dispositivo não possui tópico de comando. "
+                    "Para 'tomada_inteligente', preencha config.mqtt.baseTopic "
+                    "ou config.mqtt.topics.comando."
+                ),
+            )
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo de dispositivo '{tipo}' não suporta envio de comandos via API.",
+        )
+
+    # Mapeia acao -> payload MQTT de acordo com o firmware
+    payload: str
+
+    if tipo == "tomada_inteligente":
+        # Firmware da tomada inteligente espera:
+        #   "LIGAR" / "DESLIGAR" no tópico /comando
+        if acao_norm in ("ativar", "ligar", "on"):
+            payload = "LIGAR"
+        elif acao_norm in ("desativar", "desligar", "off"):
+            payload = "DESLIGAR"
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail="Ação inválida para tomada_inteligente. Use 'ativar', 'ligar' ou 'desligar'.",
+            )
+
+    elif tipo == "umidificador_3p":
+        # Firmware de 3 potências espera:
+        #   "ativar", "desligar", "potencia1", "potencia2", "potencia3"
+        if acao_norm in ("ativar", "desligar", "potencia1", "potencia2", "potencia3"):
+            payload = acao_norm
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    "Ação inválida para umidificador_3p. "
+                    "Use 'ativar', 'desligar', 'potencia1', 'potencia2' ou 'potencia3'."
+                ),
+            )
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo de dispositivo '{tipo}' não suporta envio de comandos via API.",
+        )
 
+    return topic_cmd, payload
 
 def validar_config_por_tipo(tipo: str, config: Optional[Dict[str, Any]]) -> None:
     """
@@ -113,7 +154,7 @@ def validar_config_por_tipo(tipo: str, config: Optional[Dict[str, Any]]) -> None
     config = config or {}
 
     if tipo in ("tomada_inteligente", "umidificador_3p"):
-        umid_min, umid_max = _extrair_umidades(config)
+        umid_min, umid_max = extrair_umidades(config)
 
         if umid_min is None or umid_max is None:
             raise HTTPException(
@@ -162,12 +203,30 @@ def validar_config_por_tipo(tipo: str, config: Optional[Dict[str, Any]]) -> None
         return
 
 
+def _garantir_base_topic_livre(
+    db: Session, tipo: Optional[str], config: Optional[Dict[str, Any]], dispositivo_id: Optional[UUID] = None
+) -> None:
+    """
+    Dois dispositivos ativos com o mesmo base_topic receberiam as mesmas
+    mensagens; a ingestão só entrega para um (o mais antigo), então o
+    segundo é recusado já no cadastro.
+    """
+    base = base_topic_de(tipo, config)
+    if not base:
+        return
+    q = db.query(Dispositivo.id).filter(Dispositivo.ativo == True, expressao_base_topic() == base)
+    if dispositivo_id is not None:
+        q = q.filter(Dispositivo.id != dispositivo_id)
+    if q.first() is not None:
+        raise HTTPException(status_code=400, detail=f"Já existe um dispositivo ativo com o tópico MQTT '{base}'.")
+
+
 #Criar novo dispositivo vinculado a um lugar
 @router.post("/", response_model=DispositivoOut)
 def criar_dispositivo(
     dispositivo: DispositivoCreate,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado)
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado)
 ):
     # Admin pode criar para qualquer cliente/lugar ativo
     if usuario_logado.role == "ADMIN":
@@ -189,6 +248,7 @@ def criar_dispositivo(
 
     #Validações específicas por tipo (opcional)
     #validar_config_por_tipo(dispositivo.tipo, dispositivo.config)
+    _garantir_base_topic_livre(db, dispositivo.tipo, dispositivo.config)
 
     novo = Dispositivo(
         nome=dispositivo.nome,
@@ -203,17 +263,26 @@ def criar_dispositivo(
     db.add(novo)
     db.commit()
     db.refresh(novo)
+    indice_roteamento.atualizar_dispositivo(novo)
+    cache_dashboard.invalidar(lugar.usuario_id)
     return novo
 
 
 
 @router.get("/", response_model=List[DispositivoOut])
 def listar_dispositivos(
+    response: Response,
     lugar_id: Optional[UUID] = Query(None, description="Filtra por lugar (opcional)"),
     tipo: Optional[str] = Query(None, description="Filtra por tipo (opcional)"),
+    limite: int = Query(500, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor da página seguinte (header X-Proximo-Cursor)"),
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(get_usuario_logado),
+    usuario: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
+    """
+    Dispositivos na ordem de cadastro, paginados por (criado_em, id): o
+    header X-Proximo-Cursor traz o cursor da próxima página (ausente na última).
+    """
     q = (
         db.query(Dispositivo)
         .join(Dispositivo.lugar)  # 👈 FAZ O JOIN COM LUGAR
@@ -233,7 +302,58 @@ def listar_dispositivos(
     if tipo:
         q = q.filter(Dispositivo.tipo == tipo)
 
-    return q.all()
+    q = paginar_keyset(q, Dispositivo.criado_em, Dispositivo.id, cursor, limite, decrescente=False)
+
+    itens, proximo = fechar_pagina(q.all(), limite, lambda d: (d.criado_em, d.id))
+    anunciar_proximo(response, proximo)
+    return itens
+
+
+
+def _etag_confere(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+@router.get("/estado", response_model=List[EstadoDispositivoOut])
+def estado_dos_dispositivos(
+    request: Request,
+    response: Response,
+    lugar_id: Optional[UUID] = Query(None, description="Filtra por lugar (opcional)"),
+    db: Session = Depends(get_db),
+    usuario: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    """
+    Estado atual (umidade, status, potência, visto_em) de todos os dispositivos
+    que o usuário enxerga, numa resposta só, a partir do estado ao vivo em memória.
+
+    Com ETag: mandando o último em If-None-Match, a resposta é 304 sem corpo
+    enquanto nenhum desses dispositivos receber mensagem nova.
+    """
+    q = db.query(Dispositivo.id).filter(Dispositivo.ativo == True)
+
+    # Cliente só enxerga dispositivos dos lugares dele
+    if usuario.role != "ADMIN":
+        q = q.join(Dispositivo.lugar).filter(Lugar.usuario_id == usuario.id)
+
+    if lugar_id:
+        q = q.filter(Dispositivo.lugar_id == lugar_id)
+
+    ids = [dispositivo_id for (dispositivo_id,) in q.order_by(Dispositivo.id).all()]
+    estados, etag = estado_dispositivos.ler(ids)
+
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_confere(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos)
+
+    response.headers.update(cabecalhos)
+    return estados
 
 
 
@@ -241,7 +361,7 @@ def listar_dispositivos(
 def obter_dispositivo(
     dispositivo_id: UUID,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(get_usuario_logado),
+    usuario: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
     q = (
         db.query(Dispositivo)
@@ -277,7 +397,7 @@ def atualizar_dispositivo(
     dispositivo_id: UUID,
     dispositivo_in: DispositivoCreate,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado)
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado)
 ):
     q = db.query(Dispositivo).join(Dispositivo.lugar).options(
         joinedload(Dispositivo.lugar).joinedload(Lugar.usuario)
@@ -295,6 +415,9 @@ def atualizar_dispositivo(
 
     # Validação por tipo novamente (caso mude config/tipo)
     #validar_config_por_tipo(dispositivo_in.tipo, dispositivo_in.config)
+    # só quando o tópico muda: um duplicado antigo continua editável
+    if base_topic_de(dispositivo_in.tipo, dispositivo_in.config) != base_topic_de(dispositivo.tipo, dispositivo.config):
+        _garantir_base_topic_livre(db, dispositivo_in.tipo, dispositivo_in.config, dispositivo.id)
 
     # Atualiza campos principais
     dispositivo.nome = dispositivo_in.nome
@@ -306,6 +429,8 @@ def atualizar_dispositivo(
 
     db.commit()
     db.refresh(dispositivo)
+    indice_roteamento.atualizar_dispositivo(dispositivo)
+    cache_dashboard.limpar()    # pode ter mudado de lugar (e de dono) ou de status
     return dispositivo
 
 
@@ -316,12 +441,18 @@ def atualizar_dispositivo(
 def enviar_comando_dispositivo(
     dispositivo_id: UUID,
     comando: DispositivoComandoIn,
+    aguardar_ack: bool = Query(False, description="Espera a confirmação (PUBACK) do broker"),
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(get_usuario_logado),
+    usuario: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
     """
     Recebe uma ação de comando vinda do frontend e repassa para o dispositivo via MQTT.
 
+    Publica pelo publicador compartilhado (QoS MQTT_COMANDO_QOS) e responde
+    assim que a mensagem sai; com `aguardar_ack=true`, espera o PUBACK do
+    broker até MQTT_PUBLICAR_TIMEOUT_S (504 se não vier; o comando já saiu e
+    continua pendente no rastreio). Sem conexão com o broker, 503.
+
     Ação esperada (comando.acao):
       - Para tomada_inteligente:
           "ativar", "ligar", "desligar"
@@ -351,102 +482,219 @@ def enviar_comando_dispositivo(
             detail="Dispositivo não encontrado ou não pertence ao usuário",
         )
 
-    # 2) Descobre tópico de comando a partir do config
-    cfg = dispositivo.config or {}
-    tipo = (dispositivo.tipo or "").strip()
-    acao_norm = comando.acao.strip().lower()
-
-    # Descobre o tópico de comando
-    topic_cmd: Optional[str] = None
-
-    if tipo == "umidificador_3p":
-        # 1) tenta pegar do config
-        topic_cmd = extrair_topic_comando(cfg)
-        # 2) se não tiver nada configurado, usa o tópico fixo
-        if not topic_cmd:
-            topic_cmd = "alissondev007/umidificador/comando"
-
-    elif tipo == "tomada_inteligente":
-        # Para a tomada, cada dispositivo tem seu baseTopic próprio,
-        # então aqui a config PRECISA ter isso preenchido
-        topic_cmd = extrair_topic_comando(cfg)
-        if not topic_cmd:
-            raise HTTPException(
-                status_code=400,
-                detail=(
-                    "Config MQTT do dispositivo não possui tópico de comando. "
-                    "Para 'tomada_inteligente', preencha config.mqtt.baseTopic "
-                    "ou config.mqtt.topics.comando."
-                ),
-            )
-    else:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Tipo de dispositivo '{tipo}' não suporta envio de comandos via API.",
-        )
-
+    # 2) Descobre tópico e payload a partir do tipo / config
     tipo = (dispositivo.tipo or "").strip()
-    acao_norm = comando.acao.strip().lower()
-
-    # 3) Mapeia acao -> payload MQTT de acordo com o firmware
-    payload: str
-
-    if tipo == "tomada_inteligente":
-        # Firmware da tomada inteligente espera:
-        #   "LIGAR" / "DESLIGAR" no tópico /comando
-        if acao_norm in ("ativar", "ligar", "on"):
-            payload = "LIGAR"
-        elif acao_norm in ("desativar", "desligar", "off"):
-            payload = "DESLIGAR"
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Ação inválida para tomada_inteligente. Use 'ativar', 'ligar' ou 'desligar'.",
-            )
-
-    elif tipo == "umidificador_3p":
-        # Firmware de 3 potências espera:
-        #   "ativar", "desligar", "potencia1", "potencia2", "potencia3"
-        if acao_norm in ("ativar", "desligar", "potencia1", "potencia2", "potencia3"):
-            payload = acao_norm
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=(
-                    "Ação inválida para umidificador_3p. "
-                    "Use 'ativar', 'desligar', 'potencia1', 'potencia2' ou 'potencia3'."
-                ),
-            )
-    else:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Tipo de dispositivo '{tipo}' não suporta envio de comandos via API.",
-        )
+    topic_cmd, payload = resolver_comando(tipo, dispositivo.config, comando.acao)
 
-    # 4) Publica no MQTT
+    # 3) Publica no MQTT (o registro do comando é gravado em lote pelo rastreador)
+    registro = rastreio_comandos.novo(
+        dispositivo_id, usuario.id, comando.acao, topic_cmd, payload, publicador_mqtt.qos
+    )
     try:
-        publish_mqtt(topic_cmd, payload, retain=False)
+        resultado = publicador_mqtt.publicar(topic_cmd, payload, retain=False, aguardar_ack=aguardar_ack)
+    except MqttIndisponivel as e:
+        rastreio_comandos.falhou(registro, str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except MqttTimeout as e:
+        # publicado, só o PUBACK não veio a tempo: o comando segue pendente
+        # (um PUBACK atrasado ou a resposta do dispositivo ainda o fecham)
+        rastreio_comandos.enviado(registro, e.resultado)
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
+        rastreio_comandos.falhou(registro, str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Falha ao publicar comando no MQTT: {e}",
         )
+    rastreio_comandos.enviado(registro, resultado)
 
     return {
         "ok": True,
+        "comando_id": registro.id,
         "dispositivo_id": dispositivo_id,
         "tipo": tipo,
         "acao_recebida": comando.acao,
         "payload_enviado": payload,
         "topic": topic_cmd,
+        "qos": resultado.qos,
+        "confirmado": resultado.confirmado,
     }
 
+@router.post("/comandos")
+def enviar_comando_em_lote(
+    comando: DispositivosComandoLoteIn,
+    aguardar_ack: bool = Query(False, description="Espera a confirmação (PUBACK) do broker"),
+    db: Session = Depends(get_db),
+    usuario: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    """
+    Envia a mesma ação para vários dispositivos de uma vez: uma lista de ids,
+    todos de um lugar e/ou todos de um tipo (filtros combinados).
+
+    Os dispositivos, tópicos e payloads saem de uma consulta só; as
+    publicações vão em sequência, sem esperar ack entre uma e outra. A
+    resposta traz o resultado de cada dispositivo (um dispositivo inválido
+    não derruba o lote). Sem conexão com o broker, 503 para o lote todo.
+    """
+    if not comando.dispositivo_ids and not comando.lugar_id and not comando.tipo:
+        raise HTTPException(
+            status_code=400,
+            detail="Informe dispositivo_ids, lugar_id e/ou tipo.",
+        )
+    if comando.dispositivo_ids and len(comando.dispositivo_ids) > settings.COMANDOS_LOTE_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"No máximo {settings.COMANDOS_LOTE_MAX} dispositivos por chamada.",
+        )
+
+    # 1) Dispositivos alvo (só o necessário para resolver o comando)
+    q = (
+        db.query(Dispositivo.id, Dispositivo.tipo, Dispositivo.config)
+        .join(Dispositivo.lugar)
+        .filter(Dispositivo.ativo == True)
+    )
+    if usuario.role != "ADMIN":
+        q = q.filter(Lugar.usuario_id == usuario.id)
+    if comando.dispositivo_ids:
+        q = q.filter(Dispositivo.id.in_(comando.dispositivo_ids))
+    if comando.lugar_id:
+        q = q.filter(Dispositivo.lugar_id == comando.lugar_id)
+    if comando.tipo:
+        q = q.filter(Dispositivo.tipo == comando.tipo)
+
+    alvos = q.order_by(Dispositivo.id).limit(settings.COMANDOS_LOTE_MAX + 1).all()
+    if len(alvos) > settings.COMANDOS_LOTE_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"O filtro seleciona mais de {settings.COMANDOS_LOTE_MAX} dispositivos; restrinja o alvo.",
+        )
+
+    # 2) Tópico / payload de cada um
+    resultados: List[Dict[str, Any]] = []
+    mensagens: List[Tuple[str, str]] = []
+    publicar: List[Dict[str, Any]] = []
+    registros = []
+    for dispositivo_id, tipo, config in alvos:
+        item: Dict[str, Any] = {"dispositivo_id": dispositivo_id, "tipo": tipo, "ok": False}
+        resultados.append(item)
+        try:
+            topic_cmd, payload = resolver_comando(tipo, config, comando.acao)
+        except HTTPException as e:
+            item["erro"] = e.detail
+            continue
+        item["topic"] = topic_cmd
+        item["payload_enviado"] = payload
+        mensagens.append((topic_cmd, payload))
+        publicar.append(item)
+        registros.append(rastreio_comandos.novo(
+            dispositivo_id, usuario.id, comando.acao, topic_cmd, payload, publicador_mqtt.qos
+        ))
+
+    encontrados = {dispositivo_id for dispositivo_id, _, _ in alvos}
+    for dispositivo_id in comando.dispositivo_ids or ():
+        if dispositivo_id not in encontrados:
+            resultados.append({
+                "dispositivo_id": dispositivo_id,
+                "ok": False,
+                "erro": "Dispositivo não encontrado ou não pertence ao usuário",
+            })
+            encontrados.add(dispositivo_id)
+
+    # 3) Publica tudo de uma vez
+    if mensagens:
+        try:
+            publicados = publicador_mqtt.publicar_varios(mensagens, aguardar_ack=aguardar_ack)
+        except MqttIndisponivel as e:
+            for registro in registros:
+                rastreio_comandos.falhou(registro, str(e))
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+        for item, registro, resultado in zip(publicar, registros, publicados):
+            item["comando_id"] = registro.id
+            if isinstance(resultado, MqttTimeout):
+                # publicado sem PUBACK no prazo: segue pendente no rastreador
+                item["erro"] = str(resultado)
+                item["confirmado"] = False
+                rastreio_comandos.enviado(registro, resultado.resultado)
+            elif isinstance(resultado, Exception):
+                item["erro"] = str(resultado) or type(resultado).__name__
+                rastreio_comandos.falhou(registro, item["erro"])
+            else:
+                item["ok"] = True
+                item["confirmado"] = resultado.confirmado
+                rastreio_comandos.enviado(registro, resultado)
+
+    enviados = sum(1 for item in resultados if item["ok"])
+    return {
+        "ok": enviados == len(resultados) and enviados > 0,
+        "acao_recebida": comando.acao,
+        "total": len(resultados),
+        "enviados": enviados,
+        "falhas": len(resultados) - enviados,
+        "resultados": resultados,
+    }
+
+@router.get("/comandos/{comando_id}", response_model=ComandoOut)
+def obter_comando(
+    comando_id: UUID,
+    db: Session = Depends(get_db),
+    usuario: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    """
+    Um comando pelo id de correlação (devolvido no envio): estado e tempos
+    até o PUBACK do broker e até a resposta do dispositivo.
+    """
+    comando = rastreio_comandos.buscar(comando_id) or db.query(Comando).filter(Comando.id == comando_id).first()
+    if comando is None:
+        raise HTTPException(status_code=404, detail="Comando não encontrado")
+
+    if usuario.role != "ADMIN":
+        permitido = (
+            db.query(Dispositivo.id)
+            .join(Dispositivo.lugar)
+            .filter(Dispositivo.id == comando.dispositivo_id, Lugar.usuario_id == usuario.id)
+            .first()
+        )
+        if not permitido:
+            raise HTTPException(status_code=404, detail="Comando não encontrado")
+
+    return comando
+
+@router.get("/{dispositivo_id}/comandos", response_model=List[ComandoOut])
+def listar_comandos_dispositivo(
+    dispositivo_id: UUID,
+    limite: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    usuario: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    """Últimos comandos enviados ao dispositivo (mais recentes primeiro)."""
+    q = db.query(Dispositivo.id).join(Dispositivo.lugar).filter(Dispositivo.id == dispositivo_id)
+    if usuario.role != "ADMIN":
+        q = q.filter(Lugar.usuario_id == usuario.id)
+    if not q.first():
+        raise HTTPException(
+            status_code=404,
+            detail="Dispositivo não encontrado ou não pertence ao usuário",
+        )
+
+    gravados = (
+        db.query(Comando)
+        .filter(Comando.dispositivo_id == dispositivo_id)
+        .order_by(Comando.enviado_em.desc())
+        .limit(limite)
+        .all()
+    )
+    # o que ainda não foi gravado (ou mudou desde a última gravação) vem da memória
+    por_id = {c.id: c for c in gravados}
+    por_id.update({c.id: c for c in rastreio_comandos.em_memoria(dispositivo_id)})
+    return sorted(por_id.values(), key=lambda c: c.enviado_em, reverse=True)[:limite]
+
 @router.put("/{dispositivo_id}/mudar-lugar", response_model=DispositivoOut)
 def mudar_dispositivo_de_lugar(
     dispositivo_id: UUID,
     body: DispositivoUpdateLugar,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado),
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
     # 1) Garante que o dispositivo existe e pertence ao usuário (se não for ADMIN)
     q = (
@@ -487,6 +735,8 @@ def mudar_dispositivo_de_lugar(
     db.add(dispositivo)
     db.commit()
     db.refresh(dispositivo)
+    indice_roteamento.atualizar_dispositivo(dispositivo)
+    cache_dashboard.limpar()    # o lugar de destino pode ser de outro cliente
 
     return dispositivo
 
@@ -494,7 +744,7 @@ def mudar_dispositivo_de_lugar(
 def deletar_dispositivo(
     dispositivo_id: UUID,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado),
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
     """
     Exclui (ou desativa) um dispositivo.
@@ -524,6 +774,8 @@ def deletar_dispositivo(
             detail="Dispositivo não encontrado ou não pertence ao usuário",
         )
 
+    dono_id = dispositivo.lugar.usuario_id
+
     # Soft delete
     if hasattr(dispositivo, "ativo"):
         dispositivo.ativo = False
@@ -533,4 +785,6 @@ def deletar_dispositivo(
         db.delete(dispositivo)
 
     db.commit()
-
+    indice_roteamento.remover_dispositivo(dispositivo_id)
+    estado_dispositivos.remover(dispositivo_id)
+    cache_dashboard.invalidar(dono_id)
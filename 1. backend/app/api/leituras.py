@@ -3,14 +3,21 @@ from uuid import UUID
 from typing import List, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_db, get_usuario_logado
-from app.models.leitura import Leitura
+from app.core.config import settings
+from app.core.deps import get_db, get_usuario_logado, get_usuario_logado_stream
+from app.core.paginacao import anunciar_proximo, fechar_pagina, paginar_keyset
+from app.db.session import SessionLocal
+from app.models.leitura import Leitura, LeituraUltima
 from app.models.dispositivo import Dispositivo
-from app.models.usuario import Usuario
+from app.core.cache_usuarios import UsuarioAutenticado
 from app.schemas.leitura import LeituraOut  # vamos criar já
+from app.services.estado_dispositivos import estado_dispositivos
+from app.services.push_leituras import LimiteConexoesPush, formatar_evento, hub_push
 
 router = APIRouter(prefix="/leituras", tags=["leituras"])
 
@@ -19,7 +26,7 @@ router = APIRouter(prefix="/leituras", tags=["leituras"])
 def obter_ultima_leitura(
     dispositivo_id: UUID,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(get_usuario_logado),
+    usuario: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
     # Garante que o dispositivo é do usuário (ou ADMIN)
     q_disp = db.query(Dispositivo).filter(Dispositivo.id == dispositivo_id)
@@ -30,12 +37,8 @@ def obter_ultima_leitura(
     if not dispositivo:
         raise HTTPException(status_code=404, detail="Dispositivo não encontrado ou não pertence ao usuário.")
 
-    leitura = (
-        db.query(Leitura)
-        .filter(Leitura.dispositivo_id == dispositivo_id)
-        .order_by(Leitura.timestamp.desc())
-        .first()
-    )
+    # estado atual mantido pela ingestão: busca por PK, independe do tamanho do histórico
+    leitura = db.get(LeituraUltima, dispositivo_id)
     if not leitura:
         raise HTTPException(status_code=404, detail="Nenhuma leitura encontrada para este dispositivo.")
 
@@ -44,13 +47,20 @@ def obter_ultima_leitura(
 
 @router.get("/", response_model=List[LeituraOut])
 def listar_leituras(
+    response: Response,
     dispositivo_id: UUID,
     inicio: Optional[datetime] = Query(None),
     fim: Optional[datetime]   = Query(None),
-    limite: int = Query(100, le=1000),
+    limite: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor da página seguinte (header X-Proximo-Cursor)"),
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(get_usuario_logado),
+    usuario: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
+    """
+    Leituras do dispositivo, mais recentes primeiro, paginadas por
+    (timestamp, id): o header X-Proximo-Cursor traz o cursor da próxima
+    página (ausente na última).
+    """
     q_disp = db.query(Dispositivo).filter(Dispositivo.id == dispositivo_id)
     if usuario.role != "ADMIN":
         q_disp = q_disp.filter(Dispositivo.lugar.has(usuario_id=usuario.id))
@@ -61,11 +71,80 @@ def listar_leituras(
 
     q = db.query(Leitura).filter(Leitura.dispositivo_id == dispositivo_id)
 
+    # filtros em timestamp (chave de partição) limitam o plano às partições do período
     if inicio:
         q = q.filter(Leitura.timestamp >= inicio)
     if fim:
         q = q.filter(Leitura.timestamp <= fim)
 
-    q = q.order_by(Leitura.timestamp.desc()).limit(limite)
+    # (timestamp, id) < cursor sai do índice (dispositivo_id, timestamp DESC, id DESC)
+    q = paginar_keyset(q, Leitura.timestamp, Leitura.id, cursor, limite, tipo_id=int)
+
+    itens, proximo = fechar_pagina(q.all(), limite, lambda leitura: (leitura.timestamp, leitura.id))
+    anunciar_proximo(response, proximo)
+    return itens
+
+
+def _dispositivos_do_stream(
+    usuario: UsuarioAutenticado,
+    lugar_id: Optional[UUID],
+    dispositivo_ids: Optional[List[UUID]],
+) -> List[UUID]:
+    # sessão própria e curta: a do get_db ficaria aberta (com conexão) enquanto o stream durar
+    db = SessionLocal()
+    try:
+        q = db.query(Dispositivo.id).filter(Dispositivo.ativo == True)
+        if usuario.role != "ADMIN":
+            q = q.filter(Dispositivo.lugar.has(usuario_id=usuario.id))
+        if lugar_id:
+            q = q.filter(Dispositivo.lugar_id == lugar_id)
+        if dispositivo_ids:
+            q = q.filter(Dispositivo.id.in_(dispositivo_ids))
+        return [dispositivo_id for (dispositivo_id,) in q.all()]
+    finally:
+        db.close()
+
+
+@router.get("/stream")
+async def stream_leituras(
+    request: Request,
+    lugar_id: Optional[UUID] = Query(None, description="Só os dispositivos deste lugar"),
+    dispositivo_id: Optional[List[UUID]] = Query(None, description="Só estes dispositivos (pode repetir)"),
+    usuario: UsuarioAutenticado = Depends(get_usuario_logado_stream),
+):
+    """
+    Push do estado ao vivo por Server-Sent Events, no lugar de ficar
+    consultando /leituras/ultima/{id}.
+
+    Começa com um evento "estado" por dispositivo (estado atual) e depois
+    manda um a cada mensagem recebida pela ingestão, só dos dispositivos que
+    o usuário enxerga (filtráveis por lugar / dispositivo). Se o cliente
+    ficar para trás, as atualizações pendentes de um mesmo dispositivo são
+    juntadas na mais recente. O token pode vir em ?token= (EventSource).
+    """
+    ids = await run_in_threadpool(_dispositivos_do_stream, usuario, lugar_id, dispositivo_id)
+    if not ids:
+        raise HTTPException(status_code=404, detail="Nenhum dispositivo encontrado para acompanhar.")
+
+    try:
+        assinatura = hub_push.assinar(ids)
+    except LimiteConexoesPush:
+        raise HTTPException(status_code=503, detail="Limite de conexões de push atingido.")
 
-    return q.all()
+    async def eventos():
+        try:
+            # assinatura antes do estado inicial: nada se perde entre um e outro
+            estados, _ = estado_dispositivos.ler(ids)
+            yield "retry: 5000\n\n" + "".join(formatar_evento(e) for e in estados if e.visto_em is not None)
+
+            while not await request.is_disconnected():
+                estados = await assinatura.proximos(settings.PUSH_KEEPALIVE_S)
+                yield "".join(formatar_evento(e) for e in estados) if estados else ": keepalive\n\n"
+        finally:
+            hub_push.cancelar(assinatura)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Response, Depends, HTTPException
+from fastapi import APIRouter, Response, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
 
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 
 from app.db.session import SessionLocal
 from app.models.lugar import Lugar
 from app.schemas.lugar import LugarCreate, LugarUpdate, LugarOut, LugarBase
 from app.models.usuario import Usuario
 from app.models.dispositivo import Dispositivo
+from app.core.cache_usuarios import UsuarioAutenticado
 from app.core.deps import get_usuario_logado, get_db
+from app.core.paginacao import anunciar_proximo, fechar_pagina, paginar_keyset
+from app.services.cache_dashboard import cache_dashboard
 
 router = APIRouter(prefix="/lugares", tags=["Lugares"])
 
@@ -19,7 +22,7 @@ router = APIRouter(prefix="/lugares", tags=["Lugares"])
 def criar_lugar(
     lugar_in: LugarCreate,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado),
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
     # 1) Determina qual usuario_id vai ser usado
     if usuario_logado.role == "ADMIN":
@@ -56,22 +59,34 @@ def criar_lugar(
     db.add(novo)
     db.commit()
     db.refresh(novo)
+    cache_dashboard.invalidar(usuario_id)
     return novo
 
 
 # Listar todos os lugares do usuário logado
 @router.get("/", response_model=List[LugarOut])
 def listar_lugares(
+    response: Response,
+    limite: int = Query(500, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor da página seguinte (header X-Proximo-Cursor)"),
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado)
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado)
 ):
+    """
+    Lugares na ordem de cadastro, paginados por (criado_em, id): o header
+    X-Proximo-Cursor traz o cursor da próxima página (ausente na última).
+    """
     query = db.query(Lugar).options(joinedload(Lugar.usuario)).filter(Lugar.ativo == True)
 
     # Se for cliente, mostra só os próprios
     if usuario_logado.role == "CLIENTE":
         query = query.filter(Lugar.usuario_id == usuario_logado.id)
 
-    return query.all()
+    query = paginar_keyset(query, Lugar.criado_em, Lugar.id, cursor, limite, decrescente=False)
+
+    itens, proximo = fechar_pagina(query.all(), limite, lambda lugar: (lugar.criado_em, lugar.id))
+    anunciar_proximo(response, proximo)
+    return itens
 
 
 # Obter um lugar específico
@@ -79,7 +94,7 @@ def listar_lugares(
 def obter_lugar(
     lugar_id: UUID,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado)
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado)
 ):
     query = db.query(Lugar).options(joinedload(Lugar.usuario))
     lugar = query.filter(Lugar.id == lugar_id, Lugar.ativo == True).first()
@@ -100,7 +115,7 @@ def atualizar_lugar(
     lugar_id: UUID,
     lugar_data: LugarUpdate,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado)
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado)
 ):
     lugar = db.query(Lugar).filter(Lugar.id == lugar_id, Lugar.ativo == True).first()
     if not lugar:
@@ -115,6 +130,7 @@ def atualizar_lugar(
 
     db.commit()
     db.refresh(lugar)
+    cache_dashboard.limpar()    # admin pode ter trocado o cliente vinculado
     return lugar
 
 
@@ -123,7 +139,7 @@ def atualizar_lugar(
 def excluir_lugar(
     lugar_id: UUID,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado),
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
     # Busca o lugar ativo
     q = db.query(Lugar).filter(Lugar.id == lugar_id, Lugar.ativo == True)
@@ -154,4 +170,5 @@ def excluir_lugar(
     # Exclusão lógica
     lugar.ativo = False
     db.commit()
+    cache_dashboard.invalidar(lugar.usuario_id)
     return Response(status_code=204)
@@ -0,0 +1,100 @@
+from fastapi import APIRouter, Depends
+
+from app.core.cache_usuarios import cache_usuarios
+from app.core.deps import requer_roles
+from app.core.pool_senhas import pool_senhas
+from app.core.security import cache_tokens
+from app.db.session import estatisticas_pools
+from app.services.cache_dashboard import cache_dashboard
+from app.services.estado_dispositivos import estado_dispositivos
+from app.services.leitura_writer import leitura_writer
+from app.services.mqtt_ingestor import estatisticas_despachante
+from app.services.mqtt_ingestor_async import estatisticas_ingestor_async
+from app.services.mqtt_publisher import publicador_mqtt
+from app.services.presenca_dispositivos import presenca_dispositivos
+from app.services.push_leituras import hub_push
+from app.services.rastreio_comandos import rastreio_comandos
+from app.services.relatorio_jobs import fila_relatorios_pdf
+from app.services.roteamento_dispositivos import indice_roteamento
+
+router = APIRouter(prefix="/metricas", tags=["Métricas"])
+
+
+@router.get("/ingestao", dependencies=[Depends(requer_roles("ADMIN"))])
+def metricas_ingestao():
+    """
+    Contadores da ingestão MQTT (apenas admin):
+    - despachante: mensagens recebidas / processadas e filas dos workers
+    - writer: fila e lotes gravados
+    - ingestor_async: o mesmo, quando MQTT_INGESTOR_MODE="async"
+    - roteamento: hits / misses / refreshes do índice base_topic -> dispositivo
+    - estado: atualizações do estado ao vivo dos dispositivos
+    - push: conexões SSE e atualizações entregues / juntadas / descartadas
+    - presenca: dispositivos online, transições (por LWT / por silêncio) e gravações
+    """
+    return {
+        "despachante": estatisticas_despachante(),
+        "writer": leitura_writer.estatisticas(),
+        "roteamento": indice_roteamento.estatisticas(),
+        "ingestor_async": estatisticas_ingestor_async(),
+        "estado": estado_dispositivos.estatisticas(),
+        "push": hub_push.estatisticas(),
+        "presenca": presenca_dispositivos.estatisticas(),
+    }
+
+
+@router.get("/relatorios", dependencies=[Depends(requer_roles("ADMIN"))])
+def metricas_relatorios():
+    """
+    Jobs de PDF (apenas admin): jobs criados, servidos do cache, reaproveitados,
+    renderizados, erros, em andamento, e o cache em disco (hits / misses /
+    despejos / tamanho).
+    """
+    return {"pdf": fila_relatorios_pdf.estatisticas()}
+
+
+@router.get("/auth", dependencies=[Depends(requer_roles("ADMIN"))])
+def metricas_auth():
+    """
+    Autenticação (apenas admin): caches de tokens já verificados e de usuários
+    (hits / misses / expirados / despejos / invalidações) e o pool de bcrypt
+    (em execução, na fila, pico da fila, rejeitados, tempo médio).
+    """
+    return {
+        "tokens": cache_tokens.estatisticas(),
+        "usuarios": cache_usuarios.estatisticas(),
+        "senhas": pool_senhas.estatisticas(),
+    }
+
+
+@router.get("/comandos", dependencies=[Depends(requer_roles("ADMIN"))])
+def metricas_comandos():
+    """
+    Comandos MQTT (apenas admin):
+    - publicador: publicadas, confirmadas (PUBACK), timeouts, recusas sem
+      conexão, latência média / máxima do publish e do ack, e qual conexão
+      está em uso (própria ou do ingestor)
+    - rastreio: comandos respondidos / expirados / pendentes e histogramas
+      de latência do broker (PUBACK) e de ida e volta até o dispositivo
+    """
+    return {
+        "publicador": publicador_mqtt.estatisticas(),
+        "rastreio": rastreio_comandos.estatisticas(),
+    }
+
+
+@router.get("/dashboard", dependencies=[Depends(requer_roles("ADMIN"))])
+def metricas_dashboard():
+    """Cache do resumo do dashboard (apenas admin): hits / misses / expirados / invalidações."""
+    return {"cache": cache_dashboard.estatisticas()}
+
+
+@router.get("/db-pool", dependencies=[Depends(requer_roles("ADMIN"))])
+def metricas_db_pool():
+    """
+    Pools de conexões ao Postgres (apenas admin), "api" e "ingestao":
+    conexões em uso / ociosas / em overflow (e o pico em uso), espera no
+    checkout (média, máxima e histograma em ms), timeouts, conexões abertas
+    e invalidadas, e pre-pings feitos / falhos.
+    """
+    return estatisticas_pools()
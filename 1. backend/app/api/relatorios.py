@@ -1,47 +1,39 @@
 # app/api/relatorios.py
 
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
 
 from app.models.dispositivo import Dispositivo
-from app.models.leitura import Leitura
-from app.models.usuario import Usuario  
+from app.models.leitura import LeituraUltima
+from app.models.lugar import Lugar
+from app.core.cache_usuarios import UsuarioAutenticado
 from app.core.deps import get_usuario_logado, get_db  
-from app.schemas.leitura import (
-    RelatorioDispositivoOut,
-    RelatorioDispositivoMetricas,
-    SeriesRelatorioDispositivo,
-    PontoUmidade,
+from app.core.config import settings
+from app.services.dispositivo_service import faixa_umidade
+from app.services.relatorio_csv import comprimir_gzip, csv_relatorio_dispositivo, csv_relatorio_frota
+from app.services.relatorio_jobs import JobPdf, chave_relatorio, fila_relatorios_pdf
+from app.services.relatorio_pdf import PDF_MAX_PONTOS, renderizar_pdf_dispositivo, renderizar_pdf_frota
+from app.services.relatorio_service import (
+    info_dispositivo,
+    montar_relatorio_dispositivo,
+    montar_relatorio_frota,
+    utc_sem_fuso,
 )
-
-import hashlib
-
-# Monkey patch para o md5 do ReportLab funcionar no Anaconda/Windows
-_original_md5 = hashlib.md5
-
-def md5_compat(*args, **kwargs):
-    # ignora o argumento "usedforsecurity", se for passado
-    kwargs.pop("usedforsecurity", None)
-    return _original_md5(*args, **kwargs)
-
-hashlib.md5 = md5_compat
-
-from io import BytesIO, StringIO
-import csv
-
-# se você não tiver o reportlab instalado, vai precisar instalar no ambiente:
-# pip install reportlab
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from app.schemas.leitura import RelatorioDispositivoOut, RelatorioFrotaOut, RelatorioJobOut
 
 router = APIRouter()
 
 
-def _is_admin(user: Usuario) -> bool:
+def _is_admin(user: UsuarioAutenticado) -> bool:
     role = getattr(user, "role", None)
     if role is None:
         return False
@@ -50,14 +42,24 @@ def _is_admin(user: Usuario) -> bool:
     return getattr(role, "name", str(role)).upper() == "ADMIN"
 
 
-def _montar_relatorio_dispositivo(
+def _periodo(inicio: Optional[datetime], fim: Optional[datetime]) -> Tuple[datetime, datetime]:
+    """Período padrão: últimas 24h (leituras ficam em UTC sem fuso)."""
+    fim = utc_sem_fuso(fim) if fim is not None else datetime.utcnow()
+    inicio = utc_sem_fuso(inicio) if inicio is not None else fim - timedelta(days=1)
+
+    if inicio >= fim:
+        raise HTTPException(status_code=400, detail="Período inválido.")
+    return inicio, fim
+
+
+def _validar_relatorio_dispositivo(
     db: Session,
     dispositivo_id: str,
     inicio: Optional[datetime],
     fim: Optional[datetime],
-    current_user: Usuario,
-) -> RelatorioDispositivoOut:
-    """Função de serviço que monta o relatório (usada pelo JSON, PDF e CSV)."""
+    current_user: UsuarioAutenticado,
+) -> Tuple[Dispositivo, datetime, datetime]:
+    """Busca o dispositivo, valida acesso e período (padrão: últimas 24h)."""
 
     # 1) Busca o dispositivo
     dispositivo: Dispositivo | None = (
@@ -72,111 +74,24 @@ def _montar_relatorio_dispositivo(
         if owner_id is not None and owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="Sem permissão para esse dispositivo.")
 
-    # 3) Período padrão: últimas 24h
-    if fim is None:
-        fim = datetime.utcnow()
-    if inicio is None:
-        inicio = fim - timedelta(days=1)
+    # 3) Período
+    inicio, fim = _periodo(inicio, fim)
+    return dispositivo, inicio, fim
 
-    if inicio >= fim:
-        raise HTTPException(status_code=400, detail="Período inválido.")
-
-    # 4) Busca leituras
-    leituras: List[Leitura] = (
-        db.query(Leitura)
-        .filter(
-            Leitura.dispositivo_id == dispositivo.id,
-            Leitura.timestamp >= inicio,
-            Leitura.timestamp <= fim,
-        )
-        .order_by(Leitura.timestamp.asc())
-        .all()
-    )
 
-    total_leituras = len(leituras)
-
-    # 5) Faixa alvo
-    cfg = dispositivo.config or {}
-    parametros = cfg.get("parametros") or {}
-    umid_min_alvo = parametros.get("umidadeMinima")
-    umid_max_alvo = parametros.get("umidadeMaxima")
-
-    # 6) Série de umidade + métricas simples
-    umidades: list[float] = []
-    pontos_umidade: list[PontoUmidade] = []
-    dentro_faixa = 0
-    fora_faixa = 0
-
-    for leitura in leituras:
-        dados = leitura.dados or {}
-        if "umidade" in dados:
-            try:
-                u = float(dados["umidade"])
-            except (ValueError, TypeError):
-                continue
-
-            umidades.append(u)
-            pontos_umidade.append(
-                PontoUmidade(timestamp=leitura.timestamp, umidade=u)
-            )
-
-            if umid_min_alvo is not None and umid_max_alvo is not None:
-                if umid_min_alvo <= u <= umid_max_alvo:
-                    dentro_faixa += 1
-                else:
-                    fora_faixa += 1
-
-    leituras_com_umidade = len(umidades)
-
-    if leituras_com_umidade > 0:
-        umidade_min = min(umidades)
-        umidade_max = max(umidades)
-        umidade_media = sum(umidades) / leituras_com_umidade
-    else:
-        umidade_min = umidade_max = umidade_media = None
-
-    percentual_dentro_faixa: Optional[float] = None
-    if leituras_com_umidade > 0 and (dentro_faixa + fora_faixa) > 0:
-        percentual_dentro_faixa = (dentro_faixa / (dentro_faixa + fora_faixa)) * 100.0
-
-    metricas = RelatorioDispositivoMetricas(
-        umidade_min=umidade_min,
-        umidade_max=umidade_max,
-        umidade_media=umidade_media,
-        leituras_total=total_leituras,
-        leituras_com_umidade=leituras_com_umidade,
-        dentro_faixa=dentro_faixa if leituras_com_umidade > 0 else None,
-        fora_faixa=fora_faixa if leituras_com_umidade > 0 else None,
-        percentual_dentro_faixa=percentual_dentro_faixa,
-    )
+def _montar_relatorio_dispositivo(
+    db: Session,
+    dispositivo_id: str,
+    inicio: Optional[datetime],
+    fim: Optional[datetime],
+    current_user: UsuarioAutenticado,
+    max_pontos: int = 0,
+) -> RelatorioDispositivoOut:
+    """Valida e monta o relatório (usado pelo JSON e PDF)."""
+    dispositivo, inicio, fim = _validar_relatorio_dispositivo(db, dispositivo_id, inicio, fim, current_user)
 
-    series = SeriesRelatorioDispositivo(umidade=pontos_umidade)
-
-    dispositivo_info = {
-        "id": str(dispositivo.id),
-        "nome": getattr(dispositivo, "nome", None),
-        "tipo": getattr(dispositivo, "tipo", None),
-        "cliente_nome": getattr(getattr(dispositivo, "usuario", None), "nome", None),
-        "lugar_nome": getattr(getattr(dispositivo, "lugar", None), "nome", None),
-    }
-
-    periodo_info = {
-        "inicio": inicio,
-        "fim": fim,
-    }
-
-    parametros_alvo = {
-        "umidadeMinima": umid_min_alvo,
-        "umidadeMaxima": umid_max_alvo,
-    }
-
-    return RelatorioDispositivoOut(
-        dispositivo=dispositivo_info,
-        periodo=periodo_info,
-        parametros_alvo=parametros_alvo,
-        metricas=metricas,
-        series=series,
-    )
+    # métricas agregadas no banco + série (completa ou reduzida a max_pontos)
+    return montar_relatorio_dispositivo(db, dispositivo, inicio, fim, max_pontos)
 
 
 # ---------- 1) Endpoint JSON (mantém) ----------
@@ -189,107 +104,201 @@ def relatorio_por_dispositivo_json(
     dispositivo_id: str,
     inicio: Optional[datetime] = None,
     fim: Optional[datetime] = None,
+    max_points: Optional[int] = Query(
+        None, ge=0, description="Máximo de pontos da série (média por intervalo). 0 = série completa."
+    ),
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_usuario_logado),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
-    return _montar_relatorio_dispositivo(db, dispositivo_id, inicio, fim, current_user)
+    if max_points is None:
+        max_points = settings.RELATORIO_MAX_PONTOS
+    return _montar_relatorio_dispositivo(db, dispositivo_id, inicio, fim, current_user, max_points)
+
+
+# ---------- 2) PDF: job em pool de processos + cache em disco ----------
+
+@dataclass
+class _PedidoPdf:
+    chave: str                                   # cache: escopo + período + hash do que aparece no PDF
+    nome_arquivo: str
+    montar: Callable[[], Dict[str, Any]]         # consultas (no request); o dict vai para o pool
+    renderizar: Callable[[Dict[str, Any]], bytes]
+
+
+# fim a menos disso de agora: ainda podem chegar leituras do período
+_MARGEM_PERIODO_FECHADO = timedelta(minutes=5)
+
+
+def _periodo_pdf(inicio: datetime, fim: datetime) -> Tuple[datetime, datetime]:
+    """
+    Período do PDF em minutos cheios. O `fim` padrão (agora) muda a cada
+    request e, cru, nunca acertaria o cache; truncado, os pedidos do mesmo
+    minuto caem na mesma chave (e o PDF mostra exatamente esse período).
+    """
+    inicio = inicio.replace(second=0, microsecond=0)
+    fim = fim.replace(second=0, microsecond=0)
+    if inicio >= fim:
+        raise HTTPException(status_code=400, detail="Período inválido.")
+    return inicio, fim
+
+
+def _versao_dados(db: Session, dispositivo_ids: List[Any], fim: datetime) -> str:
+    """
+    Parte da chave que acompanha os dados. Período fechado não muda mais;
+    período aberto (ou com `fim` no futuro) leva o timestamp da última
+    leitura dos dispositivos (leituras_ultimas, busca pela PK): chegou
+    leitura nova, a chave muda e o PDF é gerado de novo em vez de sair velho
+    do cache.
+    """
+    if fim <= datetime.utcnow() - _MARGEM_PERIODO_FECHADO:
+        return "fechado"
+    ultima = None
+    if dispositivo_ids:
+        ultima = (
+            db.query(func.max(LeituraUltima.timestamp))
+            .filter(LeituraUltima.dispositivo_id.in_(dispositivo_ids))
+            .scalar()
+        )
+    return f"aberto:{ultima.isoformat() if ultima else '-'}"
 
 
-# ---------- 2) Endpoint PDF ----------
+def _job_out(job: JobPdf) -> RelatorioJobOut:
+    return RelatorioJobOut(
+        job_id=job.id,
+        status=job.status,
+        criado_em=job.criado_em,
+        concluido_em=job.concluido_em,
+        erro=job.erro,
+        download_url=f"/relatorios/jobs/{job.id}/pdf" if job.status == "concluido" else None,
+    )
+
+
+def _resposta_pdf(conteudo: bytes, nome_arquivo: str) -> Response:
+    return Response(
+        content=conteudo,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'},
+    )
+
+
+def _enfileirar_pdf(pedido: _PedidoPdf, current_user: UsuarioAutenticado) -> JobPdf:
+    job = fila_relatorios_pdf.job_do_cache(pedido.chave, current_user.id, pedido.nome_arquivo)
+    if job is not None:
+        return job
+    return fila_relatorios_pdf.enviar(
+        pedido.chave, pedido.renderizar, pedido.montar(), current_user.id, pedido.nome_arquivo
+    )
+
+
+async def _baixar_pdf(preparar: Callable[[], _PedidoPdf], current_user: UsuarioAutenticado) -> Response:
+    """
+    Download direto: serve do cache ou agenda o job e espera a renderização
+    sem ocupar uma thread da API. `preparar` valida o pedido (roda no threadpool).
+    """
+    pedido = await run_in_threadpool(preparar)
+    # leitura do arquivo (pode ter vários MB) fora do event loop
+    conteudo = await run_in_threadpool(fila_relatorios_pdf.cache.ler, pedido.chave)
+    if conteudo is not None:
+        return _resposta_pdf(conteudo, pedido.nome_arquivo)
+
+    job = await run_in_threadpool(_enfileirar_pdf, pedido, current_user)
+    await fila_relatorios_pdf.aguardar(job)
+    conteudo = await run_in_threadpool(fila_relatorios_pdf.conteudo, job)
+    if conteudo is None:
+        raise HTTPException(status_code=500, detail=f"Erro ao gerar o PDF: {job.erro or 'indisponível'}")
+    return _resposta_pdf(conteudo, pedido.nome_arquivo)
+
+
+def _pedido_pdf_dispositivo(
+    db: Session,
+    dispositivo_id: str,
+    inicio: Optional[datetime],
+    fim: Optional[datetime],
+    current_user: UsuarioAutenticado,
+) -> _PedidoPdf:
+    dispositivo, inicio, fim = _validar_relatorio_dispositivo(db, dispositivo_id, inicio, fim, current_user)
+    inicio, fim = _periodo_pdf(inicio, fim)
+    return _PedidoPdf(
+        chave=chave_relatorio(
+            "dispositivo",
+            str(dispositivo.id),
+            inicio.isoformat(),
+            fim.isoformat(),
+            _versao_dados(db, [dispositivo.id], fim),
+            info_dispositivo(dispositivo),
+            dispositivo.config,
+            PDF_MAX_PONTOS,
+        ),
+        nome_arquivo=f"relatorio_dispositivo_{dispositivo.id}.pdf",
+        montar=lambda: montar_relatorio_dispositivo(db, dispositivo, inicio, fim, PDF_MAX_PONTOS).model_dump(),
+        renderizar=renderizar_pdf_dispositivo,
+    )
+
+
+@router.post(
+    "/relatorios/dispositivos/{dispositivo_id}/pdf",
+    response_model=RelatorioJobOut,
+    status_code=202,
+)
+def criar_relatorio_por_dispositivo_pdf(
+    dispositivo_id: str,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    """
+    Agenda o PDF e devolve o job na hora. Acompanhar em GET /relatorios/jobs/{job_id}
+    e baixar em /relatorios/jobs/{job_id}/pdf. Se o PDF já estiver no cache, o job
+    já nasce concluído.
+    """
+    pedido = _pedido_pdf_dispositivo(db, dispositivo_id, inicio, fim, current_user)
+    return _job_out(_enfileirar_pdf(pedido, current_user))
+
 
 @router.get("/relatorios/dispositivos/{dispositivo_id}/pdf")
-def relatorio_por_dispositivo_pdf(
+async def relatorio_por_dispositivo_pdf(
     dispositivo_id: str,
     inicio: Optional[datetime] = None,
     fim: Optional[datetime] = None,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_usuario_logado),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
-    rel = _montar_relatorio_dispositivo(db, dispositivo_id, inicio, fim, current_user)
-
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    y = height - 50
-
-    # Cabeçalho
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, y, "Relatório do Dispositivo")
-    y -= 30
-
-    c.setFont("Helvetica", 10)
-    c.drawString(50, y, f"Dispositivo: {rel.dispositivo.get('nome') or rel.dispositivo.get('id')}")
-    y -= 15
-    c.drawString(50, y, f"Tipo: {rel.dispositivo.get('tipo')}")
-    y -= 15
-    c.drawString(50, y, f"Lugar: {rel.dispositivo.get('lugar_nome')}")
-    y -= 15
-
-    periodo = rel.periodo
-    c.drawString(50, y, f"Período: {periodo['inicio']}  até  {periodo['fim']}")
-    y -= 25
-
-    # Métricas
-    m = rel.metricas
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, "Resumo de umidade")
-    y -= 20
-    c.setFont("Helvetica", 10)
-
-    c.drawString(50, y, f"Umidade mínima: {m.umidade_min if m.umidade_min is not None else '--'}")
-    y -= 15
-    c.drawString(50, y, f"Umidade máxima: {m.umidade_max if m.umidade_max is not None else '--'}")
-    y -= 15
-    c.drawString(50, y, f"Umidade média: {m.umidade_media if m.umidade_media is not None else '--'}")
-    y -= 15
-
-    alvo = rel.parametros_alvo
-    c.drawString(
-        50,
-        y,
-        f"Faixa alvo: {alvo.get('umidadeMinima', '--')}% a {alvo.get('umidadeMaxima', '--')}%",
+    return await _baixar_pdf(
+        lambda: _pedido_pdf_dispositivo(db, dispositivo_id, inicio, fim, current_user), current_user
     )
-    y -= 15
 
-    if m.percentual_dentro_faixa is not None:
-        c.drawString(
-            50,
-            y,
-            f"% de leituras dentro da faixa: {m.percentual_dentro_faixa:.1f}%",
-        )
-        y -= 15
 
-    c.drawString(50, y, f"Total de leituras: {m.leituras_total}")
-    y -= 15
-    c.drawString(50, y, f"Leituras com umidade: {m.leituras_com_umidade}")
-    y -= 25
+def _job_do_usuario(job_id: str, current_user: UsuarioAutenticado) -> JobPdf:
+    job = fila_relatorios_pdf.buscar(job_id)
+    if job is None or (job.usuario_id != current_user.id and not _is_admin(current_user)):
+        raise HTTPException(status_code=404, detail="Job de relatório não encontrado.")
+    return job
 
-    # Tabela simples de alguns pontos de umidade
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(50, y, "Alguns pontos de umidade (timestamp / %):")
-    y -= 20
-    c.setFont("Helvetica", 9)
 
-    for ponto in rel.series.umidade[:40]:  # limita pra não explodir uma página
-        if y < 50:
-            c.showPage()
-            y = height - 50
-            c.setFont("Helvetica", 9)
-        c.drawString(50, y, f"{ponto.timestamp}  -  {ponto.umidade:.1f}%")
-        y -= 12
+@router.get("/relatorios/jobs/{job_id}", response_model=RelatorioJobOut)
+def status_job_relatorio(
+    job_id: str,
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    return _job_out(_job_do_usuario(job_id, current_user))
 
-    c.showPage()
-    c.save()
-    buffer.seek(0)
 
-    filename = f"relatorio_dispositivo_{rel.dispositivo.get('id')}.pdf"
+@router.get("/relatorios/jobs/{job_id}/pdf")
+def baixar_job_relatorio(
+    job_id: str,
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    job = _job_do_usuario(job_id, current_user)
+    if job.status == "pendente":
+        return JSONResponse(status_code=202, content=jsonable_encoder(_job_out(job)))
+    if job.status == "erro":
+        raise HTTPException(status_code=500, detail=f"Erro ao gerar o PDF: {job.erro}")
 
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    conteudo = fila_relatorios_pdf.conteudo(job)
+    if conteudo is None:
+        raise HTTPException(status_code=410, detail="O PDF saiu do cache. Gere o relatório de novo.")
+    return _resposta_pdf(conteudo, job.nome_arquivo)
 
 
 # ---------- 3) Endpoint CSV (Excel abre) ----------
@@ -299,58 +308,204 @@ def relatorio_por_dispositivo_csv(
     dispositivo_id: str,
     inicio: Optional[datetime] = None,
     fim: Optional[datetime] = None,
+    gzip: bool = Query(False, description="Comprime o CSV em gzip enquanto é gerado (.csv.gz)."),
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_usuario_logado),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
 ):
-    rel = _montar_relatorio_dispositivo(db, dispositivo_id, inicio, fim, current_user)
-
-    output = StringIO()
-    writer = csv.writer(output, delimiter=";")
-
-    # Cabeçalho
-    writer.writerow(["Relatório do dispositivo"])
-    writer.writerow([f"ID", rel.dispositivo.get("id")])
-    writer.writerow([f"Nome", rel.dispositivo.get("nome")])
-    writer.writerow([f"Tipo", rel.dispositivo.get("tipo")])
-    writer.writerow([f"Lugar", rel.dispositivo.get("lugar_nome")])
-    writer.writerow([])
-
-    periodo = rel.periodo
-    writer.writerow(["Período", f"{periodo['inicio']} até {periodo['fim']}"])
-    writer.writerow([])
-
-    # Métricas
-    m = rel.metricas
-    alvo = rel.parametros_alvo
-
-    writer.writerow(["Métrica", "Valor"])
-    writer.writerow(["Umidade mínima", m.umidade_min])
-    writer.writerow(["Umidade máxima", m.umidade_max])
-    writer.writerow(["Umidade média", m.umidade_media])
-    writer.writerow(
-        ["Faixa alvo", f"{alvo.get('umidadeMinima', '--')} a {alvo.get('umidadeMaxima', '--')} %"]
-    )
-    writer.writerow(
-        [
-            "% leituras dentro da faixa",
-            m.percentual_dentro_faixa if m.percentual_dentro_faixa is not None else "",
-        ]
-    )
-    writer.writerow(["Total de leituras", m.leituras_total])
-    writer.writerow(["Leituras com umidade", m.leituras_com_umidade])
-    writer.writerow([])
+    dispositivo, inicio, fim = _validar_relatorio_dispositivo(db, dispositivo_id, inicio, fim, current_user)
 
-    # Série de umidade
-    writer.writerow(["Timestamp", "Umidade (%)"])
-    for ponto in rel.series.umidade:
-        writer.writerow([ponto.timestamp.isoformat(), ponto.umidade])
+    # só o que é validado (404/403/400) acontece antes da resposta; o CSV é
+    # gerado em streaming, com sessão própria, enquanto é enviado
+    pedacos = csv_relatorio_dispositivo(
+        info_dispositivo(dispositivo), faixa_umidade(dispositivo.config), inicio, fim
+    )
 
-    output.seek(0)
-    filename = f"relatorio_dispositivo_{rel.dispositivo.get('id')}.csv"
+    filename = f"relatorio_dispositivo_{dispositivo.id}.csv"
+    if gzip:
+        return StreamingResponse(
+            comprimir_gzip(pedacos),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.gz"'},
+        )
 
     return StreamingResponse(
-        output,
+        pedacos,
         media_type="text/csv",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
+
+# ---------- 4) Relatório por lugar e geral (vários dispositivos) ----------
+
+def _validar_relatorio_lugar(
+    db: Session,
+    lugar_id: UUID,
+    inicio: Optional[datetime],
+    fim: Optional[datetime],
+    current_user: UsuarioAutenticado,
+) -> Tuple[Dict[str, Any], List[Dispositivo], datetime, datetime]:
+    lugar = db.query(Lugar).filter(Lugar.id == lugar_id).first()
+    if not lugar:
+        raise HTTPException(status_code=404, detail="Lugar não encontrado.")
+    if not _is_admin(current_user) and lugar.usuario_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Sem permissão para esse lugar.")
+
+    inicio, fim = _periodo(inicio, fim)
+    dispositivos = (
+        db.query(Dispositivo)
+        .filter(Dispositivo.lugar_id == lugar.id, Dispositivo.ativo == True)
+        .order_by(Dispositivo.nome.asc())
+        .all()
+    )
+    escopo = {"tipo": "lugar", "id": str(lugar.id), "nome": lugar.nome}
+    return escopo, dispositivos, inicio, fim
+
+
+def _validar_relatorio_geral(
+    db: Session,
+    inicio: Optional[datetime],
+    fim: Optional[datetime],
+    current_user: UsuarioAutenticado,
+) -> Tuple[Dict[str, Any], List[Dispositivo], datetime, datetime]:
+    if not _is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Apenas administradores.")
+
+    inicio, fim = _periodo(inicio, fim)
+    dispositivos = (
+        db.query(Dispositivo)
+        .options(joinedload(Dispositivo.lugar))
+        .filter(Dispositivo.ativo == True)
+        .order_by(Dispositivo.nome.asc())
+        .all()
+    )
+    return {"tipo": "geral"}, dispositivos, inicio, fim
+
+
+def _pedido_pdf_frota(
+    db: Session,
+    escopo: Dict[str, Any],
+    dispositivos: List[Dispositivo],
+    inicio: datetime,
+    fim: datetime,
+) -> _PedidoPdf:
+    nome = "geral" if escopo["tipo"] == "geral" else f"lugar_{escopo['id']}"
+    inicio, fim = _periodo_pdf(inicio, fim)
+    return _PedidoPdf(
+        chave=chave_relatorio(
+            escopo,
+            inicio.isoformat(),
+            fim.isoformat(),
+            _versao_dados(db, [d.id for d in dispositivos], fim),
+            [(info_dispositivo(d), d.config) for d in dispositivos],
+        ),
+        nome_arquivo=f"relatorio_{nome}.pdf",
+        montar=lambda: montar_relatorio_frota(db, dispositivos, escopo, inicio, fim).model_dump(),
+        renderizar=renderizar_pdf_frota,
+    )
+
+
+def _resposta_csv_frota(rel: RelatorioFrotaOut) -> Response:
+    nome = "geral" if rel.escopo["tipo"] == "geral" else f"lugar_{rel.escopo['id']}"
+    return Response(
+        content=csv_relatorio_frota(rel),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="relatorio_{nome}.csv"'},
+    )
+
+
+@router.get("/relatorios/lugares/{lugar_id}", response_model=RelatorioFrotaOut)
+def relatorio_por_lugar_json(
+    lugar_id: UUID,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    """Métricas de cada dispositivo ativo do lugar + total, numa agregação agrupada."""
+    escopo, dispositivos, inicio, fim = _validar_relatorio_lugar(db, lugar_id, inicio, fim, current_user)
+    return montar_relatorio_frota(db, dispositivos, escopo, inicio, fim)
+
+
+@router.get("/relatorios/lugares/{lugar_id}/csv")
+def relatorio_por_lugar_csv(
+    lugar_id: UUID,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    escopo, dispositivos, inicio, fim = _validar_relatorio_lugar(db, lugar_id, inicio, fim, current_user)
+    return _resposta_csv_frota(montar_relatorio_frota(db, dispositivos, escopo, inicio, fim))
+
+
+@router.post("/relatorios/lugares/{lugar_id}/pdf", response_model=RelatorioJobOut, status_code=202)
+def criar_relatorio_por_lugar_pdf(
+    lugar_id: UUID,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    pedido = _pedido_pdf_frota(db, *_validar_relatorio_lugar(db, lugar_id, inicio, fim, current_user))
+    return _job_out(_enfileirar_pdf(pedido, current_user))
+
+
+@router.get("/relatorios/lugares/{lugar_id}/pdf")
+async def relatorio_por_lugar_pdf(
+    lugar_id: UUID,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    return await _baixar_pdf(
+        lambda: _pedido_pdf_frota(db, *_validar_relatorio_lugar(db, lugar_id, inicio, fim, current_user)),
+        current_user,
+    )
+
+
+@router.get("/relatorios/geral", response_model=RelatorioFrotaOut)
+def relatorio_geral_json(
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    """Todos os dispositivos ativos (apenas admin)."""
+    escopo, dispositivos, inicio, fim = _validar_relatorio_geral(db, inicio, fim, current_user)
+    return montar_relatorio_frota(db, dispositivos, escopo, inicio, fim)
+
+
+@router.get("/relatorios/geral/csv")
+def relatorio_geral_csv(
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    escopo, dispositivos, inicio, fim = _validar_relatorio_geral(db, inicio, fim, current_user)
+    return _resposta_csv_frota(montar_relatorio_frota(db, dispositivos, escopo, inicio, fim))
+
+
+@router.post("/relatorios/geral/pdf", response_model=RelatorioJobOut, status_code=202)
+def criar_relatorio_geral_pdf(
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    pedido = _pedido_pdf_frota(db, *_validar_relatorio_geral(db, inicio, fim, current_user))
+    return _job_out(_enfileirar_pdf(pedido, current_user))
+
+
+@router.get("/relatorios/geral/pdf")
+async def relatorio_geral_pdf(
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_usuario_logado),
+):
+    return await _baixar_pdf(
+        lambda: _pedido_pdf_frota(db, *_validar_relatorio_geral(db, inicio, fim, current_user)),
+        current_user,
+    )
@@ -6,8 +6,11 @@ from uuid import UUID
 from app.db.session import SessionLocal
 from app.models.usuario import Usuario
 from app.schemas.usuario import UsuarioCreate, UsuarioOut, UsuarioUpdate, UsuarioUpdateMe
-from app.core.security import gerar_hash_senha
-from app.core.deps import get_usuario_logado, get_db, requer_roles
+from app.core.pool_senhas import pool_senhas
+from app.core.cache_usuarios import UsuarioAutenticado, cache_usuarios
+from app.core.deps import get_usuario_logado, get_usuario_logado_db, get_db, requer_roles
+from app.core.paginacao import estimar_total, fechar_pagina, paginar_keyset
+from app.services.cache_dashboard import cache_dashboard
 
 router = APIRouter(prefix="/usuarios", tags=["Usuários"])
 
@@ -20,17 +23,18 @@ def criar_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
     novo_usuario = Usuario(
         nome=usuario.nome,
         email=usuario.email,
-        senha_hash=gerar_hash_senha(usuario.senha),
+        senha_hash=pool_senhas.gerar_hash_sync(usuario.senha),
         role=usuario.role
     )
     db.add(novo_usuario)
     db.commit()
     db.refresh(novo_usuario)
+    cache_dashboard.invalidar()
     return novo_usuario
 
 
 @router.get("/me", response_model=UsuarioOut)
-def usuario_logado(usuario: Usuario = Depends(get_usuario_logado)):
+def usuario_logado(usuario: Usuario = Depends(get_usuario_logado_db)):
     return usuario
 
 #listar todos os usuarios (apenas admin)
@@ -38,17 +42,44 @@ def usuario_logado(usuario: Usuario = Depends(get_usuario_logado)):
 def listar_usuarios(
     db: Session = Depends(get_db),
     limit: int = Query(default=100, ge=1, le=1000),
-    offset: int = Query(default=0, ge=0),
+    offset: int = Query(default=0, ge=0, description="Legado: prefira `cursor` (o custo do offset cresce com a página)"),
+    cursor: Optional[str] = Query(default=None, description="Cursor da página seguinte (`proximo_cursor`)"),
     ativo: Optional[bool] = Query(default=True, description="Filtrar por ativo/inativo"),
+    total_estimado: bool = Query(default=False, description="`total` estimado pelas estatísticas do banco, sem count()"),
 ):
+    """
+    Usuários, mais recentes primeiro. Paginação por (criado_em, id): cada
+    resposta traz `proximo_cursor` (None na última página), a ser passado
+    em `cursor` para a seguinte, e `has_more`.
+
+    O `total` exato custa um count() (varre todos os usuários do filtro) a
+    cada página; com `total_estimado=true` ele vem do planejador do
+    Postgres, em tempo constante. Quem só precisa saber se há mais páginas
+    usa `has_more`, que sai de graça da própria página.
+    """
     q = db.query(Usuario)
     if ativo is not None:
         q = q.filter(Usuario.ativo == ativo)
 
-    total = q.count()
-    items = q.order_by(Usuario.criado_em.desc()).offset(offset).limit(limit).all()
-
-    return {"items": items, "total": total, "limit": limit, "offset": offset}
+    total = estimar_total(db, q) if total_estimado else q.count()
+    q_pagina = paginar_keyset(q, Usuario.criado_em, Usuario.id, cursor, limit)
+    if offset and not cursor:
+        q_pagina = q_pagina.offset(offset)
+    items, proximo_cursor = fechar_pagina(q_pagina.all(), limit, lambda u: (u.criado_em, u.id))
+    if total_estimado and not cursor:
+        # a página já diz o mínimo (e, se for a última, o total exato)
+        vistos = offset + len(items)
+        total = vistos if proximo_cursor is None else max(total, vistos + 1)
+
+    return {
+        "items": items,
+        "total": total,
+        "total_estimado": total_estimado,
+        "has_more": proximo_cursor is not None,
+        "limit": limit,
+        "offset": offset,
+        "proximo_cursor": proximo_cursor,
+    }
 
 #obter usuario especifica
 @router.get("/{usuario_id}", response_model=UsuarioOut, dependencies=[Depends(requer_roles("ADMIN"))])
@@ -62,7 +93,7 @@ def obter_usuario(usuario_id: UUID, db: Session = Depends(get_db)):
 def excluir_usuario(
     usuario_id: UUID,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado)
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado)
 ):
     # Permitir apenas admin excluir
     if usuario_logado.role != "ADMIN":
@@ -85,6 +116,8 @@ def excluir_usuario(
     # Marca como inativo em vez de apagar
     usuario.ativo = False
     db.commit()
+    cache_usuarios.invalidar(usuario.id)
+    cache_dashboard.invalidar(usuario.id)
 
     return {"message": f"Usuário {usuario.nome} foi desativado com sucesso"}
 
@@ -93,7 +126,7 @@ def atualizar_usuario(
     usuario_id: UUID,
     usuario_data: UsuarioUpdate,
     db: Session = Depends(get_db),
-    usuario_logado: Usuario = Depends(get_usuario_logado)
+    usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado)
 ):
     # Somente admin pode editar outros usuários
     if usuario_logado.role != "ADMIN":
@@ -109,11 +142,13 @@ def atualizar_usuario(
     # Atualiza os campos informados
     for campo, valor in usuario_data.model_dump(exclude_unset=True).items():
         if campo == "senha":
-            setattr(usuario, "senha_hash", gerar_hash_senha(valor))
+            setattr(usuario, "senha_hash", pool_senhas.gerar_hash_sync(valor))
         else:
             setattr(usuario, campo, valor)
 
     db.commit()
+    cache_usuarios.invalidar(usuario.id)
+    cache_dashboard.invalidar(usuario.id)
     db.refresh(usuario)
     return usuario
 
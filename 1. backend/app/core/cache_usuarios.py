@@ -0,0 +1,101 @@
+# app/core/cache_usuarios.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class UsuarioAutenticado:
+    """
+    O que as rotas precisam saber de quem fez o request: id (também é o
+    escopo de tenant dos clientes: lugares.usuario_id), role e ativo.
+    Não é um objeto do SQLAlchemy; rotas que alteram o próprio usuário usam
+    `get_usuario_logado_db`.
+    """
+    id: UUID
+    role: str
+    ativo: bool
+    nome: str
+    email: str
+
+    @classmethod
+    def do_modelo(cls, usuario: Any) -> "UsuarioAutenticado":
+        return cls(
+            id=usuario.id,
+            role=usuario.role,
+            ativo=usuario.ativo is not False,
+            nome=usuario.nome,
+            email=usuario.email,
+        )
+
+
+class CacheUsuarios:
+    """
+    Cache sub -> UsuarioAutenticado, limitado por TTL e por quantidade (LRU).
+
+    Evita a consulta em `usuarios` a cada request autenticado. As rotas que
+    alteram usuários chamam `invalidar`; como o cache é local ao processo,
+    alterações feitas em outro processo valem no máximo depois do TTL.
+    """
+
+    def __init__(self, ttl_s: float, max_itens: int):
+        self.ttl_s = ttl_s
+        self.max_itens = max_itens
+        self._itens: "OrderedDict[str, Tuple[float, UsuarioAutenticado]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._contadores = {"hits": 0, "misses": 0, "expirados": 0, "despejados": 0, "invalidacoes": 0}
+
+    def buscar(self, sub: str) -> Optional[UsuarioAutenticado]:
+        with self._lock:
+            item = self._itens.get(sub)
+            if item is None:
+                self._contadores["misses"] += 1
+                return None
+            expira_em, usuario = item
+            if expira_em <= time.monotonic():
+                del self._itens[sub]
+                self._contadores["expirados"] += 1
+                self._contadores["misses"] += 1
+                return None
+            self._itens.move_to_end(sub)
+            self._contadores["hits"] += 1
+            return usuario
+
+    def guardar(self, sub: str, usuario: UsuarioAutenticado) -> None:
+        if self.max_itens <= 0 or self.ttl_s <= 0:
+            return
+        with self._lock:
+            self._itens[sub] = (time.monotonic() + self.ttl_s, usuario)
+            self._itens.move_to_end(sub)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self._contadores["despejados"] += 1
+
+    def invalidar(self, usuario_id: Any) -> None:
+        """Descarta o usuário (chamar depois do commit que o alterou)."""
+        with self._lock:
+            if self._itens.pop(str(usuario_id), None) is not None:
+                self._contadores["invalidacoes"] += 1
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            stats["itens"] = len(self._itens)
+            stats["max_itens"] = self.max_itens
+            stats["ttl_s"] = self.ttl_s
+        return stats
+
+
+cache_usuarios = CacheUsuarios(
+    ttl_s=settings.AUTH_CACHE_USUARIOS_TTL_S,
+    max_itens=settings.AUTH_CACHE_USUARIOS_MAX,
+)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     SECRET_KEY: str
@@ -13,6 +13,78 @@ class Settings(BaseSettings):
     MQTT_USERNAME: Optional[str] = None
     MQTT_PASSWORD: Optional[str] = None
 
+    # Pools de conexões ao Postgres: um para a API e outro para as threads da ingestão
+    DB_POOL_SIZE: int = 10                  # conexões mantidas abertas (API)
+    DB_POOL_MAX_OVERFLOW: int = 20          # extras abertas sob pico e fechadas na devolução (API)
+    DB_INGESTAO_POOL_SIZE: int = 5          # writer, presença, rastreio, partições, roteamento
+    DB_INGESTAO_POOL_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT_S: float = 10.0         # espera máxima por uma conexão livre; depois, erro
+    DB_POOL_RECYCLE_S: int = 1800           # reabre conexões mais velhas que isso (-1 = nunca)
+    DB_POOL_PRE_PING: Literal["sempre", "ocioso", "nunca"] = "ocioso"   # "sempre" (SELECT 1 a cada checkout), "ocioso" ou "nunca"
+    DB_POOL_PRE_PING_OCIOSO_S: float = 30.0 # "ocioso": só pinga conexões paradas há mais que isso
+
+    # Ingestão MQTT: "thread" (paho + workers + writer em thread) ou
+    # "async" (aiomqtt + SQLAlchemy async/asyncpg dentro do event loop)
+    MQTT_INGESTOR_MODE: str = "thread"
+
+    # Publicação de comandos (publicador compartilhado, com loop de rede próprio)
+    MQTT_COMANDO_QOS: int = 1               # 0 = sem PUBACK; 1 = broker confirma o recebimento
+    MQTT_PUBLICAR_TIMEOUT_S: float = 5.0    # espera máxima pelo PUBACK quando o request pede (aguardar_ack)
+    MQTT_MAX_INFLIGHT: int = 1000           # publicações QoS>0 em voo sem ack (o padrão do paho é 20)
+    COMANDOS_LOTE_MAX: int = 5000           # dispositivos por chamada de POST /dispositivos/comandos
+    COMANDOS_TIMEOUT_S: float = 30.0        # sem status / config-atual do dispositivo nesse prazo, o comando expira
+    COMANDOS_FLUSH_S: float = 1.0           # de quanto em quanto tempo o rastreador grava os comandos em lote
+
+    # Ingestão MQTT: gravação das leituras em lote
+    INGEST_FLUSH_SIZE: int = 500            # grava quando o lote atinge esse tamanho...
+    INGEST_FLUSH_INTERVAL_MS: int = 500     # ...ou quando a leitura mais antiga espera isso
+    INGEST_QUEUE_MAXSIZE: int = 10000       # fila em memória entre o MQTT e o banco
+    INGEST_ENQUEUE_TIMEOUT_S: float = 5.0   # backpressure: quanto o worker espera com a fila do writer cheia
+    INGEST_WORKERS: int = 4                 # threads que processam as mensagens (mesmo dispositivo -> mesmo worker)
+    INGEST_WORKER_QUEUE_MAXSIZE: int = 2000 # fila de cada worker (cheia = descarta, sem travar o paho)
+
+    # Partições mensais de leituras
+    LEITURAS_PARTICOES_FUTURAS: int = 3           # meses criados à frente do atual
+    LEITURAS_RETENCAO_MESES: int = 0              # 0 = mantém todo o histórico
+    LEITURAS_RETENCAO_ACAO: Literal["detach", "drop"] = "detach"   # "detach" (mantém a tabela solta) ou "drop"
+    LEITURAS_PARTICOES_INTERVALO_S: int = 21600   # de quanto em quanto tempo roda a manutenção
+
+    # Presença online/offline (dispositivos.status), a partir das mensagens e do tópico `conn` (LWT)
+    PRESENCA_TIMEOUT_S: int = 180           # sem nenhuma mensagem nesse tempo, o dispositivo fica offline
+    PRESENCA_FLUSH_S: float = 2.0           # de quanto em quanto tempo as mudanças de status vão para o banco
+
+    # Índice em memória base_topic -> dispositivo (0 desativa a recarga periódica)
+    ROTEAMENTO_REFRESH_S: int = 300
+
+    # Autenticação: cache sub -> usuário (role / ativo) usado por get_usuario_logado (0 desativa)
+    AUTH_CACHE_USUARIOS_TTL_S: int = 60
+    AUTH_CACHE_USUARIOS_MAX: int = 10000
+    AUTH_CACHE_TOKENS_MAX: int = 10000      # tokens já verificados (valem até o exp); 0 desativa
+    AUTH_JWT_RAPIDO: bool = True            # HS256/384/512 verificado com hmac da stdlib em vez do python-jose
+
+    # Senhas: bcrypt em um pool de processos (hashes com outro custo são refeitos no login)
+    BCRYPT_ROUNDS: int = 12
+    SENHAS_WORKERS: int = 2                 # processos do pool
+    SENHAS_FILA_MAX: int = 64               # pedidos esperando além dos em execução; acima disso, 503
+
+    # Push do estado ao vivo (SSE em /leituras/stream)
+    PUSH_MAX_CONEXOES: int = 1000           # conexões simultâneas por processo; acima disso, 503
+    PUSH_MAX_PENDENTES: int = 500           # dispositivos com atualização pendente por conexão (o resto é descartado)
+    PUSH_KEEPALIVE_S: int = 15              # comentário SSE enviado quando não há novidade
+
+    # Dashboard: resumo cacheado por tenant (0 desativa)
+    DASHBOARD_CACHE_TTL_S: int = 10
+    DASHBOARD_CACHE_MAX: int = 5000
+
+    # Relatórios
+    RELATORIOS_USAR_ROLLUPS: bool = True    # False = métricas em uma agregação SQL sobre o histórico bruto
+    RELATORIO_MAX_PONTOS: int = 2000        # pontos da série no JSON (média por intervalo); 0 = série completa
+    RELATORIO_CSV_LOTE: int = 5000          # linhas lidas do cursor por pedaço do CSV em streaming
+    RELATORIO_PDF_WORKERS: int = 2          # processos que renderizam PDFs
+    RELATORIO_PDF_CACHE_DIR: str = ""       # vazio = <tmp>/sial_relatorios_pdf
+    RELATORIO_PDF_CACHE_MB: int = 256       # tamanho máximo do cache de PDFs (LRU)
+    RELATORIO_PDF_JOB_TTL_S: int = 3600     # por quanto tempo o status de um job fica consultável
+
     class Config:
         env_file = ".env"
 
@@ -1,11 +1,15 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from app.core.cache_usuarios import UsuarioAutenticado, cache_usuarios
 from app.core.security import decodificar_token
 from app.db.session import SessionLocal
 from app.models.usuario import Usuario
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+oauth2_scheme_opcional = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 def get_db():
     db = SessionLocal()
@@ -14,18 +18,63 @@ def get_db():
     finally:
         db.close()
 
-def get_usuario_logado(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Usuario:
+def _payload_do_token(token: str) -> dict:
     payload = decodificar_token(token)
     if not payload or "sub" not in payload:
         raise HTTPException(status_code=401, detail="Token inválido")
-    
-    usuario = db.query(Usuario).get(payload["sub"])
+    return payload
+
+def _conferir_ativo(usuario) -> None:
+    if getattr(usuario, "ativo", True) is False:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuário inativo")
+
+def get_usuario_logado(token: str = Depends(oauth2_scheme)) -> UsuarioAutenticado:
+    """
+    Usuário do token, servido do cache_usuarios: na maioria dos requests não
+    abre sessão no banco. No miss, busca em uma sessão própria e guarda.
+    """
+    sub = str(_payload_do_token(token)["sub"])
+
+    usuario = cache_usuarios.buscar(sub)
+    if usuario is None:
+        db = SessionLocal()
+        try:
+            modelo = db.query(Usuario).get(sub)
+            if not modelo:
+                raise HTTPException(status_code=404, detail="Usuário não encontrado")
+            usuario = UsuarioAutenticado.do_modelo(modelo)
+        finally:
+            db.close()
+        cache_usuarios.guardar(sub, usuario)
+
+    _conferir_ativo(usuario)
+    return usuario
+
+def get_usuario_logado_stream(
+    token_header: Optional[str] = Depends(oauth2_scheme_opcional),
+    token: Optional[str] = Query(None, description="Token, para clientes que não mandam headers (EventSource)"),
+) -> UsuarioAutenticado:
+    """get_usuario_logado aceitando o token também na query string (?token=)."""
+    token = token_header or token
+    if not token:
+        raise HTTPException(
+            status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"}
+        )
+    return get_usuario_logado(token)
+
+def get_usuario_logado_db(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Usuario:
+    """Usuário do token como modelo do banco, na sessão do request (para rotas que o alteram)."""
+    sub = str(_payload_do_token(token)["sub"])
+
+    usuario = db.query(Usuario).get(sub)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    cache_usuarios.guardar(sub, UsuarioAutenticado.do_modelo(usuario))
+    _conferir_ativo(usuario)
     return usuario
 
 def requer_roles(*roles: str):
-    def _dep(usuario: Usuario = Depends(get_usuario_logado)) -> Usuario:
+    def _dep(usuario: UsuarioAutenticado = Depends(get_usuario_logado)) -> UsuarioAutenticado:
         role = getattr(usuario, "role", getattr(usuario, "tipo", None))
         if role not in roles:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado")
@@ -0,0 +1,29 @@
+# app/core/hash_senhas.py
+"""
+Hash / verificação bcrypt, executados dentro dos processos do pool de senhas
+(app/core/pool_senhas.py). Só depende do passlib: nada de settings nem banco,
+para o processo filho subir rápido; o custo chega como argumento.
+"""
+from typing import Optional
+
+from passlib.hash import bcrypt
+
+
+def gerar_hash(senha: str, custo: int) -> str:
+    return bcrypt.using(rounds=custo).hash(senha)
+
+
+def verificar(senha: str, senha_hash: str) -> bool:
+    try:
+        return bcrypt.verify(senha, senha_hash)
+    except (ValueError, TypeError):
+        # hash em formato inesperado: senha não confere
+        return False
+
+
+def custo_do_hash(senha_hash: str) -> Optional[int]:
+    """Custo (rounds) gravado em um hash bcrypt "$2b$12$...", ou None."""
+    try:
+        return int(senha_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
@@ -0,0 +1,111 @@
+# app/core/pool_senhas.py
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.core import hash_senhas
+from app.core.config import settings
+
+
+class PoolSenhasOcupado(Exception):
+    """A fila do pool de senhas está cheia (a API responde 503)."""
+
+
+class PoolSenhas:
+    """
+    Hash / verificação bcrypt fora das threads da API.
+
+    O bcrypt é CPU pura de propósito: uma rajada de logins no threadpool do
+    FastAPI trava todos os outros requests. Aqui ele roda em um pool de
+    processos com `workers` processos e no máximo `fila_max` pedidos
+    esperando; além disso o pedido é recusado na hora (PoolSenhasOcupado)
+    em vez de acumular. O pool usa "spawn" e os filhos só importam
+    app/core/hash_senhas.py.
+    """
+
+    def __init__(self, workers: int, fila_max: int, custo: int):
+        self.workers = max(1, workers)
+        self.fila_max = max(0, fila_max)
+        self.custo = custo
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._em_andamento = 0
+        self._contadores = {"pedidos": 0, "concluidos": 0, "rejeitados": 0, "erros": 0, "pico_fila": 0}
+        self._tempo_total_s = 0.0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _enviar(self, funcao: Callable[..., Any], *args: Any) -> Future:
+        inicio = time.perf_counter()
+        with self._lock:
+            if self._em_andamento >= self.workers + self.fila_max:
+                self._contadores["rejeitados"] += 1
+                raise PoolSenhasOcupado()
+            future = self._pool().submit(funcao, *args)
+            self._em_andamento += 1
+            self._contadores["pedidos"] += 1
+            self._contadores["pico_fila"] = max(self._contadores["pico_fila"], self._em_andamento - self.workers)
+
+        # fora do lock: se o future já terminou, o callback roda aqui mesmo
+        future.add_done_callback(lambda f: self._finalizar(f, inicio))
+        return future
+
+    def _finalizar(self, future: Future, inicio: float) -> None:
+        with self._lock:
+            self._em_andamento -= 1
+            self._tempo_total_s += time.perf_counter() - inicio
+            falhou = future.cancelled() or future.exception() is not None
+            self._contadores["erros" if falhou else "concluidos"] += 1
+
+    # ========= API =========
+
+    async def verificar(self, senha: str, senha_hash: str) -> bool:
+        return await asyncio.wrap_future(self._enviar(hash_senhas.verificar, senha, senha_hash))
+
+    async def gerar_hash(self, senha: str) -> str:
+        return await asyncio.wrap_future(self._enviar(hash_senhas.gerar_hash, senha, self.custo))
+
+    def verificar_sync(self, senha: str, senha_hash: str) -> bool:
+        """Para rotas síncronas: a thread espera, mas o bcrypt roda no pool."""
+        return self._enviar(hash_senhas.verificar, senha, senha_hash).result()
+
+    def gerar_hash_sync(self, senha: str) -> str:
+        return self._enviar(hash_senhas.gerar_hash, senha, self.custo).result()
+
+    def precisa_rehash(self, senha_hash: str) -> bool:
+        """Hash gravado com outro custo (BCRYPT_ROUNDS mudou): refazer no próximo login."""
+        return hash_senhas.custo_do_hash(senha_hash) != self.custo
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            stats["em_execucao"] = min(self._em_andamento, self.workers)
+            stats["na_fila"] = max(0, self._em_andamento - self.workers)
+            stats["workers"] = self.workers
+            stats["fila_max"] = self.fila_max
+            stats["custo"] = self.custo
+            finalizados = stats["concluidos"] + stats["erros"]
+            stats["tempo_medio_ms"] = round(self._tempo_total_s * 1000 / finalizados, 1) if finalizados else None
+        return stats
+
+    def encerrar(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pool_senhas = PoolSenhas(
+    workers=settings.SENHAS_WORKERS,
+    fila_max=settings.SENHAS_FILA_MAX,
+    custo=settings.BCRYPT_ROUNDS,
+)
@@ -1,10 +1,21 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Na API o bcrypt roda no pool de processos (app/core/pool_senhas.py);
+# estas versões em processo ficam para scripts (create_admin).
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 def verificar_senha(senha_plain, senha_hash):
     return pwd_context.verify(senha_plain, senha_hash)
@@ -24,9 +35,127 @@ def criar_token_acesso(sub: str, extra: Optional[dict] = None, expires_delta: Op
         to_encode.update(extra)
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
-def decodificar_token(token: str):
+class CacheTokens:
+    """
+    Cache token -> payload já verificado, limitado por quantidade (LRU).
+    Cada entrada vale até o `exp` do próprio token. Só tokens válidos entram.
+    """
+
+    def __init__(self, max_itens: int):
+        self.max_itens = max_itens
+        self._itens: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._contadores = {"hits": 0, "misses": 0, "expirados": 0, "despejados": 0}
+
+    def buscar(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._itens.get(token)
+            if item is None:
+                self._contadores["misses"] += 1
+                return None
+            expira_em, payload = item
+            if expira_em < time.time():
+                del self._itens[token]
+                self._contadores["expirados"] += 1
+                self._contadores["misses"] += 1
+                return None
+            self._itens.move_to_end(token)
+            self._contadores["hits"] += 1
+            return payload
+
+    def guardar(self, token: str, payload: Dict[str, Any]) -> None:
+        if self.max_itens <= 0:
+            return
+        exp = payload.get("exp")
+        expira_em = float(exp) if isinstance(exp, (int, float)) else math.inf
+        with self._lock:
+            self._itens[token] = (expira_em, payload)
+            self._itens.move_to_end(token)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self._contadores["despejados"] += 1
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            stats["itens"] = len(self._itens)
+            stats["max_itens"] = self.max_itens
+        return stats
+
+
+cache_tokens = CacheTokens(settings.AUTH_CACHE_TOKENS_MAX)
+
+_HMAC = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+def _b64decode(parte: str) -> bytes:
+    return base64.urlsafe_b64decode(parte + "=" * (-len(parte) % 4))
+
+
+def _decodificar_hmac(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Verificação direta (hmac + base64 + json da stdlib) de um JWT HS256/384/512,
+    com as mesmas regras que o jose.jwt.decode aplica por padrão: algoritmo do
+    cabeçalho igual ao configurado, assinatura, exp / nbf / iat numéricos,
+    sem `aud` (não pedimos audiência) e sub / jti como texto.
+    """
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except JWTError:
+        cabecalho_b64, payload_b64, assinatura_b64 = token.split(".")
+        cabecalho = json.loads(_b64decode(cabecalho_b64))
+        if not isinstance(cabecalho, dict) or cabecalho.get("alg") != settings.ALGORITHM:
+            return None
+        esperada = hmac.new(
+            settings.SECRET_KEY.encode("utf-8"),
+            f"{cabecalho_b64}.{payload_b64}".encode("ascii"),
+            _HMAC[settings.ALGORITHM],
+        ).digest()
+        if not hmac.compare_digest(esperada, _b64decode(assinatura_b64)):
+            return None
+        payload = json.loads(_b64decode(payload_b64))
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    agora = time.time()
+    for claim in ("exp", "nbf", "iat"):
+        valor = payload.get(claim)
+        if valor is not None and (isinstance(valor, bool) or not isinstance(valor, (int, float))):
+            return None
+    if "exp" in payload and payload["exp"] < agora:
+        return None
+    if "nbf" in payload and payload["nbf"] > agora:
         return None
+    if "aud" in payload:
+        return None
+    for claim in ("sub", "jti"):
+        if claim in payload and not isinstance(payload[claim], str):
+            return None
+    return payload
+
+
+def decodificar_token(token: str):
+    """
+    Payload do token, ou None se inválido/expirado. Tokens já verificados vêm
+    do cache_tokens; HS* é verificado direto (AUTH_JWT_RAPIDO), o resto pelo jose.
+    O payload devolvido é compartilhado pelo cache: não alterar.
+    """
+    payload = cache_tokens.buscar(token)
+    if payload is not None:
+        return payload
+
+    if settings.AUTH_JWT_RAPIDO and settings.ALGORITHM in _HMAC:
+        payload = _decodificar_hmac(token)
+    else:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return None
+
+    if payload is not None:
+        cache_tokens.guardar(token, payload)
+    return payload
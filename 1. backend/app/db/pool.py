@@ -0,0 +1,150 @@
+# app/db/pool.py
+import bisect
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# faixas do histograma de espera no checkout (ms)
+LIMITES_ESPERA_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+PRE_PING_SEMPRE = "sempre"      # SELECT 1 a cada checkout (pool_pre_ping do SQLAlchemy)
+PRE_PING_OCIOSO = "ocioso"      # só quando a conexão ficou parada mais que o limite
+PRE_PING_NUNCA = "nunca"        # confia no pool_recycle
+
+
+class MedidorPool:
+    """
+    Contadores de um pool de conexões: espera no checkout (média, máxima,
+    histograma), timeouts, conexões abertas / invalidadas e pre-pings.
+    As contagens "agora" (em uso, ociosas, overflow) vêm do próprio pool.
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self._lock = threading.Lock()
+        self._contagens = [0] * (len(LIMITES_ESPERA_MS) + 1)
+        self._contadores = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "conexoes_abertas": 0,
+            "invalidadas": 0,
+            "pre_pings": 0,
+            "pre_pings_falhos": 0,
+        }
+        self._espera_soma_ms = 0.0
+        self._espera_max_ms = 0.0
+        self._em_uso_pico = 0
+
+    def espera(self, ms: float, em_uso: int) -> None:
+        with self._lock:
+            self._contadores["checkouts"] += 1
+            self._contagens[bisect.bisect_left(LIMITES_ESPERA_MS, ms)] += 1
+            self._espera_soma_ms += ms
+            if ms > self._espera_max_ms:
+                self._espera_max_ms = ms
+            if em_uso > self._em_uso_pico:
+                self._em_uso_pico = em_uso
+
+    def contar(self, chave: str) -> None:
+        with self._lock:
+            self._contadores[chave] += 1
+
+    def estatisticas(self, pool: QueuePool) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            n = stats["checkouts"]
+            stats["espera_media_ms"] = round(self._espera_soma_ms / n, 3) if n else 0.0
+            stats["espera_max_ms"] = round(self._espera_max_ms, 3)
+            stats["espera_limites_ms"] = list(LIMITES_ESPERA_MS)
+            stats["espera_contagens"] = list(self._contagens)
+            stats["em_uso_pico"] = self._em_uso_pico
+        stats["em_uso"] = pool.checkedout()
+        stats["ociosas"] = pool.checkedin()
+        stats["overflow"] = max(pool.overflow(), 0)
+        stats["tamanho"] = pool.size()
+        stats["max_overflow"] = pool._max_overflow
+        stats["timeout_s"] = pool.timeout()
+        return stats
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que mede quanto cada checkout esperou por uma conexão."""
+
+    medidor: MedidorPool
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except exc.TimeoutError:
+            self.medidor.contar("timeouts")
+            raise
+        self.medidor.espera((time.perf_counter() - inicio) * 1000, self.checkedout())
+        return conexao
+
+    def recreate(self):
+        # engine.dispose() troca o pool por um novo: os contadores continuam
+        novo = super().recreate()
+        novo.medidor = self.medidor
+        return novo
+
+
+def instrumentar(engine: Engine, nome: str, pre_ping: str, ocioso_s: float) -> MedidorPool:
+    """
+    Liga o medidor ao pool do engine (criado com poolclass=PoolMedido) e a
+    política de pre-ping (ver `configurar_pre_ping`).
+    """
+    medidor = MedidorPool(nome)
+    engine.pool.medidor = medidor
+
+    @event.listens_for(engine, "connect")
+    def _conectou(dbapi_connection, connection_record):
+        medidor.contar("conexoes_abertas")
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidada(dbapi_connection, connection_record, exception):
+        medidor.contar("invalidadas")
+
+    configurar_pre_ping(engine, pre_ping, ocioso_s, medidor)
+    return medidor
+
+
+def configurar_pre_ping(engine: Engine, pre_ping: str, ocioso_s: float, medidor: Optional[MedidorPool] = None) -> None:
+    """
+    pre_ping="ocioso": só pinga as conexões paradas há mais de `ocioso_s`
+    (conexão usada há pouco não paga a ida e volta extra). "sempre" é o
+    pool_pre_ping do próprio engine e "nunca" não faz nada, então aqui só
+    o "ocioso" registra eventos. Serve também para o engine async
+    (passando `async_engine.sync_engine`).
+    """
+    if pre_ping != PRE_PING_OCIOSO:
+        return
+
+    def _contar(chave: str) -> None:
+        if medidor is not None:
+            medidor.contar(chave)
+
+    @event.listens_for(engine, "checkin")
+    def _devolvida(dbapi_connection, connection_record):
+        connection_record.info["devolvida_em"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _retirada(dbapi_connection, connection_record, connection_proxy):
+        devolvida_em = connection_record.info.get("devolvida_em")
+        if devolvida_em is None or time.monotonic() - devolvida_em < ocioso_s:
+            return
+        _contar("pre_pings")
+        try:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+        except Exception:
+            _contar("pre_pings_falhos")
+            # o pool descarta esta conexão e tenta outra
+            raise exc.DisconnectionError()
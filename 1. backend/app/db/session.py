@@ -1,6 +1,39 @@
+from typing import Any, Dict
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool import PRE_PING_SEMPRE, PoolMedido, instrumentar
+
+
+def _criar_engine(nome: str, pool_size: int, max_overflow: int):
+    engine = create_engine(
+        settings.DATABASE_URL,
+        poolclass=PoolMedido,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT_S,
+        pool_recycle=settings.DB_POOL_RECYCLE_S,
+        pool_pre_ping=settings.DB_POOL_PRE_PING == PRE_PING_SEMPRE,
+    )
+    instrumentar(engine, nome, settings.DB_POOL_PRE_PING, settings.DB_POOL_PRE_PING_OCIOSO_S)
+    return engine
+
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+# Requests da API (e scripts)
+engine = _criar_engine("api", settings.DB_POOL_SIZE, settings.DB_POOL_MAX_OVERFLOW)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Threads de fundo da ingestão (writer, presença, rastreio de comandos, partições...):
+# pool próprio, para um pico de requests não segurar a gravação das leituras e vice-versa
+engine_ingestao = _criar_engine("ingestao", settings.DB_INGESTAO_POOL_SIZE, settings.DB_INGESTAO_POOL_MAX_OVERFLOW)
+SessionIngestao = sessionmaker(autocommit=False, autoflush=False, bind=engine_ingestao)
+
+
+def estatisticas_pools() -> Dict[str, Any]:
+    return {
+        "api": engine.pool.medidor.estatisticas(engine.pool),
+        "ingestao": engine_ingestao.pool.medidor.estatisticas(engine_ingestao.pool),
+        "pre_ping": settings.DB_POOL_PRE_PING,
+        "recycle_s": settings.DB_POOL_RECYCLE_S,
+    }
@@ -0,0 +1,29 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.core.config import settings
+from app.db.pool import PRE_PING_SEMPRE, configurar_pre_ping
+
+
+def _url_async(url: str) -> str:
+    """
+    Troca o driver síncrono da DATABASE_URL pelo asyncpg
+    (postgresql:// ou postgresql+psycopg2:// -> postgresql+asyncpg://).
+    """
+    for prefixo in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefixo):
+            return "postgresql+asyncpg://" + url[len(prefixo):]
+    return url
+
+
+# Só é importado no modo de ingestão "async" (precisa do asyncpg instalado)
+# É o pool da ingestão neste modo: mesmos limites de DB_INGESTAO_POOL_*
+async_engine = create_async_engine(
+    _url_async(settings.DATABASE_URL),
+    pool_size=settings.DB_INGESTAO_POOL_SIZE,
+    max_overflow=settings.DB_INGESTAO_POOL_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_S,
+    pool_recycle=settings.DB_POOL_RECYCLE_S,
+    pool_pre_ping=settings.DB_POOL_PRE_PING == PRE_PING_SEMPRE,
+)
+# "ocioso": mesmos eventos do pool síncrono (os eventos de pool ficam no sync_engine)
+configurar_pre_ping(async_engine.sync_engine, settings.DB_POOL_PRE_PING, settings.DB_POOL_PRE_PING_OCIOSO_S)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
@@ -1,8 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.db.init_db import init_db  
 from fastapi.middleware.cors import CORSMiddleware
-from app.services.mqtt_ingestor import start_mqtt_ingestor
-from app.api import auth, usuarios, dispositivos, leituras, lugares, dashboard, relatorios
+from app.core.config import settings
+from app.core.paginacao import HEADER_PROXIMO_CURSOR
+from app.core.pool_senhas import PoolSenhasOcupado, pool_senhas
+from app.services.mqtt_ingestor import cliente_mqtt, start_mqtt_ingestor, stop_mqtt_ingestor
+from app.services.mqtt_ingestor_async import start_mqtt_ingestor_async, stop_mqtt_ingestor_async
+from app.services.mqtt_publisher import publicador_mqtt
+from app.services.rastreio_comandos import rastreio_comandos
+from app.services.roteamento_dispositivos import indice_roteamento
+from app.services.estado_dispositivos import estado_dispositivos
+from app.services.presenca_dispositivos import presenca_dispositivos
+from app.services.particoes_leituras import iniciar_manutencao_particoes
+from app.services.relatorio_jobs import fila_relatorios_pdf
+from app.api import auth, usuarios, dispositivos, leituras, lugares, dashboard, relatorios, metricas
 
 
 app = FastAPI()
@@ -18,8 +30,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],         # permite todos os métodos (GET, POST, etc)
     allow_headers=["*"],         # permite todos os headers
+    expose_headers=[HEADER_PROXIMO_CURSOR, "ETag"],   # legíveis pelo JS do front
 )
 
+@app.exception_handler(PoolSenhasOcupado)
+async def pool_senhas_ocupado(request: Request, exc: PoolSenhasOcupado):
+    # rajada de logins / trocas de senha além da fila do pool de bcrypt
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servidor ocupado, tente novamente em instantes."},
+        headers={"Retry-After": "1"},
+    )
+
 app.include_router(auth.router)
 app.include_router(usuarios.router)
 app.include_router(lugares.router)
@@ -27,8 +49,33 @@ app.include_router(dispositivos.router)
 app.include_router(leituras.router)
 app.include_router(dashboard.router)
 app.include_router(relatorios.router)
+app.include_router(metricas.router)
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
-    start_mqtt_ingestor()
+    iniciar_manutencao_particoes()
+    indice_roteamento.carregar()
+    indice_roteamento.iniciar_refresh_periodico(settings.ROTEAMENTO_REFRESH_S)
+    estado_dispositivos.carregar()
+    rastreio_comandos.iniciar()
+    presenca_dispositivos.carregar()
+    presenca_dispositivos.iniciar()
+    if settings.MQTT_INGESTOR_MODE == "async":
+        await start_mqtt_ingestor_async()
+        publicador_mqtt.iniciar()
+    else:
+        start_mqtt_ingestor()
+        publicador_mqtt.iniciar(reaproveitar=cliente_mqtt())   # usa a conexão do ingestor
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    publicador_mqtt.encerrar()
+    if settings.MQTT_INGESTOR_MODE == "async":
+        await stop_mqtt_ingestor_async()
+    else:
+        stop_mqtt_ingestor()
+    rastreio_comandos.parar()
+    presenca_dispositivos.parar()
+    fila_relatorios_pdf.encerrar()
+    pool_senhas.encerrar()
@@ -0,0 +1,46 @@
+import uuid
+from sqlalchemy import Column, String, SmallInteger, REAL, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+from app.db.base import Base
+
+# estados de um comando
+COMANDO_ENVIADO = "enviado"         # publicado, esperando o dispositivo
+COMANDO_CONFIRMADO = "confirmado"   # broker confirmou (PUBACK), esperando o dispositivo
+COMANDO_RESPONDIDO = "respondido"   # dispositivo publicou status / config-atual depois do comando
+COMANDO_EXPIRADO = "expirado"       # sem resposta do dispositivo dentro de COMANDOS_TIMEOUT_S
+COMANDO_FALHOU = "falhou"           # não chegou a ser publicado
+
+
+class Comando(Base):
+    """
+    Um comando enviado a um dispositivo. O `id` é o id de correlação: o
+    rastreador (app/services/rastreio_comandos.py) casa a próxima publicação
+    de `status` / `config-atual` do dispositivo com o comando pendente mais
+    antigo dele e grava os tempos (broker e ida e volta) em lote.
+    """
+    __tablename__ = "comandos"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    dispositivo_id = Column(UUID(as_uuid=True), ForeignKey("dispositivos.id"), nullable=False)
+    usuario_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=True)
+
+    acao = Column(String, nullable=False)
+    topic = Column(String, nullable=False)
+    payload = Column(String, nullable=False)
+    qos = Column(SmallInteger, nullable=False, default=0)
+
+    estado = Column(String, nullable=False, default=COMANDO_ENVIADO)
+    enviado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    confirmado_em = Column(DateTime, nullable=True)      # PUBACK do broker
+    respondido_em = Column(DateTime, nullable=True)      # publicação do dispositivo
+    resposta = Column(String, nullable=True)             # "status" | "config-atual"
+
+    broker_ms = Column(REAL, nullable=True)              # publish -> PUBACK
+    ida_volta_ms = Column(REAL, nullable=True)           # publish -> resposta do dispositivo
+    erro = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_comandos_dispositivo_enviado", dispositivo_id, enviado_em.desc()),
+    )
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Float, Integer, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, Float, Integer, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -21,3 +21,9 @@ class Dispositivo(Base):
 
     ativo = Column(Boolean, default=True)
     criado_em = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # paginação por cursor em (criado_em, id): todos e por lugar
+        Index("ix_dispositivos_criado_em_id", criado_em, id),
+        Index("ix_dispositivos_lugar_criado_em_id", lugar_id, criado_em, id),
+    )
@@ -1,17 +1,150 @@
-import uuid
-from sqlalchemy import Column, Float, String, Integer, DateTime, ForeignKey
+import math
+import struct
+from typing import Any, Dict, Optional
+from sqlalchemy import Column, BigInteger, Sequence, REAL, SmallInteger, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
 
-class Leitura(Base):
+# status do umidificador/tomada guardado como smallint
+STATUS_LIGADO = 1
+STATUS_DESLIGADO = 0
+_STATUS_TEXTO = {
+    "1": STATUS_LIGADO, "ligado": STATUS_LIGADO, "on": STATUS_LIGADO, "true": STATUS_LIGADO,
+    "0": STATUS_DESLIGADO, "desligado": STATUS_DESLIGADO, "off": STATUS_DESLIGADO, "false": STATUS_DESLIGADO,
+}
+
+
+class _ColunasLeitura:
+    """
+    Colunas de valores comuns a `leituras` (histórico) e `leituras_ultimas` (estado atual).
+    """
+
+    # colunas nativas para o que todo dispositivo manda
+    umidade = Column(REAL, nullable=True)
+    temperatura = Column(REAL, nullable=True)
+    potencia = Column(SmallInteger, nullable=True)
+    status = Column(SmallInteger, nullable=True)     # 1 = ligado, 0 = desligado
+
+    extras = Column(JSONB, nullable=True)            # o que não cabe nas colunas (ex: config_atual, umidade_raw)
+
+    @property
+    def dados(self) -> Dict[str, Any]:
+        """
+        Visão "dict" da leitura, no mesmo formato do antigo JSONB `dados`
+        (mantém compatível quem consome LeituraOut.dados).
+        """
+        dados: Dict[str, Any] = dict(self.extras or {})
+        if self.umidade is not None:
+            dados["umidade"] = self.umidade
+        if self.temperatura is not None:
+            dados["temperatura"] = self.temperatura
+        if self.potencia is not None:
+            dados["potencia"] = self.potencia
+        if self.status is not None:
+            dados["status"] = "ligado" if self.status == STATUS_LIGADO else "desligado"
+        return dados
+
+
+class Leitura(_ColunasLeitura, Base):
     __tablename__ = "leituras"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    # a PK de tabela particionada precisa conter a chave de partição
+    id = Column(BigInteger, Sequence("leituras_id_seq"), primary_key=True)
 
     dispositivo_id = Column(UUID(as_uuid=True), ForeignKey("dispositivos.id"), nullable=False)
     dispositivo = relationship("Dispositivo")
 
-    dados = Column(JSONB, nullable=False)            # ex: {"umidade":71.4,"temperatura":25.6,"status":"ligado","potencia":2}
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, nullable=False, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # "últimas N leituras do dispositivo" sai direto do índice, já ordenado,
+        # sem sort e (para as colunas incluídas) sem ir à tabela
+        Index(
+            "ix_leituras_dispositivo_timestamp",
+            dispositivo_id,
+            timestamp.desc(),
+            id.desc(),
+            postgresql_include=["umidade", "temperatura", "potencia", "status"],
+        ),
+        # particionada por mês em timestamp (partições: app/services/particoes_leituras.py)
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+
+class LeituraUltima(_ColunasLeitura, Base):
+    """
+    Estado mais recente de cada dispositivo (uma linha por dispositivo),
+    atualizado pelo writer da ingestão a cada lote. Cada coluna guarda o
+    último valor recebido dela; `timestamp` é a última mensagem.
+    """
+    __tablename__ = "leituras_ultimas"
+
+    dispositivo_id = Column(UUID(as_uuid=True), ForeignKey("dispositivos.id"), primary_key=True)
+    timestamp = Column(DateTime, nullable=False)
+
+
+def _numero(valor: Any) -> Optional[float]:
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    if isinstance(valor, str):
+        try:
+            return float(valor.strip().replace(",", "."))
+        except ValueError:
+            return None
+    return None
+
+
+def _real(valor: Optional[float]) -> Optional[float]:
+    """
+    Arredonda para precisão REAL (float4), o que o banco vai guardar.
+    Assim o que a ingestão agrega em memória (rollups) bate com o que uma
+    consulta no histórico calcula. NaN/inf ou fora do alcance do float4 -> None.
+    """
+    if valor is None or not math.isfinite(valor):
+        return None
+    try:
+        return struct.unpack("f", struct.pack("f", valor))[0]
+    except OverflowError:
+        return None
+
+
+def colunas_de_dados(dados: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Separa um dict de leitura (formato MQTT/antigo `dados`) nas colunas tipadas.
+    Sempre devolve todas as chaves (None quando ausente), como o INSERT em lote exige.
+    O que não puder ser convertido fica em `extras`.
+    """
+    extras = dict(dados or {})
+
+    umidade = _real(_numero(extras.get("umidade")))
+    if umidade is not None:
+        extras.pop("umidade")
+
+    temperatura = _real(_numero(extras.get("temperatura")))
+    if temperatura is not None:
+        extras.pop("temperatura")
+
+    potencia = _numero(extras.get("potencia"))
+    if potencia is not None and potencia.is_integer() and -32768 <= potencia <= 32767:
+        extras.pop("potencia")
+        potencia = int(potencia)
+    else:
+        potencia = None
+
+    status = None
+    if "status" in extras:
+        status = _STATUS_TEXTO.get(str(extras["status"]).strip().lower())
+        if status is not None:
+            extras.pop("status")
+
+    return {
+        "umidade": umidade,
+        "temperatura": temperatura,
+        "potencia": potencia,
+        "status": status,
+        "extras": extras or None,
+    }
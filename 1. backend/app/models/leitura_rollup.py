@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Integer, Float, REAL, Boolean, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import declared_attr
+from app.db.base import Base
+
+
+class _ColunasRollup:
+    """
+    Agregado de um dispositivo num intervalo fixo (bucket), mantido pela ingestão.
+
+    `dentro_faixa` é contado com a faixa alvo vigente na gravação
+    (`faixa_min`/`faixa_max`). Se a faixa mudou dentro do bucket,
+    `faixa_mista` fica True e o relatório recalcula esse trecho pelo bruto.
+    """
+
+    @declared_attr
+    def dispositivo_id(cls):
+        return Column(UUID(as_uuid=True), ForeignKey("dispositivos.id"), primary_key=True)
+
+    bucket = Column(DateTime, primary_key=True)      # início do intervalo
+
+    leituras_total = Column(Integer, nullable=False, default=0)
+    umidade_count = Column(Integer, nullable=False, default=0)
+    umidade_soma = Column(Float, nullable=False, default=0.0)   # double precision
+    umidade_min = Column(REAL, nullable=True)
+    umidade_max = Column(REAL, nullable=True)
+    dentro_faixa = Column(Integer, nullable=False, default=0)
+
+    faixa_min = Column(Float, nullable=True)
+    faixa_max = Column(Float, nullable=True)
+    faixa_mista = Column(Boolean, nullable=False, default=False)
+
+
+class LeituraRollup1m(_ColunasRollup, Base):
+    __tablename__ = "leituras_rollup_1m"
+
+
+class LeituraRollup1h(_ColunasRollup, Base):
+    __tablename__ = "leituras_rollup_1h"
+
+
+class LeituraRollup1d(_ColunasRollup, Base):
+    __tablename__ = "leituras_rollup_1d"
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -24,3 +24,9 @@ class Lugar(Base):
     usuario = relationship("Usuario")
 
     criado_em = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # paginação por cursor em (criado_em, id): todos (admin) e por cliente
+        Index("ix_lugares_criado_em_id", criado_em, id),
+        Index("ix_lugares_usuario_criado_em_id", usuario_id, criado_em, id),
+    )
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Boolean, DateTime
+from sqlalchemy import Column, String, Boolean, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 from app.db.base import Base
@@ -13,4 +13,9 @@ class Usuario(Base):
     senha_hash = Column(String, nullable=False)
     role = Column(String, nullable=False, default="CLIENTE")  
     ativo = Column(Boolean, default=True)
-    criado_em = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    criado_em = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # paginação por cursor em (criado_em, id) (app/core/paginacao.py)
+        Index("ix_usuarios_criado_em_id", criado_em, id),
+    )
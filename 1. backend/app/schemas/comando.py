@@ -0,0 +1,25 @@
+from uuid import UUID
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+class ComandoOut(BaseModel):
+    id: UUID                              # id de correlação
+    dispositivo_id: UUID
+    usuario_id: Optional[UUID] = None
+    acao: str
+    topic: str
+    payload: str
+    qos: int
+    estado: str                           # enviado | confirmado | respondido | expirado | falhou
+    enviado_em: datetime
+    confirmado_em: Optional[datetime] = None
+    respondido_em: Optional[datetime] = None
+    resposta: Optional[str] = None        # "status" | "config-atual"
+    broker_ms: Optional[float] = None
+    ida_volta_ms: Optional[float] = None
+    erro: Optional[str] = None
+
+    class Config:
+        from_attributes = True
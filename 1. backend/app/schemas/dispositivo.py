@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List
 
 class UsuarioBrief(BaseModel):
     id: UUID
@@ -33,6 +33,13 @@ class DispositivoUpdateLugar(BaseModel):
 class DispositivoComandoIn(BaseModel):
     acao: str
 
+class DispositivosComandoLoteIn(BaseModel):
+    acao: str
+    # alvo: pelo menos um dos filtros abaixo (combinados com "e")
+    dispositivo_ids: Optional[List[UUID]] = None
+    lugar_id: Optional[UUID] = None
+    tipo: Optional[str] = None
+
 class DispositivoOut(DispositivoBase):
     id: UUID
     ativo: bool
@@ -41,3 +48,14 @@ class DispositivoOut(DispositivoBase):
 
     class Config:
         from_attributes = True
+
+
+class EstadoDispositivoOut(BaseModel):
+    dispositivo_id: UUID
+    umidade: Optional[float] = None
+    status: Optional[str] = None            # "ligado" | "desligado"
+    potencia: Optional[int] = None
+    visto_em: Optional[datetime] = None     # última mensagem recebida (None = nunca mandou nada)
+
+    class Config:
+        from_attributes = True
@@ -6,11 +6,16 @@ from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 class LeituraOut(BaseModel):
-    id: UUID
+    id: Optional[int] = None             # None em /leituras/ultima (estado atual, não uma linha do histórico)
     dispositivo_id: UUID
-    dados: Dict[str, Any]
+    dados: Dict[str, Any]                # visão compatível (colunas + extras)
     timestamp: datetime
 
+    umidade: Optional[float] = None
+    temperatura: Optional[float] = None
+    potencia: Optional[int] = None
+    status: Optional[int] = None         # 1 = ligado, 0 = desligado
+
     class Config:
         from_attributes = True
 
@@ -42,3 +47,25 @@ class RelatorioDispositivoOut(BaseModel):
     parametros_alvo: Dict[str, Optional[float]]
     metricas: RelatorioDispositivoMetricas
     series: SeriesRelatorioDispositivo
+
+
+class RelatorioDispositivoResumo(BaseModel):
+    dispositivo: Dict[str, Any]
+    parametros_alvo: Dict[str, Optional[float]]
+    metricas: RelatorioDispositivoMetricas
+
+
+class RelatorioFrotaOut(BaseModel):
+    escopo: Dict[str, Any]                        # {"tipo": "lugar", "id", "nome"} ou {"tipo": "geral"}
+    periodo: Dict[str, datetime]
+    dispositivos: List[RelatorioDispositivoResumo]
+    total: RelatorioDispositivoMetricas           # todos os dispositivos juntos
+
+
+class RelatorioJobOut(BaseModel):
+    job_id: str
+    status: str                          # pendente | concluido | erro
+    criado_em: datetime
+    concluido_em: Optional[datetime] = None
+    erro: Optional[str] = None
+    download_url: Optional[str] = None   # presente quando status = concluido
@@ -0,0 +1,83 @@
+# app/services/cache_dashboard.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.schemas.dashboard import ResumoDashboard
+
+CHAVE_ADMIN = "ADMIN"
+
+
+class CacheDashboard:
+    """
+    Cache do resumo do dashboard por tenant: uma entrada para a visão de
+    admin (CHAVE_ADMIN) e uma por cliente (id do usuário), com TTL curto e
+    limite de quantidade (LRU).
+
+    As rotas que criam / removem usuários, lugares e dispositivos chamam
+    `invalidar` com o dono afetado (a visão de admin sempre cai junto);
+    mudanças que podem trocar o dono (mover dispositivo / lugar) chamam
+    `limpar`. O status online/offline muda pela presença, em lote: esse
+    fica valendo no máximo depois do TTL.
+    """
+
+    def __init__(self, ttl_s: float, max_itens: int):
+        self.ttl_s = ttl_s
+        self.max_itens = max_itens
+        self._itens: "OrderedDict[str, Tuple[float, ResumoDashboard]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._contadores = {"hits": 0, "misses": 0, "expirados": 0, "despejados": 0, "invalidacoes": 0}
+
+    def buscar(self, chave: str) -> Optional[ResumoDashboard]:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self._contadores["misses"] += 1
+                return None
+            expira_em, resumo = item
+            if expira_em <= time.monotonic():
+                del self._itens[chave]
+                self._contadores["expirados"] += 1
+                self._contadores["misses"] += 1
+                return None
+            self._itens.move_to_end(chave)
+            self._contadores["hits"] += 1
+            return resumo
+
+    def guardar(self, chave: str, resumo: ResumoDashboard) -> None:
+        if self.max_itens <= 0 or self.ttl_s <= 0:
+            return
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl_s, resumo)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self._contadores["despejados"] += 1
+
+    def invalidar(self, usuario_id: Any = None) -> None:
+        """Descarta o resumo do cliente (se informado) e o do admin; chamar depois do commit."""
+        with self._lock:
+            for chave in (CHAVE_ADMIN, None if usuario_id is None else str(usuario_id)):
+                if chave is not None and self._itens.pop(chave, None) is not None:
+                    self._contadores["invalidacoes"] += 1
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._contadores["invalidacoes"] += len(self._itens)
+            self._itens.clear()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            stats["itens"] = len(self._itens)
+            stats["max_itens"] = self.max_itens
+            stats["ttl_s"] = self.ttl_s
+        return stats
+
+
+cache_dashboard = CacheDashboard(
+    ttl_s=settings.DASHBOARD_CACHE_TTL_S,
+    max_itens=settings.DASHBOARD_CACHE_MAX,
+)
@@ -0,0 +1,75 @@
+# app/services/dispositivo_service.py
+from typing import Any, Dict, Optional, Tuple
+
+
+def extrair_base_topic(config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Base MQTT do dispositivo: config["mqtt"]["topic"] ou, se não houver,
+    config["mqtt"]["baseTopic"] (mesma regra do coalesce usado no ingestor).
+    """
+    if not isinstance(config, dict):
+        return None
+
+    mqtt_cfg = config.get("mqtt")
+    if not isinstance(mqtt_cfg, dict):
+        return None
+
+    for key in ("topic", "baseTopic"):
+        val = mqtt_cfg.get(key)
+        if isinstance(val, str) and val.strip():
+            return val.strip().rstrip("/")
+
+    return None
+
+
+def extrair_umidades(config: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Tenta extrair umidadeMinima / umidadeMaxima do JSON de config.
+
+    Procura nesses lugares, nessa ordem:
+      1) config["umidadeMinima"] / config["umidadeMaxima"]
+      2) config["controle"]["umidadeMinima"] / ["umidadeMaxima"]
+      3) config["parametros"]["umidadeMinima"] / ["umidadeMaxima"]
+    """
+    umid_min = None
+    umid_max = None
+
+    # 1) raiz
+    if "umidadeMinima" in config:
+        umid_min = config["umidadeMinima"]
+    if "umidadeMaxima" in config:
+        umid_max = config["umidadeMaxima"]
+
+    # 2) controle
+    controle = config.get("controle")
+    if isinstance(controle, dict):
+        if umid_min is None and "umidadeMinima" in controle:
+            umid_min = controle["umidadeMinima"]
+        if umid_max is None and "umidadeMaxima" in controle:
+            umid_max = controle["umidadeMaxima"]
+
+    # 3) parametros
+    parametros = config.get("parametros")
+    if isinstance(parametros, dict):
+        if umid_min is None and "umidadeMinima" in parametros:
+            umid_min = parametros["umidadeMinima"]
+        if umid_max is None and "umidadeMaxima" in parametros:
+            umid_max = parametros["umidadeMaxima"]
+
+    return umid_min, umid_max
+
+
+def faixa_umidade(config: Optional[Dict[str, Any]]) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Faixa alvo de umidade (mínima, máxima) do dispositivo, já numérica:
+    mesma busca de `extrair_umidades`, mas valor não numérico vira None.
+    É a faixa usada pela ingestão (rollups) e pelos relatórios.
+    """
+    umid_min, umid_max = extrair_umidades(config if isinstance(config, dict) else {})
+
+    def _num(valor: Any) -> Optional[float]:
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            return None
+        return float(valor)
+
+    return _num(umid_min), _num(umid_max)
@@ -0,0 +1,157 @@
+# app/services/estado_dispositivos.py
+import threading
+import uuid
+import zlib
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.db.session import SessionIngestao
+from app.models.leitura import STATUS_LIGADO, LeituraUltima
+
+
+@dataclass(frozen=True)
+class EstadoDispositivo:
+    dispositivo_id: UUID
+    umidade: Optional[float] = None
+    status: Optional[str] = None          # "ligado" | "desligado"
+    potencia: Optional[int] = None
+    visto_em: Optional[datetime] = None   # última mensagem recebida
+    versao: int = 0                       # sequência da última alteração (para o ETag)
+
+    @property
+    def dados(self) -> Dict[str, Any]:
+        """Snapshot no formato de leitura (dict MQTT / LeituraOut.dados)."""
+        return {
+            chave: valor
+            for chave, valor in (("umidade", self.umidade), ("status", self.status), ("potencia", self.potencia))
+            if valor is not None
+        }
+
+
+def _status_texto(status: Optional[int]) -> Optional[str]:
+    if status is None:
+        return None
+    return "ligado" if status == STATUS_LIGADO else "desligado"
+
+
+class EstadoAoVivo:
+    """
+    Estado atual de cada dispositivo em memória: última umidade, status,
+    potência e quando foi visto pela última vez.
+
+    Atualizado pela ingestão a cada mensagem (antes do lote ir para o banco)
+    e carregado de `leituras_ultimas` no startup. Uma entrada por dispositivo
+    que já mandou algo; `remover` quando o dispositivo é desativado.
+
+    Cada alteração recebe um número de uma sequência do processo (`versao`);
+    com a geração do processo, isso forma o ETag de um conjunto de dispositivos.
+    Ouvintes (ex: o push por SSE) são chamados a cada alteração, na thread
+    de quem atualizou, e não podem bloquear.
+    """
+
+    def __init__(self):
+        self._estados: Dict[UUID, EstadoDispositivo] = {}
+        self._lock = threading.Lock()
+        self._sequencia = 0
+        self._geracao = uuid.uuid4().hex[:8]
+        self._contadores = {"atualizacoes": 0, "fora_de_ordem": 0, "leituras": 0}
+        self._ouvintes: List[Callable[[EstadoDispositivo], None]] = []
+
+    def adicionar_ouvinte(self, ouvinte: Callable[[EstadoDispositivo], None]) -> None:
+        self._ouvintes.append(ouvinte)
+
+    def carregar(self) -> None:
+        """Carrega o estado gravado em `leituras_ultimas` (startup)."""
+        db = SessionIngestao()
+        try:
+            linhas = db.query(
+                LeituraUltima.dispositivo_id,
+                LeituraUltima.umidade,
+                LeituraUltima.status,
+                LeituraUltima.potencia,
+                LeituraUltima.timestamp,
+            ).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            for dispositivo_id, umidade, status, potencia, timestamp in linhas:
+                atual = self._estados.get(dispositivo_id)
+                if atual is not None and atual.visto_em is not None and atual.visto_em >= timestamp:
+                    continue
+                self._sequencia += 1
+                self._estados[dispositivo_id] = EstadoDispositivo(
+                    dispositivo_id=dispositivo_id,
+                    umidade=umidade,
+                    status=_status_texto(status),
+                    potencia=potencia,
+                    visto_em=timestamp,
+                    versao=self._sequencia,
+                )
+
+    def atualizar(self, leitura: Dict[str, Any]) -> EstadoDispositivo:
+        """
+        Aplica uma leitura (linha de `nova_leitura`): cada campo fica com o
+        último valor recebido dele, como em `leituras_ultimas`. Leitura mais
+        antiga que o estado atual é ignorada.
+        """
+        dispositivo_id = leitura["dispositivo_id"]
+        with self._lock:
+            atual = self._estados.get(dispositivo_id) or EstadoDispositivo(dispositivo_id=dispositivo_id)
+            if atual.visto_em is not None and leitura["timestamp"] < atual.visto_em:
+                self._contadores["fora_de_ordem"] += 1
+                return atual
+
+            self._sequencia += 1
+            novo = replace(
+                atual,
+                umidade=leitura["umidade"] if leitura["umidade"] is not None else atual.umidade,
+                status=_status_texto(leitura["status"]) or atual.status,
+                potencia=leitura["potencia"] if leitura["potencia"] is not None else atual.potencia,
+                visto_em=leitura["timestamp"],
+                versao=self._sequencia,
+            )
+            self._estados[dispositivo_id] = novo
+            self._contadores["atualizacoes"] += 1
+
+        for ouvinte in self._ouvintes:
+            try:
+                ouvinte(novo)
+            except Exception as e:
+                print(f"[ESTADO-DISPOSITIVOS] Erro em ouvinte: {e}")
+        return novo
+
+    def buscar(self, dispositivo_id: UUID) -> Optional[EstadoDispositivo]:
+        with self._lock:
+            return self._estados.get(dispositivo_id)
+
+    def remover(self, dispositivo_id: UUID) -> None:
+        with self._lock:
+            self._estados.pop(dispositivo_id, None)
+
+    def ler(self, dispositivo_ids: List[UUID]) -> Tuple[List[EstadoDispositivo], str]:
+        """
+        Estados dos dispositivos pedidos (na mesma ordem; vazio para quem ainda
+        não mandou nada) e o ETag do conjunto: muda quando qualquer um deles
+        é atualizado ou quando o conjunto de ids muda.
+        """
+        with self._lock:
+            estados = [self._estados.get(i) or EstadoDispositivo(dispositivo_id=i) for i in dispositivo_ids]
+            self._contadores["leituras"] += 1
+
+        maior_versao = max((e.versao for e in estados), default=0)
+        ids = zlib.crc32(b"".join(i.bytes for i in dispositivo_ids))
+        etag = f'"{self._geracao}-{maior_versao}-{len(dispositivo_ids)}-{ids:08x}"'
+        return estados, etag
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            stats["dispositivos"] = len(self._estados)
+            stats["sequencia"] = self._sequencia
+        return stats
+
+
+estado_dispositivos = EstadoAoVivo()
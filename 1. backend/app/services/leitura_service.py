@@ -1,15 +1,9 @@
 # app/services/leituras_service.py
-import json
-from typing import Any, Dict, Optional, Tuple
-from uuid import UUID
+from typing import Optional, Tuple
 
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
-from app.models.dispositivo import Dispositivo
-from app.models.leitura import Leitura
-
-# cache em memória dos últimos valores de cada dispositivo
-_ultimo_estado: Dict[UUID, Dict[str, Any]] = {}
+from app.services.estado_dispositivos import estado_dispositivos
+from app.services.leitura_writer import leitura_writer
+from app.services.roteamento_dispositivos import RotaDispositivo, indice_roteamento
 
 
 def _parse_topic(topic: str) -> Tuple[Optional[str], Optional[str]]:
@@ -35,29 +29,13 @@ def _parse_topic(topic: str) -> Tuple[Optional[str], Optional[str]]:
     return None, None
 
 
-def _encontrar_dispositivo_por_base(db: Session, base_topic: str) -> Optional[Dispositivo]:
+def _encontrar_dispositivo_por_base(base_topic: str) -> Optional[RotaDispositivo]:
     """
     Para tomadas: usa config->mqtt->baseTopic.
-    Para 3P: usa tipo 'umidificador_3p' e assume único.
+    Para 3P: usa tipo 'umidificador_3p' nos tópicos fixos da raiz.
+    Ambos resolvidos pelo índice em memória (ver roteamento_dispositivos).
     """
-    if base_topic == "alissondev007/umidificador":
-        # umidificador 3P (tópicos fixos)
-        return (
-            db.query(Dispositivo)
-            .filter(Dispositivo.tipo == "umidificador_3p", Dispositivo.ativo == True)
-            .first()
-        )
-
-    # Tomadas: base_topic inclui o deviceId
-    # Necessário ter salvo em config.mqtt.baseTopic
-    return (
-        db.query(Dispositivo)
-        .filter(
-            Dispositivo.config["mqtt"]["baseTopic"].astext == base_topic,
-            Dispositivo.ativo == True,
-        )
-        .first()
-    )
+    return indice_roteamento.buscar(base_topic)
 
 
 def processar_mensagem_mqtt(topic: str, payload: str) -> None:
@@ -66,52 +44,41 @@ def processar_mensagem_mqtt(topic: str, payload: str) -> None:
         # tópico que não nos interessa
         return
 
-    db: Session = SessionLocal()
-    try:
-        dispositivo = _encontrar_dispositivo_por_base(db, base_topic)
-        if not dispositivo:
-            print("Sem dispositivo vinculado a baseTopic:", base_topic)
-            return
+    dispositivo = _encontrar_dispositivo_por_base(base_topic)
+    if not dispositivo:
+        print("Sem dispositivo vinculado a baseTopic:", base_topic)
+        return
 
-        # pega estado anterior (se tiver)
-        estado = _ultimo_estado.get(dispositivo.id, {}).copy()
-
-        if metric == "umidade":
-            try:
-                estado["umidade"] = float(payload)
-            except ValueError:
-                print("Umidade inválida:", payload)
-                return
-
-        elif metric == "status":
-            # pode ser "Ligado"/"Desligado" ou "0"/"1"
-            valor = payload.strip()
-            if valor in ("0", "1"):
-                estado["status"] = "ligado" if valor == "1" else "desligado"
-            else:
-                estado["status"] = valor  # já vem "Ligado", "Desligado" etc.
-
-        elif metric == "potencia":
-            try:
-                estado["potencia"] = int(payload)
-            except ValueError:
-                print("Potência inválida:", payload)
-                # não aborta: só não atualiza a potência
+    # pega estado anterior (se tiver), do estado ao vivo dos dispositivos
+    anterior = estado_dispositivos.buscar(dispositivo.dispositivo_id)
+    estado = anterior.dados if anterior is not None else {}
 
-        else:
-            # outros tópicos: ignora por enquanto
+    if metric == "umidade":
+        try:
+            estado["umidade"] = float(payload)
+        except ValueError:
+            print("Umidade inválida:", payload)
             return
 
-        # Atualiza o cache
-        _ultimo_estado[dispositivo.id] = estado
+    elif metric == "status":
+        # pode ser "Ligado"/"Desligado" ou "0"/"1"
+        valor = payload.strip()
+        if valor in ("0", "1"):
+            estado["status"] = "ligado" if valor == "1" else "desligado"
+        else:
+            estado["status"] = valor  # já vem "Ligado", "Desligado" etc.
+
+    elif metric == "potencia":
+        try:
+            estado["potencia"] = int(payload)
+        except ValueError:
+            print("Potência inválida:", payload)
+            # não aborta: só não atualiza a potência
 
-        # Salva leitura no banco
-        leitura = Leitura(
-            dispositivo_id=dispositivo.id,
-            dados=estado,  # snapshot completo nesse momento
-        )
-        db.add(leitura)
-        db.commit()
+    else:
+        # outros tópicos: ignora por enquanto
+        return
 
-    finally:
-        db.close()
+    # Salva leitura (snapshot completo nesse momento) via writer em lote,
+    # que também atualiza o estado ao vivo
+    leitura_writer.enfileirar(dispositivo.dispositivo_id, estado)
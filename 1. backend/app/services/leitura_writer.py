@@ -0,0 +1,304 @@
+# app/services/leitura_writer.py
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.db.session import SessionIngestao
+from app.models.leitura import Leitura, LeituraUltima, colunas_de_dados
+from app.services.estado_dispositivos import estado_dispositivos
+from app.services.rollups_leituras import instrucoes_rollups
+
+# marcador colocado na fila para o worker drenar o que falta e encerrar
+_SENTINELA = object()
+
+_COLUNAS_VALOR = ("umidade", "temperatura", "potencia", "status", "extras")
+
+# leituras descartadas com a fila cheia viram uma linha de log a cada intervalo, não uma por leitura
+LOG_DESCARTES_INTERVALO_S = 10.0
+
+
+def nova_leitura(dispositivo_id: UUID, dados: Dict[str, Any], timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Linha (dict) no formato esperado pelo INSERT em lote: colunas tipadas
+    + extras (o id é gerado pelo banco, coluna identity).
+    """
+    return {
+        "dispositivo_id": dispositivo_id,
+        "timestamp": timestamp or datetime.utcnow(),
+        **colunas_de_dados(dados),
+    }
+
+
+def _ultimas_do_lote(lote: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Junta as leituras do lote numa linha por dispositivo (ordem de chegada):
+    cada coluna fica com o último valor não nulo recebido.
+    O upsert não pode tocar a mesma linha duas vezes no mesmo comando.
+    """
+    por_dispositivo: Dict[UUID, Dict[str, Any]] = {}
+    for item in lote:
+        atual = por_dispositivo.setdefault(
+            item["dispositivo_id"],
+            {"dispositivo_id": item["dispositivo_id"], **{c: None for c in _COLUNAS_VALOR}},
+        )
+        atual["timestamp"] = item["timestamp"]
+        for coluna in _COLUNAS_VALOR:
+            valor = item[coluna]
+            if valor is None:
+                continue
+            if coluna == "extras" and atual["extras"]:
+                valor = {**atual["extras"], **valor}
+            atual[coluna] = valor
+    return list(por_dispositivo.values())
+
+
+def _upsert_ultimas():
+    stmt = pg_insert(LeituraUltima)
+    tabela = LeituraUltima.__table__
+    novo = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[tabela.c.dispositivo_id],
+        set_={
+            "timestamp": novo.timestamp,
+            "umidade": func.coalesce(novo.umidade, tabela.c.umidade),
+            "temperatura": func.coalesce(novo.temperatura, tabela.c.temperatura),
+            "potencia": func.coalesce(novo.potencia, tabela.c.potencia),
+            "status": func.coalesce(novo.status, tabela.c.status),
+            "extras": func.coalesce(tabela.c.extras, text("'{}'::jsonb")).op("||")(
+                func.coalesce(novo.extras, text("'{}'::jsonb"))
+            ),
+        },
+        # lote atrasado (ex: retry) não sobrescreve um estado mais novo
+        where=tabela.c.timestamp <= novo.timestamp,
+    )
+
+
+def instrucoes_lote(lote: List[Dict[str, Any]]) -> List[Tuple[Any, List[Dict[str, Any]]]]:
+    """
+    Instruções (statement, parâmetros) que gravam um lote de leituras.
+    Compartilhado pelo writer em thread e pelo ingestor asyncio, que só
+    diferem em como executam (Session x AsyncSession).
+
+    executemany com insert() vira INSERT ... VALUES (...), (...), ...
+    (insertmanyvalues do SQLAlchemy 2.x): um round-trip por lote.
+    Além do histórico, atualiza `leituras_ultimas` (estado atual por dispositivo)
+    e os rollups de umidade (1m / 1h / 1d) usados pelos relatórios.
+    """
+    return [
+        (insert(Leitura), lote),
+        (_upsert_ultimas(), _ultimas_do_lote(lote)),
+        *instrucoes_rollups(lote),
+    ]
+
+
+class LeituraWriter:
+    """
+    Estágio de escrita em lote das leituras vindas do MQTT.
+
+    O ingestor só enfileira (dispositivo_id, dados, timestamp) numa fila
+    limitada; uma thread dedicada junta as leituras e grava tudo num único
+    INSERT multi-linha quando o lote atinge `tamanho_lote` ou quando a
+    leitura mais antiga do lote já esperou `intervalo_flush_ms`.
+
+    Se a fila encher, `enfileirar` bloqueia o produtor por até
+    `timeout_enfileirar_s` (backpressure) e só então descarta a leitura.
+    Lote que falha é tentado de novo em metades, até isolar as leituras
+    ruins: só elas se perdem (contador `perdidas`).
+    """
+
+    def __init__(
+        self,
+        tamanho_lote: int,
+        intervalo_flush_ms: int,
+        tamanho_fila: int,
+        timeout_enfileirar_s: float,
+    ):
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.intervalo_flush_s = max(0, intervalo_flush_ms) / 1000.0
+        self.timeout_enfileirar_s = timeout_enfileirar_s
+
+        self._fila: "queue.Queue[Any]" = queue.Queue(maxsize=tamanho_fila)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self._contadores = {
+            "enfileiradas": 0,
+            "descartadas": 0,
+            "gravadas": 0,
+            "lotes": 0,
+            "erros": 0,
+            "perdidas": 0,      # leituras que não foram gravadas nem dividindo o lote
+        }
+        self._descartes_sem_log = 0
+        self._ultimo_log_descartes = 0.0
+
+    # ========= API usada pelo ingestor =========
+
+    def iniciar(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="leitura-writer",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def enfileirar(
+        self,
+        dispositivo_id: UUID,
+        dados: Dict[str, Any],
+        timestamp: Optional[datetime] = None,
+    ) -> bool:
+        """
+        Coloca uma leitura na fila de gravação.
+        Retorna False se a fila continuou cheia após o timeout (leitura descartada).
+        """
+        item = nova_leitura(dispositivo_id, dados, timestamp)
+        # estado ao vivo reflete o que chegou, mesmo com a fila do banco atrasada
+        estado_dispositivos.atualizar(item)
+        try:
+            self._fila.put(item, timeout=self.timeout_enfileirar_s)
+        except queue.Full:
+            self._descartada()
+            return False
+
+        self._incrementar("enfileiradas")
+        return True
+
+    def parar(self, timeout: Optional[float] = None) -> None:
+        """
+        Drena a fila (grava tudo o que já foi enfileirado) e encerra o worker.
+        Deve ser chamado depois que o produtor (cliente MQTT) parou.
+        """
+        if self._thread is None:
+            return
+        self._fila.put(_SENTINELA)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._contadores)
+        stats["fila_atual"] = self._fila.qsize()
+        stats["fila_max"] = self._fila.maxsize
+        return stats
+
+    # ========= Worker =========
+
+    def _incrementar(self, chave: str, valor: int = 1) -> None:
+        with self._lock:
+            self._contadores[chave] += valor
+
+    def _descartada(self) -> None:
+        agora = time.monotonic()
+        with self._lock:
+            self._contadores["descartadas"] += 1
+            self._descartes_sem_log += 1
+            if agora - self._ultimo_log_descartes < LOG_DESCARTES_INTERVALO_S:
+                return
+            descartes, self._descartes_sem_log = self._descartes_sem_log, 0
+            self._ultimo_log_descartes = agora
+        print(f"[LEITURA-WRITER] Fila cheia: {descartes} leituras descartadas desde o último aviso.")
+
+    def _loop(self) -> None:
+        lote: List[Dict[str, Any]] = []
+        prazo = 0.0
+
+        while True:
+            if lote:
+                espera = max(0.0, prazo - time.monotonic())
+                try:
+                    item = self._fila.get(timeout=espera)
+                except queue.Empty:
+                    self._gravar_lote(lote)
+                    lote = []
+                    continue
+            else:
+                item = self._fila.get()
+
+            if item is _SENTINELA:
+                if lote:
+                    self._gravar_lote(lote)
+                return
+
+            if not lote:
+                prazo = time.monotonic() + self.intervalo_flush_s
+            lote.append(item)
+
+            if len(lote) >= self.tamanho_lote:
+                self._gravar_lote(lote)
+                lote = []
+
+    def _executar(self, lote: List[Dict[str, Any]]) -> None:
+        db = SessionIngestao()
+        try:
+            for stmt, params in instrucoes_lote(lote):
+                db.execute(stmt, params)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _gravar_dividindo(self, lote: List[Dict[str, Any]]) -> int:
+        """
+        Grava o lote em metades (recursivo) até isolar as leituras que falham;
+        devolve quantas foram perdidas. As metades vão na ordem de chegada e
+        cada uma na sua transação (os rollups são incrementais, então somam
+        igual).
+        """
+        perdidas = 0
+        meio = len(lote) // 2
+        for parte in (lote[:meio], lote[meio:]):
+            try:
+                self._executar(parte)
+            except Exception:
+                perdidas += 1 if len(parte) == 1 else self._gravar_dividindo(parte)
+        return perdidas
+
+    def _gravar_lote(self, lote: List[Dict[str, Any]]) -> None:
+        try:
+            self._executar(lote)
+            self._incrementar("gravadas", len(lote))
+            self._incrementar("lotes")
+            return
+        except Exception as e:
+            erro = e
+        self._incrementar("erros")
+
+        if isinstance(erro, OperationalError) or len(lote) == 1:
+            # banco fora / conexão caiu: dividir só multiplicaria as falhas; tenta o lote mais uma vez
+            try:
+                self._executar(lote)
+                perdidas = 0
+            except Exception:
+                perdidas = len(lote)
+        else:
+            # uma linha ruim (ex: FK de dispositivo excluído) não leva o lote inteiro
+            perdidas = self._gravar_dividindo(lote)
+
+        self._incrementar("gravadas", len(lote) - perdidas)
+        self._incrementar("perdidas", perdidas)
+        self._incrementar("lotes")
+        print(
+            f"[LEITURA-WRITER] Erro ao gravar lote de {len(lote)} leituras ({erro}); "
+            f"{perdidas} perdidas, {len(lote) - perdidas} gravadas na nova tentativa."
+        )
+
+
+leitura_writer = LeituraWriter(
+    tamanho_lote=settings.INGEST_FLUSH_SIZE,
+    intervalo_flush_ms=settings.INGEST_FLUSH_INTERVAL_MS,
+    tamanho_fila=settings.INGEST_QUEUE_MAXSIZE,
+    timeout_enfileirar_s=settings.INGEST_ENQUEUE_TIMEOUT_S,
+)
@@ -0,0 +1,112 @@
+# app/services/mqtt_dispatcher.py
+import queue
+import threading
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# marcador colocado em cada fila para o worker drenar o que falta e encerrar
+_SENTINELA = object()
+
+ProcessadorMensagem = Callable[[str, bytes, datetime], None]
+
+
+def _base_topic(topic: str) -> str:
+    # alissondev007/umidificador/31a7dbcc/umidade -> alissondev007/umidificador/31a7dbcc
+    return topic.rsplit("/", 1)[0]
+
+
+class DespachanteMensagens:
+    """
+    Tira o processamento das mensagens da thread de rede do paho.
+
+    O callback do MQTT só chama `enviar(topic, payload, recebido_em)`; a
+    mensagem vai para a fila de um dos `num_workers` workers, escolhido pelo
+    hash do base_topic. Assim, mensagens do mesmo dispositivo caem sempre no
+    mesmo worker e são processadas na ordem em que chegaram.
+    """
+
+    def __init__(
+        self,
+        processar: ProcessadorMensagem,
+        num_workers: int,
+        tamanho_fila: int,
+    ):
+        self._processar = processar
+        self.num_workers = max(1, num_workers)
+
+        self._filas: List["queue.Queue"] = [
+            queue.Queue(maxsize=tamanho_fila) for _ in range(self.num_workers)
+        ]
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._contadores = {"recebidas": 0, "processadas": 0, "descartadas": 0, "erros": 0}
+
+    def iniciar(self) -> None:
+        if self._threads:
+            return
+        for i, fila in enumerate(self._filas):
+            thread = threading.Thread(
+                target=self._loop,
+                args=(fila,),
+                name=f"mqtt-worker-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def enviar(self, topic: str, payload: bytes, recebido_em: Optional[datetime] = None) -> bool:
+        """
+        Chamado na thread do paho: só enfileira, nunca bloqueia (a thread de
+        rede também cuida dos keepalives e das mensagens dos outros
+        dispositivos). Com a fila do worker cheia, a mensagem é descartada e
+        contada em `descartadas` (retorna False); a espera por espaço
+        (backpressure) fica do lado do worker, em `LeituraWriter.enfileirar`.
+        """
+        indice = zlib.crc32(_base_topic(topic).encode()) % self.num_workers
+        item = (topic, payload, recebido_em or datetime.utcnow())
+        try:
+            self._filas[indice].put_nowait(item)
+        except queue.Full:
+            self._incrementar("descartadas")
+            return False
+
+        self._incrementar("recebidas")
+        return True
+
+    def parar(self, timeout: Optional[float] = None) -> None:
+        """
+        Processa o que já está nas filas e encerra os workers.
+        """
+        for fila in self._filas:
+            fila.put(_SENTINELA)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def estatisticas(self) -> Dict[str, object]:
+        with self._lock:
+            stats: Dict[str, object] = dict(self._contadores)
+        stats["workers"] = self.num_workers
+        stats["filas"] = [fila.qsize() for fila in self._filas]
+        return stats
+
+    # ========= Worker =========
+
+    def _incrementar(self, chave: str) -> None:
+        with self._lock:
+            self._contadores[chave] += 1
+
+    def _loop(self, fila: "queue.Queue") -> None:
+        while True:
+            item = fila.get()
+            if item is _SENTINELA:
+                return
+
+            topic, payload, recebido_em = item
+            try:
+                self._processar(topic, payload, recebido_em)
+                self._incrementar("processadas")
+            except Exception as e:
+                self._incrementar("erros")
+                print(f"[MQTT-DISPATCHER] Erro ao processar {topic}: {e}")
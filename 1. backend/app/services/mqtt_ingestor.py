@@ -1,15 +1,16 @@
 import json
 import threading
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Tuple
 
 import paho.mqtt.client as mqtt
-from sqlalchemy import func
-from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.db.session import SessionLocal
-from app.models.dispositivo import Dispositivo
-from app.models.leitura import Leitura
+from app.services.leitura_writer import leitura_writer
+from app.services.mqtt_dispatcher import DespachanteMensagens
+from app.services.presenca_dispositivos import interpretar_conexao, presenca_dispositivos
+from app.services.rastreio_comandos import rastreio_comandos
+from app.services.roteamento_dispositivos import RotaDispositivo, indice_roteamento
 
 # ---- Config vindo do settings ----
 MQTT_BROKER_HOST = settings.MQTT_BROKER_HOST
@@ -19,24 +20,17 @@ MQTT_USERNAME = settings.MQTT_USERNAME
 MQTT_PASSWORD = settings.MQTT_PASSWORD
 
 _mqtt_client: Optional[mqtt.Client] = None
+_mqtt_thread: Optional[threading.Thread] = None
 
 
-# ========= Helpers de banco =========
+# ========= Helpers =========
 
-def get_db() -> Session:
+def find_dispositivo_by_base_topic(base_topic: str) -> Optional[RotaDispositivo]:
     """
-    Cria uma sessão nova de banco para uso dentro dos callbacks MQTT.
-    """
-    db = SessionLocal()
-    return db
-
-
-def find_dispositivo_by_base_topic(db: Session, base_topic: str) -> Optional[Dispositivo]:
-    """
-    Busca o dispositivo cujo config.mqtt.topic OU config.mqtt.baseTopic
-    bate com base_topic.
+    Resolve o dispositivo cujo config.mqtt.topic OU config.mqtt.baseTopic
+    bate com base_topic, usando o índice em memória (sem ir ao banco).
 
-    Espera no banco algo como:
+    Espera no cadastro algo como:
       dispositivo.config = {
         "mqtt": {
           "topic": "alissondev007/umidificador/31a7dbcc"
@@ -44,27 +38,14 @@ def find_dispositivo_by_base_topic(db: Session, base_topic: str) -> Optional[Dis
         ...
       }
     """
-    cfg = Dispositivo.config  # JSONB
-
-    return (
-        db.query(Dispositivo)
-        .filter(
-            func.coalesce(
-                cfg["mqtt"]["topic"].astext,
-                cfg["mqtt"]["baseTopic"].astext
-            ) == base_topic
-        )
-        .first()
-    )
+    return indice_roteamento.buscar(base_topic)
 
 
-def salvar_leitura(db: Session, dispositivo: Dispositivo, dados: dict) -> None:
-    leitura = Leitura(
-        dispositivo_id=dispositivo.id,
-        dados=dados,
-    )
-    db.add(leitura)
-    db.commit()
+def salvar_leitura(dispositivo: RotaDispositivo, dados: dict, timestamp: Optional[datetime] = None) -> None:
+    """
+    Não grava direto: entrega a leitura ao writer em lote (ver leitura_writer).
+    """
+    leitura_writer.enfileirar(dispositivo.dispositivo_id, dados, timestamp)
 
 
 # ========= Callbacks MQTT =========
@@ -80,65 +61,115 @@ def _on_connect(client: mqtt.Client, userdata, flags, rc):
 
 
 def _on_message(client: mqtt.Client, userdata, msg: mqtt.MQTTMessage):
-    topic = msg.topic
-    payload_raw = msg.payload.decode(errors="ignore").strip()
+    # Roda na thread de rede do paho: só enfileira, o resto fica com os workers
+    _despachante.enviar(msg.topic, msg.payload, datetime.utcnow())
+
+
+# ========= Processamento (workers do despachante) =========
+
+def interpretar_mensagem(topic: str, payload: bytes) -> Optional[Tuple[RotaDispositivo, dict]]:
+    """
+    Converte (topic, payload) em (dispositivo, dados) ou None se a mensagem
+    não deve virar leitura. Não faz I/O: é usado tanto pelos workers deste
+    módulo quanto pelo ingestor asyncio (mqtt_ingestor_async).
+    """
+    payload_raw = payload.decode(errors="ignore").strip()
 
     # Ex: alissondev007/umidificador/31a7dbcc/umidade
     partes = topic.split("/")
     if len(partes) < 3:
-        return
+        return None
 
     base_topic = "/".join(partes[:-1])
     sufixo = partes[-1]
 
-    db = get_db()
-    try:
-        dispositivo = find_dispositivo_by_base_topic(db, base_topic)
-        if not dispositivo:
-            # Se quiser debugar:
-            # print(f"[MQTT-INGESTOR] Nenhum dispositivo p/ base_topic={base_topic}")
-            return
+    dispositivo = find_dispositivo_by_base_topic(base_topic)
+    if not dispositivo:
+        # Se quiser debugar:
+        # print(f"[MQTT-INGESTOR] Nenhum dispositivo p/ base_topic={base_topic}")
+        return None
+
+    dados: dict = {}
+
+    if sufixo == "umidade":
+        try:
+            umid = float(payload_raw.replace(",", "."))
+            dados["umidade"] = umid
+        except ValueError:
+            dados["umidade_raw"] = payload_raw
+
+    elif sufixo == "status":
+        dados["status"] = payload_raw
+
+    elif sufixo == "potencia":
+        try:
+            pot = int(payload_raw)
+            dados["potencia"] = pot
+        except ValueError:
+            dados["potencia_raw"] = payload_raw
+
+    elif sufixo == "config-atual":
+        try:
+            cfg = json.loads(payload_raw)
+            dados["config_atual"] = cfg
+        except json.JSONDecodeError:
+            dados["config_atual_raw"] = payload_raw
 
-        dados: dict = {}
-
-        if sufixo == "umidade":
-            try:
-                umid = float(payload_raw.replace(",", "."))
-                dados["umidade"] = umid
-            except ValueError:
-                dados["umidade_raw"] = payload_raw
-
-        elif sufixo == "status":
-            dados["status"] = payload_raw
-
-        elif sufixo == "potencia":
-            try:
-                pot = int(payload_raw)
-                dados["potencia"] = pot
-            except ValueError:
-                dados["potencia_raw"] = payload_raw
-
-        elif sufixo == "config-atual":
-            try:
-                cfg = json.loads(payload_raw)
-                dados["config_atual"] = cfg
-            except json.JSONDecodeError:
-                dados["config_atual_raw"] = payload_raw
-
-        else:
-            # outros topics (ex: comando, config) não queremos registrar aqui
-            return
+    else:
+        # outros topics (ex: comando, config) não queremos registrar aqui
+        return None
+
+    if not dados:
+        return None
 
-        if not dados:
+    return dispositivo, dados
+
+
+# tópicos que o próprio backend publica (não são sinal de vida do dispositivo)
+_SUFIXOS_DO_BACKEND = ("comando", "config")
+
+
+def registrar_presenca(topic: str, payload: bytes) -> None:
+    """
+    Presença: toda mensagem do dispositivo é sinal de vida; `<base>/conn`
+    (ONLINE retido / OFFLINE do LWT) muda o estado na hora. Só memória.
+    """
+    partes = topic.split("/")
+    if len(partes) < 3 or partes[-1] in _SUFIXOS_DO_BACKEND:
+        return
+
+    dispositivo = find_dispositivo_by_base_topic("/".join(partes[:-1]))
+    if not dispositivo:
+        return
+
+    if partes[-1] == "conn":
+        online = interpretar_conexao(payload)
+        if online is not None:
+            presenca_dispositivos.conexao(dispositivo.dispositivo_id, online)
+    else:
+        presenca_dispositivos.visto(dispositivo.dispositivo_id)
+
+
+def processar_mensagem(topic: str, payload: bytes, recebido_em: datetime) -> None:
+    try:
+        registrar_presenca(topic, payload)
+        resultado = interpretar_mensagem(topic, payload)
+        if resultado is None:
             return
 
-        salvar_leitura(db, dispositivo, dados)
+        dispositivo, dados = resultado
+        salvar_leitura(dispositivo, dados, recebido_em)
+        rastreio_comandos.observar(dispositivo.dispositivo_id, dados, recebido_em)
 
     except Exception as e:
-        db.rollback()
         print(f"[MQTT-INGESTOR] Erro ao processar {topic}: {e}")
-    finally:
-        db.close()
+
+
+_despachante = DespachanteMensagens(
+    processar=processar_mensagem,
+    num_workers=settings.INGEST_WORKERS,
+    tamanho_fila=settings.INGEST_WORKER_QUEUE_MAXSIZE,
+)
 
 
 # ========= Inicialização do ingestor =========
@@ -148,11 +179,14 @@ def start_mqtt_ingestor():
     Cria o cliente MQTT, conecta ao broker e inicia o loop em uma thread daemon.
     Deve ser chamado no evento de startup do FastAPI.
     """
-    global _mqtt_client
+    global _mqtt_client, _mqtt_thread
     if _mqtt_client is not None:
         # já foi inicializado
         return
 
+    leitura_writer.iniciar()
+    _despachante.iniciar()
+
     client = mqtt.Client(
         client_id="BACKEND-UMID-INGESTOR",
         clean_session=True,
@@ -171,4 +205,37 @@ def start_mqtt_ingestor():
     thread.start()
 
     _mqtt_client = client
+    _mqtt_thread = thread
     print("[MQTT-INGESTOR] Ingestor MQTT iniciado em thread separada.")
+
+
+def stop_mqtt_ingestor():
+    """
+    Para de receber mensagens, processa o que está nas filas dos workers e
+    drena o writer, gravando o que ainda não foi para o banco.
+    Deve ser chamado no evento de shutdown do FastAPI.
+    """
+    global _mqtt_client, _mqtt_thread
+    if _mqtt_client is None:
+        return
+
+    print("[MQTT-INGESTOR] Encerrando ingestor MQTT ...")
+    _mqtt_client.disconnect()  # faz o loop_forever retornar
+    if _mqtt_thread is not None:
+        _mqtt_thread.join(timeout=5)
+
+    _despachante.parar()
+    leitura_writer.parar()
+
+    _mqtt_client = None
+    _mqtt_thread = None
+    print("[MQTT-INGESTOR] Ingestor MQTT encerrado; fila de leituras drenada.")
+
+
+def cliente_mqtt() -> Optional[mqtt.Client]:
+    """Cliente do ingestor (com loop de rede rodando), ou None se não foi iniciado."""
+    return _mqtt_client
+
+
+def estatisticas_despachante() -> dict:
+    return _despachante.estatisticas()
@@ -0,0 +1,265 @@
+# app/services/mqtt_ingestor_async.py
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.services.estado_dispositivos import estado_dispositivos
+from app.services.leitura_writer import instrucoes_lote, nova_leitura
+from app.services.mqtt_ingestor import interpretar_mensagem, registrar_presenca
+from app.services.rastreio_comandos import rastreio_comandos
+
+# ---- Config vindo do settings ----
+MQTT_BROKER_HOST = settings.MQTT_BROKER_HOST
+MQTT_BROKER_PORT = settings.MQTT_BROKER_PORT
+MQTT_TOPIC_ROOT = settings.MQTT_TOPIC_ROOT
+MQTT_USERNAME = settings.MQTT_USERNAME
+MQTT_PASSWORD = settings.MQTT_PASSWORD
+
+RECONEXAO_ESPERA_S = 5
+
+
+class IngestorAsync:
+    """
+    Modo de ingestão asyncio (MQTT_INGESTOR_MODE="async").
+
+    Roda dentro do event loop do FastAPI: uma task lê as mensagens do broker
+    (aiomqtt) e outra grava as leituras em lote via AsyncSession (asyncpg),
+    com os mesmos limites de lote/latência/fila do writer em thread.
+    A ordem por dispositivo é preservada porque há um único consumidor.
+    """
+
+    def __init__(self, tamanho_lote: int, intervalo_flush_ms: int, tamanho_fila: int):
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.intervalo_flush_s = max(0, intervalo_flush_ms) / 1000.0
+        self.tamanho_fila = tamanho_fila
+
+        self._fila: Optional[asyncio.Queue] = None
+        self._task_mqtt: Optional[asyncio.Task] = None
+        self._task_writer: Optional[asyncio.Task] = None
+        self._sessao = None
+        self._contadores = {"recebidas": 0, "gravadas": 0, "lotes": 0, "erros": 0, "perdidas": 0}
+
+    # ========= Ciclo de vida =========
+
+    async def iniciar(self, conectar: bool = True) -> None:
+        """
+        conectar=False sobe só o writer (usado pelo benchmark, que injeta
+        mensagens direto em `processar`).
+        """
+        if self._task_writer is not None:
+            return
+
+        if conectar:
+            try:
+                import aiomqtt
+            except ImportError as e:
+                raise RuntimeError(
+                    "MQTT_INGESTOR_MODE='async' requer o pacote 'aiomqtt' (pip install aiomqtt)."
+                ) from e
+
+        # o engine async (asyncpg) só existe neste modo: criado aqui para
+        # falhar no startup, e não calado dentro da task do writer
+        try:
+            from app.db.session_async import AsyncSessionLocal
+        except Exception as e:
+            raise RuntimeError(
+                f"MQTT_INGESTOR_MODE='async' requer o pacote 'asyncpg' (pip install asyncpg): {e}"
+            ) from e
+        self._sessao = AsyncSessionLocal
+
+        self._fila = asyncio.Queue(maxsize=self.tamanho_fila)
+        self._task_writer = asyncio.create_task(self._writer())
+        if conectar:
+            self._task_mqtt = asyncio.create_task(self._loop_mqtt(aiomqtt))
+
+    async def parar(self) -> None:
+        if self._task_mqtt is not None:
+            self._task_mqtt.cancel()
+            try:
+                await self._task_mqtt
+            except asyncio.CancelledError:
+                pass
+            self._task_mqtt = None
+
+        if self._task_writer is not None:
+            # None é o sentinela: o writer grava o que falta e termina
+            await self._fila.put(None)
+            await self._task_writer
+            self._task_writer = None
+
+    def estatisticas(self) -> Dict[str, int]:
+        stats = dict(self._contadores)
+        stats["fila_atual"] = self._fila.qsize() if self._fila is not None else 0
+        stats["fila_max"] = self.tamanho_fila
+        return stats
+
+    # ========= Mensagens =========
+
+    async def processar(self, topic: str, payload: bytes, recebido_em: Optional[datetime] = None) -> None:
+        self._contadores["recebidas"] += 1
+        try:
+            registrar_presenca(topic, payload)
+            resultado = interpretar_mensagem(topic, payload)
+        except Exception as e:
+            print(f"[MQTT-INGESTOR-ASYNC] Erro ao processar {topic}: {e}")
+            return
+        if resultado is None:
+            return
+
+        dispositivo, dados = resultado
+        item = nova_leitura(dispositivo.dispositivo_id, dados, recebido_em)
+        estado_dispositivos.atualizar(item)
+        rastreio_comandos.observar(dispositivo.dispositivo_id, dados, item["timestamp"])
+        # fila cheia -> await bloqueia a leitura do broker (backpressure)
+        await self._fila.put(item)
+
+    async def _loop_mqtt(self, aiomqtt) -> None:
+        while True:
+            try:
+                async with aiomqtt.Client(
+                    hostname=MQTT_BROKER_HOST,
+                    port=MQTT_BROKER_PORT,
+                    username=MQTT_USERNAME,
+                    password=MQTT_PASSWORD if MQTT_USERNAME else None,
+                    identifier="BACKEND-UMID-INGESTOR",
+                    keepalive=60,
+                ) as client:
+                    topic = f"{MQTT_TOPIC_ROOT}/#"
+                    await client.subscribe(topic)
+                    print(f"[MQTT-INGESTOR-ASYNC] Conectado; assinando: {topic}")
+
+                    async for message in client.messages:
+                        await self.processar(str(message.topic), bytes(message.payload), datetime.utcnow())
+
+            except aiomqtt.MqttError as e:
+                print(f"[MQTT-INGESTOR-ASYNC] Conexão perdida ({e}); reconectando em {RECONEXAO_ESPERA_S}s ...")
+                await asyncio.sleep(RECONEXAO_ESPERA_S)
+            except Exception as e:
+                # qualquer outro erro não pode matar a task (a ingestão pararia calada)
+                print(f"[MQTT-INGESTOR-ASYNC] Erro inesperado ({e!r}); reconectando em {RECONEXAO_ESPERA_S}s ...")
+                await asyncio.sleep(RECONEXAO_ESPERA_S)
+
+    # ========= Writer =========
+
+    async def _writer(self) -> None:
+        lote: List[Dict[str, Any]] = []
+        prazo = 0.0
+        # o get() pendente sobrevive ao prazo do lote: com wait_for ele seria
+        # cancelado, e no Python <= 3.11 o cancelamento pode perder um item já tirado da fila
+        proximo: Optional[asyncio.Future] = None
+
+        while True:
+            if proximo is None:
+                proximo = asyncio.ensure_future(self._fila.get())
+            if lote:
+                feitos, _ = await asyncio.wait({proximo}, timeout=max(0.0, prazo - time.monotonic()))
+                if not feitos:
+                    await self._gravar_lote(lote)
+                    lote = []
+                    continue
+            item = await proximo
+            proximo = None
+
+            if item is None:
+                if lote:
+                    await self._gravar_lote(lote)
+                return
+
+            if not lote:
+                prazo = time.monotonic() + self.intervalo_flush_s
+            lote.append(item)
+
+            if len(lote) >= self.tamanho_lote:
+                await self._gravar_lote(lote)
+                lote = []
+
+    async def _executar(self, lote: List[Dict[str, Any]]) -> None:
+        async with self._sessao() as db:
+            try:
+                for stmt, params in instrucoes_lote(lote):
+                    await db.execute(stmt, params)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+    async def _gravar_dividindo(self, lote: List[Dict[str, Any]]) -> int:
+        """Mesma divisão em metades do LeituraWriter; devolve quantas foram perdidas."""
+        perdidas = 0
+        meio = len(lote) // 2
+        for parte in (lote[:meio], lote[meio:]):
+            try:
+                await self._executar(parte)
+            except Exception:
+                perdidas += 1 if len(parte) == 1 else await self._gravar_dividindo(parte)
+        return perdidas
+
+    async def _gravar_lote(self, lote: List[Dict[str, Any]]) -> None:
+        """Nunca levanta: um lote com erro não pode derrubar a task do writer."""
+        try:
+            await self._executar(lote)
+            self._contadores["gravadas"] += len(lote)
+            self._contadores["lotes"] += 1
+            return
+        except Exception as e:
+            erro = e
+        self._contadores["erros"] += 1
+
+        if isinstance(erro, OperationalError) or len(lote) == 1:
+            # banco fora / conexão caiu: tenta o lote mais uma vez, sem dividir
+            try:
+                await self._executar(lote)
+                perdidas = 0
+            except Exception:
+                perdidas = len(lote)
+        else:
+            try:
+                perdidas = await self._gravar_dividindo(lote)
+            except Exception:
+                perdidas = len(lote)
+
+        self._contadores["gravadas"] += len(lote) - perdidas
+        self._contadores["perdidas"] += perdidas
+        self._contadores["lotes"] += 1
+        print(
+            f"[MQTT-INGESTOR-ASYNC] Erro ao gravar lote de {len(lote)} leituras ({erro}); "
+            f"{perdidas} perdidas, {len(lote) - perdidas} gravadas na nova tentativa."
+        )
+
+
+_ingestor: Optional[IngestorAsync] = None
+
+
+async def start_mqtt_ingestor_async() -> None:
+    """
+    Sobe o ingestor asyncio no event loop atual.
+    Deve ser chamado no evento de startup do FastAPI (modo "async").
+    """
+    global _ingestor
+    if _ingestor is not None:
+        return
+
+    _ingestor = IngestorAsync(
+        tamanho_lote=settings.INGEST_FLUSH_SIZE,
+        intervalo_flush_ms=settings.INGEST_FLUSH_INTERVAL_MS,
+        tamanho_fila=settings.INGEST_QUEUE_MAXSIZE,
+    )
+    await _ingestor.iniciar()
+    print("[MQTT-INGESTOR-ASYNC] Ingestor MQTT iniciado no event loop.")
+
+
+async def stop_mqtt_ingestor_async() -> None:
+    global _ingestor
+    if _ingestor is None:
+        return
+    await _ingestor.parar()
+    _ingestor = None
+    print("[MQTT-INGESTOR-ASYNC] Ingestor MQTT encerrado; fila de leituras drenada.")
+
+
+def estatisticas_ingestor_async() -> Optional[Dict[str, int]]:
+    return _ingestor.estatisticas() if _ingestor is not None else None
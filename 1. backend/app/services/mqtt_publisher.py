@@ -0,0 +1,312 @@
+# app/services/mqtt_publisher.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import paho.mqtt.client as mqtt
+
+from app.core.config import settings
+
+# mids esperando PUBACK guardados para medir a latência (e acks que chegaram
+# antes do mid ser registrado); acima disso, os mais antigos saem
+MAX_ACKS_PENDENTES = 10000
+
+
+class MqttIndisponivel(Exception):
+    """Publicador sem conexão com o broker (ou não iniciado): a API responde 503."""
+
+
+@dataclass(frozen=True)
+class ResultadoPublicacao:
+    mid: int
+    qos: int
+    confirmado: bool        # True só quando esperou o PUBACK e ele chegou
+    latencia_ms: float      # até o PUBACK (se esperou) ou só o publish
+
+
+class MqttTimeout(Exception):
+    """
+    O broker não confirmou (PUBACK) dentro do prazo: a API responde 504.
+    A mensagem foi publicada e ainda pode chegar ao dispositivo; `resultado`
+    é a publicação, não confirmada.
+    """
+
+    def __init__(self, mensagem: str, resultado: ResultadoPublicacao):
+        super().__init__(mensagem)
+        self.resultado = resultado
+
+
+class PublicadorMqtt:
+    """
+    Cliente MQTT de publicação compartilhado pela API (comandos para os
+    dispositivos), iniciado com o app e com a própria thread de rede
+    (`loop_start`), então os acks de QoS 1/2 são processados e a reconexão
+    é automática.
+
+    Com MQTT_INGESTOR_MODE="thread" reaproveita a conexão do ingestor, que
+    já roda um loop de rede (main.py passa o cliente dele); no modo async
+    (aiomqtt) abre uma conexão própria.
+
+    `publicar` nunca conecta na thread do request: sem conexão, falha na hora
+    (MqttIndisponivel). Esperar o PUBACK é opcional e limitado por timeout.
+    """
+
+    def __init__(self, qos: int, timeout_s: float):
+        self.qos = qos
+        self.timeout_s = timeout_s
+        self._cliente: Optional[mqtt.Client] = None
+        self._proprio = False
+        self._lock = threading.Lock()
+        self._acks_pendentes: "OrderedDict[int, float]" = OrderedDict()
+        self._acks_adiantados: "OrderedDict[int, float]" = OrderedDict()
+        self._contadores = {
+            "publicadas": 0,
+            "confirmadas": 0,
+            "timeouts": 0,
+            "sem_conexao": 0,
+            "falhas": 0,
+        }
+        self._lat_publicacao = {"n": 0, "soma": 0.0, "max": 0.0}
+        self._lat_ack = {"n": 0, "soma": 0.0, "max": 0.0}
+        self._ouvintes_ack: List[Callable[[int], None]] = []
+
+    # ========= Ciclo de vida =========
+
+    def adicionar_ouvinte_ack(self, ouvinte: Callable[[int], None]) -> None:
+        """Chamado com o mid de cada publicação confirmada (thread de rede do paho; não pode bloquear)."""
+        self._ouvintes_ack.append(ouvinte)
+
+    def iniciar(self, reaproveitar: Optional[mqtt.Client] = None) -> None:
+        """
+        `reaproveitar`: cliente já conectado e com loop de rede rodando (o do
+        ingestor no modo thread); sem ele, abre uma conexão própria.
+        """
+        if self._cliente is not None:
+            return
+
+        cliente = reaproveitar
+        if cliente is not None:
+            print("[MQTT-PUBLICADOR] Reaproveitando a conexão do ingestor MQTT.")
+            self._proprio = False
+        else:
+            cliente = mqtt.Client(client_id="BACKEND-UMID-PUBLICADOR", clean_session=True)
+            if settings.MQTT_USERNAME:
+                cliente.username_pw_set(settings.MQTT_USERNAME, settings.MQTT_PASSWORD or "")
+            cliente.on_connect = self._on_connect
+            cliente.on_disconnect = self._on_disconnect
+            cliente.reconnect_delay_set(min_delay=1, max_delay=30)
+
+            print(
+                f"[MQTT-PUBLICADOR] Conectando em {settings.MQTT_BROKER_HOST}:{settings.MQTT_BROKER_PORT} ..."
+            )
+            # connect_async + loop_start: não bloqueia o startup se o broker estiver fora
+            cliente.connect_async(settings.MQTT_BROKER_HOST, settings.MQTT_BROKER_PORT, keepalive=60)
+            cliente.loop_start()
+            self._proprio = True
+
+        # QoS 1/2: quantas mensagens ficam em voo sem ack antes do paho segurar as próximas
+        cliente.max_inflight_messages_set(settings.MQTT_MAX_INFLIGHT)
+        cliente.on_publish = self._on_publish
+        self._cliente = cliente
+
+    def encerrar(self) -> None:
+        """Chamar no shutdown, antes de parar o ingestor (a conexão pode ser a dele)."""
+        cliente, self._cliente = self._cliente, None
+        if cliente is None:
+            return
+        cliente.on_publish = None
+        if self._proprio:
+            cliente.disconnect()
+            cliente.loop_stop()
+            print("[MQTT-PUBLICADOR] Publicador MQTT encerrado.")
+
+    # ========= Callbacks (thread de rede do paho) =========
+
+    def _on_connect(self, client: mqtt.Client, userdata, flags, rc):
+        if rc == 0:
+            print("[MQTT-PUBLICADOR] Conectado ao broker.")
+        else:
+            print(f"[MQTT-PUBLICADOR] Falha na conexão. rc={rc}")
+
+    def _on_disconnect(self, client: mqtt.Client, userdata, rc):
+        if rc != 0:
+            print(f"[MQTT-PUBLICADOR] Conexão perdida (rc={rc}); reconectando ...")
+
+    def _on_publish(self, client: mqtt.Client, userdata, mid: int):
+        agora = time.perf_counter()
+        with self._lock:
+            inicio = self._acks_pendentes.pop(mid, None)
+            if inicio is None:
+                # o ack chegou antes de `publicar` registrar o mid (ou é de um
+                # mid que não é deste publicador: QoS 0, despejado, outro uso
+                # da conexão do ingestor), então o dicionário é limitado
+                self._acks_adiantados[mid] = agora
+                while len(self._acks_adiantados) > MAX_ACKS_PENDENTES:
+                    self._acks_adiantados.popitem(last=False)
+            else:
+                self._registrar_ack(agora - inicio)
+
+        for ouvinte in self._ouvintes_ack:
+            try:
+                ouvinte(mid)
+            except Exception as e:
+                print(f"[MQTT-PUBLICADOR] Erro em ouvinte de ack: {e}")
+
+    # ========= Publicação =========
+
+    def _cliente_conectado(self) -> mqtt.Client:
+        cliente = self._cliente
+        if cliente is None or not cliente.is_connected():
+            with self._lock:
+                self._contadores["sem_conexao"] += 1
+            raise MqttIndisponivel("Sem conexão com o broker MQTT.")
+        return cliente
+
+    def _enviar(self, cliente: mqtt.Client, topic: str, payload: str, qos: int, retain: bool):
+        """publish + contabilização; devolve (info, inicio, duração do publish)."""
+        inicio = time.perf_counter()
+        info = cliente.publish(topic, payload, qos=qos, retain=retain)
+        duracao = time.perf_counter() - inicio
+
+        with self._lock:
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                self._contadores["sem_conexao" if info.rc == mqtt.MQTT_ERR_NO_CONN else "falhas"] += 1
+                erro = info.rc
+            else:
+                erro = None
+                self._contadores["publicadas"] += 1
+                self._somar(self._lat_publicacao, duracao)
+                ack = self._acks_adiantados.pop(info.mid, None)
+                if qos > 0:     # QoS 0 não tem PUBACK: nada a esperar nem medir
+                    if ack is not None:
+                        self._registrar_ack(ack - inicio)
+                    else:
+                        self._acks_pendentes[info.mid] = inicio
+                        while len(self._acks_pendentes) > MAX_ACKS_PENDENTES:
+                            self._acks_pendentes.popitem(last=False)
+
+        if erro == mqtt.MQTT_ERR_NO_CONN:
+            raise MqttIndisponivel("Sem conexão com o broker MQTT.")
+        if erro is not None:
+            raise RuntimeError(mqtt.error_string(erro))
+        return info, inicio, duracao
+
+    def _esperar_ack(self, info, inicio: float, qos: int, prazo: float) -> ResultadoPublicacao:
+        if qos == 0:
+            # QoS 0 não tem PUBACK: is_published() só diria que saiu no socket
+            return ResultadoPublicacao(
+                mid=info.mid, qos=qos, confirmado=False, latencia_ms=(time.perf_counter() - inicio) * 1000
+            )
+        info.wait_for_publish(timeout=max(0.0, prazo - time.monotonic()))
+        if not info.is_published():
+            with self._lock:
+                self._contadores["timeouts"] += 1
+            raise MqttTimeout(
+                "O broker MQTT não confirmou o comando dentro do prazo.",
+                ResultadoPublicacao(
+                    mid=info.mid, qos=qos, confirmado=False, latencia_ms=(time.perf_counter() - inicio) * 1000
+                ),
+            )
+        return ResultadoPublicacao(
+            mid=info.mid, qos=qos, confirmado=True, latencia_ms=(time.perf_counter() - inicio) * 1000
+        )
+
+    def publicar(
+        self,
+        topic: str,
+        payload: str,
+        qos: Optional[int] = None,
+        retain: bool = False,
+        aguardar_ack: bool = False,
+        timeout_s: Optional[float] = None,
+    ) -> ResultadoPublicacao:
+        """
+        Publica e volta assim que a mensagem está na fila do cliente; com
+        `aguardar_ack`, espera a confirmação do broker até `timeout_s` (com
+        QoS 0 não há confirmação: volta na hora, com confirmado=False).
+        """
+        qos = self.qos if qos is None else qos
+        cliente = self._cliente_conectado()
+        info, inicio, duracao = self._enviar(cliente, topic, payload, qos, retain)
+
+        if not aguardar_ack:
+            return ResultadoPublicacao(mid=info.mid, qos=qos, confirmado=False, latencia_ms=duracao * 1000)
+        prazo = time.monotonic() + (self.timeout_s if timeout_s is None else timeout_s)
+        return self._esperar_ack(info, inicio, qos, prazo)
+
+    def publicar_varios(
+        self,
+        mensagens: Sequence[Tuple[str, str]],
+        qos: Optional[int] = None,
+        aguardar_ack: bool = False,
+        timeout_s: Optional[float] = None,
+    ) -> List[Union[ResultadoPublicacao, Exception]]:
+        """
+        Publica várias (tópico, payload) em sequência, sem esperar ack entre
+        uma e outra (o cliente mantém até MQTT_MAX_INFLIGHT em voo). Com
+        `aguardar_ack`, espera as confirmações com um prazo único para o lote.
+
+        Sem conexão no início: MqttIndisponivel para o lote todo. Depois disso,
+        cada posição da lista é o resultado ou a exceção daquela mensagem.
+        """
+        qos = self.qos if qos is None else qos
+        cliente = self._cliente_conectado()
+
+        enviados: List[Union[Tuple[Any, float, float], Exception]] = []
+        for topic, payload in mensagens:
+            try:
+                enviados.append(self._enviar(cliente, topic, payload, qos, False))
+            except Exception as e:
+                enviados.append(e)
+
+        prazo = time.monotonic() + (self.timeout_s if timeout_s is None else timeout_s)
+        resultados: List[Union[ResultadoPublicacao, Exception]] = []
+        for item in enviados:
+            if isinstance(item, Exception):
+                resultados.append(item)
+                continue
+            info, inicio, duracao = item
+            if not aguardar_ack:
+                resultados.append(
+                    ResultadoPublicacao(mid=info.mid, qos=qos, confirmado=False, latencia_ms=duracao * 1000)
+                )
+                continue
+            try:
+                resultados.append(self._esperar_ack(info, inicio, qos, prazo))
+            except Exception as e:
+                resultados.append(e)
+        return resultados
+
+    # ========= Métricas =========
+
+    @staticmethod
+    def _somar(acumulado: Dict[str, float], segundos: float) -> None:
+        acumulado["n"] += 1
+        acumulado["soma"] += segundos
+        acumulado["max"] = max(acumulado["max"], segundos)
+
+    def _registrar_ack(self, segundos: float) -> None:
+        # chamado com self._lock
+        self._contadores["confirmadas"] += 1
+        self._somar(self._lat_ack, segundos)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        cliente = self._cliente
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            stats["acks_pendentes"] = len(self._acks_pendentes)
+            for nome, lat in (("publicacao", self._lat_publicacao), ("ack", self._lat_ack)):
+                stats[f"latencia_{nome}_media_ms"] = round(lat["soma"] / lat["n"] * 1000, 3) if lat["n"] else 0.0
+                stats[f"latencia_{nome}_max_ms"] = round(lat["max"] * 1000, 3)
+        stats["qos"] = self.qos
+        stats["conexao"] = None if cliente is None else ("propria" if self._proprio else "ingestor")
+        stats["conectado"] = bool(cliente is not None and cliente.is_connected())
+        return stats
+
+
+publicador_mqtt = PublicadorMqtt(
+    qos=settings.MQTT_COMANDO_QOS,
+    timeout_s=settings.MQTT_PUBLICAR_TIMEOUT_S,
+)
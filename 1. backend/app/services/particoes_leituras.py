@@ -0,0 +1,189 @@
+# app/services/particoes_leituras.py
+import re
+import threading
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionIngestao
+
+TABELA = "leituras"
+_RE_PARTICAO = re.compile(r"^leituras_p(\d{4})(\d{2})$")
+
+
+def _inicio_mes(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _somar_meses(d: date, meses: int) -> date:
+    total = d.year * 12 + (d.month - 1) + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nome_particao(mes: date) -> str:
+    return f"{TABELA}_p{mes:%Y%m}"
+
+
+def listar_particoes(db: Session) -> List[str]:
+    return list(
+        db.execute(
+            text(
+                """
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = :tabela
+                ORDER BY c.relname
+                """
+            ),
+            {"tabela": TABELA},
+        ).scalars()
+    )
+
+
+def _criar_particao(db: Session, mes: date) -> None:
+    """
+    Cria a partição do mês. Leituras desse mês que já caíram na partição
+    default (mês sem partição na hora em que chegaram) impedem o CREATE
+    ... PARTITION OF; nesse caso, numa transação só: desanexa a default,
+    cria o mês, move as linhas para ele e anexa a default de volta.
+    """
+    nome = nome_particao(mes)
+    de, ate = mes.isoformat(), _somar_meses(mes, 1).isoformat()
+    default = f"{TABELA}_default"
+
+    tem_default = default in listar_particoes(db)
+    na_default = tem_default and db.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE timestamp >= :de AND timestamp < :ate)"),
+        {"de": de, "ate": ate},
+    ).scalar()
+
+    if na_default:
+        db.execute(text(f"ALTER TABLE {TABELA} DETACH PARTITION {default}"))
+    db.execute(
+        text(
+            f'CREATE TABLE IF NOT EXISTS "{nome}" PARTITION OF {TABELA} '
+            f"FOR VALUES FROM ('{de}') TO ('{ate}')"
+        )
+    )
+    if na_default:
+        filtro = f"WHERE timestamp >= '{de}' AND timestamp < '{ate}'"
+        movidas = db.execute(text(f'INSERT INTO "{nome}" SELECT * FROM {default} {filtro}')).rowcount
+        db.execute(text(f"DELETE FROM {default} {filtro}"))
+        db.execute(text(f"ALTER TABLE {TABELA} ATTACH PARTITION {default} DEFAULT"))
+        print(f"[PARTICOES] {movidas} leituras movidas de {default} para {nome}.")
+
+
+def garantir_particoes(db: Session, meses_futuros: int, hoje: Optional[date] = None) -> List[str]:
+    """
+    Cria (se faltarem) as partições do mês atual até `meses_futuros` à frente,
+    além da partição default. Retorna os nomes das partições criadas.
+
+    Cada partição é criada e commitada sozinha: uma que falhar não impede
+    as outras (e é tentada de novo na próxima rodada).
+    """
+    mes_atual = _inicio_mes(hoje or datetime.utcnow().date())
+    existentes = set(listar_particoes(db))
+    criadas: List[str] = []
+
+    for i in range(meses_futuros + 1):
+        mes = _somar_meses(mes_atual, i)
+        nome = nome_particao(mes)
+        if nome in existentes:
+            continue
+        try:
+            _criar_particao(db, mes)
+            db.commit()
+            criadas.append(nome)
+        except Exception as e:
+            db.rollback()
+            print(f"[PARTICOES] Erro ao criar {nome}: {e}")
+
+    if f"{TABELA}_default" not in existentes:
+        try:
+            db.execute(text(f"CREATE TABLE IF NOT EXISTS {TABELA}_default PARTITION OF {TABELA} DEFAULT"))
+            db.commit()
+            criadas.append(f"{TABELA}_default")
+        except Exception as e:
+            db.rollback()
+            print(f"[PARTICOES] Erro ao criar {TABELA}_default: {e}")
+
+    return criadas
+
+
+def aplicar_retencao(db: Session, meses: int, acao: str, hoje: Optional[date] = None) -> List[str]:
+    """
+    Desanexa (acao="detach") ou apaga (acao="drop") as partições mensais que
+    terminam antes de `meses` meses atrás. meses <= 0 mantém tudo.
+    """
+    if meses <= 0:
+        return []
+
+    limite = _somar_meses(_inicio_mes(hoje or datetime.utcnow().date()), -meses)
+    removidas: List[str] = []
+
+    for nome in listar_particoes(db):
+        m = _RE_PARTICAO.match(nome)
+        if not m:
+            continue
+        mes = date(int(m.group(1)), int(m.group(2)), 1)
+        if _somar_meses(mes, 1) > limite:
+            continue
+
+        if acao == "drop":
+            db.execute(text(f'DROP TABLE "{nome}"'))
+        else:
+            # fica como tabela comum, fora das consultas, para arquivar/exportar
+            db.execute(text(f'ALTER TABLE {TABELA} DETACH PARTITION "{nome}"'))
+        removidas.append(nome)
+
+    db.commit()
+    return removidas
+
+
+def manter_particoes() -> None:
+    db = SessionIngestao()
+    criadas: List[str] = []
+    removidas: List[str] = []
+    try:
+        # criação e retenção são independentes: erro em uma não pula a outra
+        try:
+            criadas = garantir_particoes(db, settings.LEITURAS_PARTICOES_FUTURAS)
+        except Exception as e:
+            db.rollback()
+            print(f"[PARTICOES] Erro ao criar partições: {e}")
+        try:
+            removidas = aplicar_retencao(db, settings.LEITURAS_RETENCAO_MESES, settings.LEITURAS_RETENCAO_ACAO)
+        except Exception as e:
+            db.rollback()
+            print(f"[PARTICOES] Erro na retenção de partições: {e}")
+        if criadas or removidas:
+            print(f"[PARTICOES] Criadas: {criadas or '-'} | Retenção ({settings.LEITURAS_RETENCAO_ACAO}): {removidas or '-'}")
+    finally:
+        db.close()
+
+
+_thread: Optional[threading.Thread] = None
+
+
+def iniciar_manutencao_particoes() -> None:
+    """
+    Roda a manutenção uma vez (no startup) e depois a cada
+    LEITURAS_PARTICOES_INTERVALO_S em uma thread daemon.
+    """
+    global _thread
+    manter_particoes()
+    if _thread is not None or settings.LEITURAS_PARTICOES_INTERVALO_S <= 0:
+        return
+
+    def _loop():
+        evento = threading.Event()
+        while not evento.wait(settings.LEITURAS_PARTICOES_INTERVALO_S):
+            manter_particoes()
+
+    _thread = threading.Thread(target=_loop, name="particoes-leituras", daemon=True)
+    _thread.start()
@@ -0,0 +1,223 @@
+# app/services/presenca_dispositivos.py
+import heapq
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+from app.db.session import SessionIngestao
+from app.models.dispositivo import Dispositivo
+
+STATUS_ONLINE = "online"
+STATUS_OFFLINE = "offline"
+
+# payloads do tópico de conexão (`<baseTopic>/conn`, retido; o LWT publica OFFLINE)
+_PAYLOAD_CONEXAO = {
+    "online": True, "1": True, "true": True,
+    "offline": False, "0": False, "false": False,
+}
+
+
+def interpretar_conexao(payload: bytes) -> Optional[bool]:
+    """True = ONLINE, False = OFFLINE, None = payload desconhecido."""
+    return _PAYLOAD_CONEXAO.get(payload.decode(errors="ignore").strip().lower())
+
+
+class MotorPresenca:
+    """
+    Presença (online/offline) de cada dispositivo, mantida pela ingestão.
+
+    Qualquer mensagem do dispositivo conta como sinal de vida; o tópico de
+    conexão (`conn`: ONLINE retido ao conectar, OFFLINE pelo LWT) muda o
+    estado na hora. Sem mensagem por PRESENCA_TIMEOUT_S, o dispositivo fica
+    offline.
+
+    Os prazos ficam num heap com no máximo uma entrada por dispositivo
+    online: a mensagem só atualiza o "visto por último"; quando a entrada
+    vence, o prazo real é conferido e, se o dispositivo falou nesse meio
+    tempo, a entrada volta para o heap com o novo prazo. Nada varre todos os
+    dispositivos.
+
+    As mudanças de status vão para `dispositivos.status` em lote, a cada
+    PRESENCA_FLUSH_S (um UPDATE por status), não por mensagem.
+    """
+
+    def __init__(self, timeout_s: float, flush_s: float):
+        self.timeout_s = timeout_s
+        self.flush_s = flush_s
+        self._lock = threading.Lock()
+        self._vistos: Dict[UUID, float] = {}          # monotonic da última mensagem
+        self._online: Set[UUID] = set()
+        self._prazos: List[Tuple[float, UUID]] = []
+        self._no_heap: Set[UUID] = set()
+        self._mudancas: Dict[UUID, str] = {}          # status a gravar (o último vence)
+        self._contadores = {
+            "mensagens": 0,
+            "ficaram_online": 0,
+            "ficaram_offline": 0,
+            "offline_por_lwt": 0,
+            "offline_por_silencio": 0,
+            "gravados": 0,
+            "erros_gravacao": 0,
+        }
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ========= Ciclo de vida =========
+
+    def carregar(self) -> None:
+        """
+        Startup: quem está "online" no banco ganha um prazo a partir de agora
+        (se não mandar nada até lá, vai para offline).
+        """
+        db = SessionIngestao()
+        try:
+            ids = [
+                dispositivo_id
+                for (dispositivo_id,) in db.query(Dispositivo.id).filter(
+                    Dispositivo.ativo == True, Dispositivo.status == STATUS_ONLINE
+                )
+            ]
+        finally:
+            db.close()
+
+        agora = time.monotonic()
+        with self._lock:
+            for dispositivo_id in ids:
+                if dispositivo_id in self._online:
+                    continue
+                self._online.add(dispositivo_id)
+                self._vistos.setdefault(dispositivo_id, agora)
+                self._agendar(dispositivo_id, agora + self.timeout_s)
+
+    def iniciar(self) -> None:
+        if self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="presenca-dispositivos", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> None:
+        """Para a thread e grava as mudanças que ainda não foram para o banco."""
+        if self._thread is None:
+            return
+        self._parar.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        self._gravar()
+
+    def _loop(self) -> None:
+        while not self._parar.wait(self.flush_s):
+            try:
+                self._expirar()
+                self._gravar()
+            except Exception as e:
+                print(f"[PRESENCA] Erro no ciclo: {e}")
+
+    # ========= Eventos (threads da ingestão) =========
+
+    def _agendar(self, dispositivo_id: UUID, prazo: float) -> None:
+        # chamado com self._lock
+        if dispositivo_id not in self._no_heap:
+            self._no_heap.add(dispositivo_id)
+            heapq.heappush(self._prazos, (prazo, dispositivo_id))
+
+    def visto(self, dispositivo_id: UUID) -> None:
+        """Mensagem do dispositivo (qualquer tópico)."""
+        agora = time.monotonic()
+        with self._lock:
+            self._contadores["mensagens"] += 1
+            self._vistos[dispositivo_id] = agora
+            if dispositivo_id not in self._online:
+                self._online.add(dispositivo_id)
+                self._mudancas[dispositivo_id] = STATUS_ONLINE
+                self._contadores["ficaram_online"] += 1
+            self._agendar(dispositivo_id, agora + self.timeout_s)
+
+    def conexao(self, dispositivo_id: UUID, online: bool) -> None:
+        """Tópico `conn`: ONLINE ao conectar, OFFLINE quando o broker dispara o LWT."""
+        if online:
+            self.visto(dispositivo_id)
+            return
+        with self._lock:
+            self._contadores["mensagens"] += 1
+            self._vistos.pop(dispositivo_id, None)
+            if dispositivo_id in self._online:
+                self._online.discard(dispositivo_id)
+                self._contadores["ficaram_offline"] += 1
+                self._contadores["offline_por_lwt"] += 1
+            # grava mesmo se já estava offline aqui (o banco pode dizer "online")
+            self._mudancas[dispositivo_id] = STATUS_OFFLINE
+
+    # ========= Prazos e gravação (thread da presença) =========
+
+    def _expirar(self) -> None:
+        agora = time.monotonic()
+        with self._lock:
+            while self._prazos and self._prazos[0][0] <= agora:
+                _, dispositivo_id = heapq.heappop(self._prazos)
+                self._no_heap.discard(dispositivo_id)
+                if dispositivo_id not in self._online:
+                    continue
+                prazo_real = self._vistos.get(dispositivo_id, 0.0) + self.timeout_s
+                if prazo_real > agora:
+                    self._agendar(dispositivo_id, prazo_real)
+                    continue
+                self._online.discard(dispositivo_id)
+                self._vistos.pop(dispositivo_id, None)
+                self._mudancas[dispositivo_id] = STATUS_OFFLINE
+                self._contadores["ficaram_offline"] += 1
+                self._contadores["offline_por_silencio"] += 1
+
+    def _gravar(self) -> None:
+        with self._lock:
+            if not self._mudancas:
+                return
+            mudancas, self._mudancas = self._mudancas, {}
+
+        por_status: Dict[str, List[UUID]] = {}
+        for dispositivo_id, status in mudancas.items():
+            por_status.setdefault(status, []).append(dispositivo_id)
+
+        db = SessionIngestao()
+        try:
+            for status, ids in por_status.items():
+                db.query(Dispositivo).filter(
+                    Dispositivo.id.in_(ids),
+                    Dispositivo.status.is_distinct_from(status),
+                ).update({Dispositivo.status: status}, synchronize_session=False)
+            db.commit()
+            with self._lock:
+                self._contadores["gravados"] += len(mudancas)
+        except Exception as e:
+            db.rollback()
+            print(f"[PRESENCA] Erro ao gravar {len(mudancas)} mudanças de status: {e}")
+            with self._lock:
+                self._contadores["erros_gravacao"] += 1
+                # volta para a próxima rodada (sem passar por cima de uma mudança mais nova)
+                for dispositivo_id, status in mudancas.items():
+                    self._mudancas.setdefault(dispositivo_id, status)
+        finally:
+            db.close()
+
+    # ========= Consulta =========
+
+    def online(self, dispositivo_id: UUID) -> bool:
+        with self._lock:
+            return dispositivo_id in self._online
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            stats["online"] = len(self._online)
+            stats["prazos_no_heap"] = len(self._prazos)
+            stats["aguardando_gravacao"] = len(self._mudancas)
+        stats["timeout_s"] = self.timeout_s
+        return stats
+
+
+presenca_dispositivos = MotorPresenca(
+    timeout_s=settings.PRESENCA_TIMEOUT_S,
+    flush_s=settings.PRESENCA_FLUSH_S,
+)
@@ -0,0 +1,167 @@
+# app/services/push_leituras.py
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Set
+from uuid import UUID
+
+from app.core.config import settings
+from app.services.estado_dispositivos import EstadoDispositivo, estado_dispositivos
+
+
+class LimiteConexoesPush(Exception):
+    """Conexões de push no limite (PUSH_MAX_CONEXOES): a API responde 503."""
+
+
+def formatar_evento(estado: EstadoDispositivo) -> str:
+    """Evento SSE "estado", com o mesmo formato de GET /dispositivos/estado."""
+    dados = {
+        "dispositivo_id": str(estado.dispositivo_id),
+        "umidade": estado.umidade,
+        "status": estado.status,
+        "potencia": estado.potencia,
+        "visto_em": estado.visto_em.isoformat() if estado.visto_em else None,
+    }
+    return f"event: estado\nid: {estado.versao}\ndata: {json.dumps(dados)}\n\n"
+
+
+class AssinaturaPush:
+    """
+    Uma conexão de push: os dispositivos que ela acompanha e um buffer
+    limitado de atualizações pendentes.
+
+    O buffer é por dispositivo (OrderedDict): se o cliente ainda não leu a
+    atualização anterior de um dispositivo, a nova substitui a antiga
+    (coalescência), então um consumidor lento recebe sempre o estado mais
+    recente, não um histórico atrasado. Acima de `max_pendentes`
+    dispositivos pendentes, o mais antigo é descartado.
+    """
+
+    def __init__(self, dispositivo_ids: Iterable[UUID], max_pendentes: int, loop: asyncio.AbstractEventLoop):
+        self.dispositivo_ids: Set[UUID] = set(dispositivo_ids)
+        self.max_pendentes = max(1, max_pendentes)
+        self._loop = loop
+        self._evento = asyncio.Event()
+        self._pendentes: "OrderedDict[UUID, EstadoDispositivo]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._acordada = False
+        self.contadores = {"entregues": 0, "coalescidas": 0, "descartadas": 0}
+
+    def _acordar(self) -> None:
+        self._evento.set()
+
+    def oferecer(self, estado: EstadoDispositivo) -> None:
+        """Chamado pela ingestão (qualquer thread); não bloqueia."""
+        with self._lock:
+            if estado.dispositivo_id in self._pendentes:
+                self.contadores["coalescidas"] += 1
+                del self._pendentes[estado.dispositivo_id]
+            elif len(self._pendentes) >= self.max_pendentes:
+                self._pendentes.popitem(last=False)
+                self.contadores["descartadas"] += 1
+            self._pendentes[estado.dispositivo_id] = estado
+
+            acordar = not self._acordada
+            self._acordada = True
+
+        # um call_soon_threadsafe por rodada de leitura, não por mensagem
+        if acordar:
+            try:
+                self._loop.call_soon_threadsafe(self._acordar)
+            except RuntimeError:
+                pass    # loop já fechado: a conexão está sendo encerrada
+
+    async def proximos(self, timeout: float) -> List[EstadoDispositivo]:
+        """
+        Espera até `timeout` por atualizações e devolve todas as pendentes
+        (lista vazia = nada novo no período).
+        """
+        prazo = self._loop.time() + timeout
+        while True:
+            try:
+                await asyncio.wait_for(self._evento.wait(), max(0.0, prazo - self._loop.time()))
+            except asyncio.TimeoutError:
+                return []
+
+            with self._lock:
+                self._evento.clear()
+                self._acordada = False
+                estados = list(self._pendentes.values())
+                self._pendentes.clear()
+                self.contadores["entregues"] += len(estados)
+            if estados:
+                return estados
+            # acordada por um aviso já atendido na rodada anterior: volta a esperar
+
+
+class HubPush:
+    """
+    Distribui as atualizações do estado ao vivo (estado_dispositivos) para as
+    conexões de push (SSE) deste processo. Índice dispositivo -> assinaturas,
+    então cada atualização só toca quem acompanha aquele dispositivo.
+    """
+
+    def __init__(self, max_conexoes: int, max_pendentes: int):
+        self.max_conexoes = max_conexoes
+        self.max_pendentes = max_pendentes
+        self._por_dispositivo: Dict[UUID, Set[AssinaturaPush]] = {}
+        self._assinaturas: Set[AssinaturaPush] = set()
+        self._lock = threading.Lock()
+        self._contadores = {"conexoes_total": 0, "recusadas": 0, "publicadas": 0}
+        self._finalizados = {"entregues": 0, "coalescidas": 0, "descartadas": 0}
+
+        estado_dispositivos.adicionar_ouvinte(self.publicar)
+
+    def assinar(self, dispositivo_ids: Iterable[UUID]) -> AssinaturaPush:
+        """Chamar de dentro do event loop (a assinatura acorda esse loop)."""
+        assinatura = AssinaturaPush(dispositivo_ids, self.max_pendentes, asyncio.get_running_loop())
+        with self._lock:
+            if len(self._assinaturas) >= self.max_conexoes:
+                self._contadores["recusadas"] += 1
+                raise LimiteConexoesPush()
+            self._assinaturas.add(assinatura)
+            for dispositivo_id in assinatura.dispositivo_ids:
+                self._por_dispositivo.setdefault(dispositivo_id, set()).add(assinatura)
+            self._contadores["conexoes_total"] += 1
+        return assinatura
+
+    def cancelar(self, assinatura: AssinaturaPush) -> None:
+        with self._lock:
+            if assinatura not in self._assinaturas:
+                return
+            self._assinaturas.discard(assinatura)
+            for dispositivo_id in assinatura.dispositivo_ids:
+                conjunto = self._por_dispositivo.get(dispositivo_id)
+                if conjunto is not None:
+                    conjunto.discard(assinatura)
+                    if not conjunto:
+                        del self._por_dispositivo[dispositivo_id]
+            for chave, valor in assinatura.contadores.items():
+                self._finalizados[chave] += valor
+
+    def publicar(self, estado: EstadoDispositivo) -> None:
+        with self._lock:
+            destinos = list(self._por_dispositivo.get(estado.dispositivo_id, ()))
+            if destinos:
+                self._contadores["publicadas"] += 1
+        for assinatura in destinos:
+            assinatura.oferecer(estado)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            stats["conexoes"] = len(self._assinaturas)
+            stats["max_conexoes"] = self.max_conexoes
+            totais = dict(self._finalizados)
+            for assinatura in self._assinaturas:
+                for chave, valor in assinatura.contadores.items():
+                    totais[chave] += valor
+        stats.update(totais)
+        return stats
+
+
+hub_push = HubPush(
+    max_conexoes=settings.PUSH_MAX_CONEXOES,
+    max_pendentes=settings.PUSH_MAX_PENDENTES,
+)
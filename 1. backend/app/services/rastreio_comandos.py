@@ -0,0 +1,365 @@
+# app/services/rastreio_comandos.py
+import bisect
+import heapq
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.db.session import SessionIngestao
+from app.models.comando import (
+    COMANDO_CONFIRMADO,
+    COMANDO_ENVIADO,
+    COMANDO_EXPIRADO,
+    COMANDO_FALHOU,
+    COMANDO_RESPONDIDO,
+    Comando,
+)
+from app.services.mqtt_publisher import ResultadoPublicacao, publicador_mqtt
+
+# limites (ms) das faixas dos histogramas; a última faixa é "acima do último limite"
+LIMITES_HISTOGRAMA_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# acks que chegam antes do mid ser registrado ficam guardados por esse tempo
+_ACK_ADIANTADO_TTL_S = 60.0
+
+_COLUNAS = (
+    "id", "dispositivo_id", "usuario_id", "acao", "topic", "payload", "qos", "estado",
+    "enviado_em", "confirmado_em", "respondido_em", "resposta", "broker_ms", "ida_volta_ms", "erro",
+)
+
+
+@dataclass
+class ComandoRastreado:
+    """Um comando em memória, com os mesmos campos da tabela `comandos`."""
+    dispositivo_id: UUID
+    usuario_id: Optional[UUID]
+    acao: str
+    topic: str
+    payload: str
+    qos: int
+    id: UUID = field(default_factory=uuid.uuid4)
+    estado: str = COMANDO_ENVIADO
+    enviado_em: datetime = field(default_factory=datetime.utcnow)
+    confirmado_em: Optional[datetime] = None
+    respondido_em: Optional[datetime] = None
+    resposta: Optional[str] = None
+    broker_ms: Optional[float] = None
+    ida_volta_ms: Optional[float] = None
+    erro: Optional[str] = None
+    mid: Optional[int] = None
+    inicio: float = field(default_factory=time.perf_counter)
+
+    def linha(self) -> Dict[str, Any]:
+        return {coluna: getattr(self, coluna) for coluna in _COLUNAS}
+
+
+def _resposta_de(dados: Dict[str, Any]) -> Optional[str]:
+    """Qual publicação do dispositivo (já interpretada pela ingestão) conta como resposta a um comando."""
+    if "status" in dados:
+        return "status"
+    if "config_atual" in dados or "config_atual_raw" in dados:
+        return "config-atual"
+    return None
+
+
+class Histograma:
+    def __init__(self, limites_ms: Tuple[int, ...]):
+        self.limites_ms = limites_ms
+        self.contagens = [0] * (len(limites_ms) + 1)
+        self.n = 0
+        self.soma_ms = 0.0
+
+    def registrar(self, ms: float) -> None:
+        self.contagens[bisect.bisect_left(self.limites_ms, ms)] += 1
+        self.n += 1
+        self.soma_ms += ms
+
+    def resumo(self) -> Dict[str, Any]:
+        return {
+            "n": self.n,
+            "media_ms": round(self.soma_ms / self.n, 3) if self.n else 0.0,
+            "contagens": list(self.contagens),
+        }
+
+
+class RastreadorComandos:
+    """
+    Acompanha os comandos enviados até o dispositivo responder.
+
+    O firmware não devolve o id do comando: depois de agir, ele publica
+    `status` e/ou `config-atual`. A próxima dessas publicações de um
+    dispositivo é casada com o comando pendente mais antigo dele (FIFO), e
+    o tempo desde o envio vira a latência de ida e volta. O PUBACK do broker
+    (QoS >= 1) chega pelo publicador e vira a latência do broker. Sem resposta
+    em COMANDOS_TIMEOUT_S, o comando expira (heap de prazos, sem varrer os
+    pendentes).
+
+    As mudanças de estado ficam em memória e uma thread grava em lote (upsert
+    em `comandos`) a cada COMANDOS_FLUSH_S, então o request e a ingestão não
+    esperam o banco.
+    """
+
+    def __init__(self, timeout_s: float, flush_s: float):
+        self.timeout_s = timeout_s
+        self.flush_s = flush_s
+        self._lock = threading.Lock()
+        self._pendentes: Dict[UUID, ComandoRastreado] = {}
+        self._por_dispositivo: Dict[UUID, Deque[UUID]] = {}
+        self._por_mid: Dict[int, UUID] = {}
+        self._acks_adiantados: Dict[int, float] = {}
+        self._prazos: List[Tuple[float, int, UUID]] = []
+        self._seq = 0
+        self._sujos: Dict[UUID, ComandoRastreado] = {}
+        self._gravando: Dict[UUID, ComandoRastreado] = {}
+        self._contadores = {
+            "registrados": 0,
+            "confirmados": 0,
+            "respondidos": 0,
+            "expirados": 0,
+            "falharam": 0,
+            "gravados": 0,
+            "erros_gravacao": 0,
+        }
+        self._hist_broker = Histograma(LIMITES_HISTOGRAMA_MS)
+        self._hist_dispositivo = Histograma(LIMITES_HISTOGRAMA_MS)
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        publicador_mqtt.adicionar_ouvinte_ack(self.ao_confirmar)
+
+    # ========= Ciclo de vida =========
+
+    def iniciar(self) -> None:
+        if self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="rastreio-comandos", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> None:
+        """Para a thread e grava o que ainda está pendente de gravação."""
+        if self._thread is None:
+            return
+        self._parar.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        self._gravar()
+
+    def _loop(self) -> None:
+        while not self._parar.wait(self.flush_s):
+            try:
+                self._expirar()
+                self._gravar()
+            except Exception as e:
+                print(f"[RASTREIO-COMANDOS] Erro no ciclo: {e}")
+
+    # ========= Registro (thread do request) =========
+
+    def novo(
+        self, dispositivo_id: UUID, usuario_id: Optional[UUID], acao: str, topic: str, payload: str, qos: int
+    ) -> ComandoRastreado:
+        """Cria o registro (id de correlação e enviado_em) antes de publicar."""
+        return ComandoRastreado(
+            dispositivo_id=dispositivo_id,
+            usuario_id=usuario_id,
+            acao=acao,
+            topic=topic,
+            payload=payload,
+            qos=qos,
+        )
+
+    def enviado(self, comando: ComandoRastreado, resultado: ResultadoPublicacao) -> None:
+        """Publicado: passa a esperar o PUBACK (QoS >= 1) e a resposta do dispositivo."""
+        with self._lock:
+            self._contadores["registrados"] += 1
+            comando.mid = resultado.mid
+            if resultado.confirmado:
+                self._acks_adiantados.pop(resultado.mid, None)
+                self._confirmar(comando, resultado.latencia_ms)
+            elif comando.qos > 0:
+                adiantado = self._acks_adiantados.pop(resultado.mid, None)
+                if adiantado is not None:
+                    self._confirmar(comando, (adiantado - comando.inicio) * 1000)
+                else:
+                    self._por_mid[resultado.mid] = comando.id
+
+            self._pendentes[comando.id] = comando
+            self._por_dispositivo.setdefault(comando.dispositivo_id, deque()).append(comando.id)
+            self._seq += 1
+            heapq.heappush(self._prazos, (time.monotonic() + self.timeout_s, self._seq, comando.id))
+            self._sujos[comando.id] = comando
+
+    def falhou(self, comando: ComandoRastreado, erro: str) -> None:
+        """Não chegou a ser publicado (sem conexão, erro do cliente)."""
+        with self._lock:
+            self._contadores["registrados"] += 1
+            self._contadores["falharam"] += 1
+            comando.estado = COMANDO_FALHOU
+            comando.erro = erro
+            self._sujos[comando.id] = comando
+
+    # ========= Eventos (threads do paho / da ingestão) =========
+
+    def _confirmar(self, comando: ComandoRastreado, broker_ms: float) -> None:
+        # chamado com self._lock
+        if comando.confirmado_em is not None:
+            return
+        comando.confirmado_em = datetime.utcnow()
+        comando.broker_ms = round(broker_ms, 3)
+        if comando.estado == COMANDO_ENVIADO:
+            comando.estado = COMANDO_CONFIRMADO
+        self._hist_broker.registrar(broker_ms)
+        self._contadores["confirmados"] += 1
+        self._sujos[comando.id] = comando
+
+    def ao_confirmar(self, mid: int) -> None:
+        """Ouvinte de PUBACK do publicador (thread de rede do paho)."""
+        agora = time.perf_counter()
+        with self._lock:
+            comando_id = self._por_mid.pop(mid, None)
+            if comando_id is None:
+                self._acks_adiantados[mid] = agora
+                return
+            comando = self._pendentes.get(comando_id)
+            if comando is not None:
+                self._confirmar(comando, (agora - comando.inicio) * 1000)
+
+    def observar(self, dispositivo_id: UUID, dados: Dict[str, Any], recebido_em: datetime) -> None:
+        """
+        Chamado pela ingestão a cada mensagem interpretada de um dispositivo;
+        `status` / `config-atual` respondem o comando pendente mais antigo dele.
+        """
+        if dispositivo_id not in self._por_dispositivo:
+            return      # caminho comum: nenhum comando pendente para o dispositivo
+        resposta = _resposta_de(dados)
+        if resposta is None:
+            return
+
+        with self._lock:
+            fila = self._por_dispositivo.get(dispositivo_id)
+            comando = None
+            while fila and comando is None:
+                comando = self._pendentes.pop(fila.popleft(), None)
+                if comando is not None and recebido_em < comando.enviado_em:
+                    # mensagem anterior ao comando (estava na fila da ingestão)
+                    self._pendentes[comando.id] = comando
+                    fila.appendleft(comando.id)
+                    return
+            if fila is not None and not fila:
+                del self._por_dispositivo[dispositivo_id]
+            if comando is None:
+                return
+
+            ida_volta_ms = (recebido_em - comando.enviado_em).total_seconds() * 1000
+            comando.estado = COMANDO_RESPONDIDO
+            comando.respondido_em = recebido_em
+            comando.resposta = resposta
+            comando.ida_volta_ms = round(ida_volta_ms, 3)
+            self._hist_dispositivo.registrar(ida_volta_ms)
+            self._contadores["respondidos"] += 1
+            if comando.mid is not None and self._por_mid.get(comando.mid) == comando.id:
+                del self._por_mid[comando.mid]
+            self._sujos[comando.id] = comando
+
+    # ========= Prazos e gravação (thread do rastreador) =========
+
+    def _expirar(self) -> None:
+        agora = time.monotonic()
+        with self._lock:
+            while self._prazos and self._prazos[0][0] <= agora:
+                _, _, comando_id = heapq.heappop(self._prazos)
+                comando = self._pendentes.pop(comando_id, None)
+                if comando is None:
+                    continue    # já respondido
+                comando.estado = COMANDO_EXPIRADO
+                self._contadores["expirados"] += 1
+                fila = self._por_dispositivo.get(comando.dispositivo_id)
+                if fila is not None:
+                    try:
+                        fila.remove(comando_id)
+                    except ValueError:
+                        pass
+                    if not fila:
+                        del self._por_dispositivo[comando.dispositivo_id]
+                if comando.mid is not None and self._por_mid.get(comando.mid) == comando_id:
+                    del self._por_mid[comando.mid]
+                self._sujos[comando_id] = comando
+
+            limite = time.perf_counter() - _ACK_ADIANTADO_TTL_S
+            for mid in [m for m, t in self._acks_adiantados.items() if t < limite]:
+                del self._acks_adiantados[mid]
+
+    def _gravar(self) -> None:
+        with self._lock:
+            if not self._sujos:
+                return
+            sujos, self._sujos = self._sujos, {}
+            self._gravando = sujos
+            linhas = [comando.linha() for comando in sujos.values()]
+
+        stmt = pg_insert(Comando)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Comando.__table__.c.id],
+            set_={coluna: stmt.excluded[coluna] for coluna in _COLUNAS if coluna != "id"},
+        )
+        db = SessionIngestao()
+        try:
+            db.execute(stmt, linhas)
+            db.commit()
+            with self._lock:
+                self._contadores["gravados"] += len(linhas)
+        except Exception as e:
+            db.rollback()
+            print(f"[RASTREIO-COMANDOS] Erro ao gravar {len(linhas)} comandos: {e}")
+            with self._lock:
+                self._contadores["erros_gravacao"] += 1
+                # volta para a próxima rodada (sem passar por cima de uma mudança mais nova)
+                for comando_id, comando in sujos.items():
+                    self._sujos.setdefault(comando_id, comando)
+        finally:
+            db.close()
+            with self._lock:
+                self._gravando = {}
+
+    # ========= Consulta =========
+
+    def buscar(self, comando_id: UUID) -> Optional[ComandoRastreado]:
+        """Comando ainda em memória (pendente ou com mudança não gravada)."""
+        with self._lock:
+            return (
+                self._sujos.get(comando_id)
+                or self._gravando.get(comando_id)
+                or self._pendentes.get(comando_id)
+            )
+
+    def em_memoria(self, dispositivo_id: UUID) -> List[ComandoRastreado]:
+        with self._lock:
+            vistos = {**self._pendentes, **self._gravando, **self._sujos}
+        return [c for c in vistos.values() if c.dispositivo_id == dispositivo_id]
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            stats["pendentes"] = len(self._pendentes)
+            stats["aguardando_gravacao"] = len(self._sujos)
+            stats["histogramas"] = {
+                "limites_ms": list(LIMITES_HISTOGRAMA_MS),
+                "broker": self._hist_broker.resumo(),
+                "dispositivo": self._hist_dispositivo.resumo(),
+            }
+        stats["timeout_s"] = self.timeout_s
+        return stats
+
+
+rastreio_comandos = RastreadorComandos(
+    timeout_s=settings.COMANDOS_TIMEOUT_S,
+    flush_s=settings.COMANDOS_FLUSH_S,
+)
@@ -0,0 +1,150 @@
+# app/services/relatorio_csv.py
+import csv
+import zlib
+from datetime import datetime
+from io import StringIO
+from typing import Any, Dict, Iterable, Iterator, List
+from uuid import UUID
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.leitura import Leitura
+from app.schemas.leitura import RelatorioFrotaOut
+from app.services.relatorio_service import Faixa, agregar_umidade, metricas_relatorio
+
+
+def _csv(linhas: Iterable[List[Any]]) -> str:
+    buffer = StringIO()
+    csv.writer(buffer, delimiter=";").writerows(linhas)
+    return buffer.getvalue()
+
+
+def _ou_traco(valor: Any) -> Any:
+    return "--" if valor is None else valor
+
+
+def csv_relatorio_dispositivo(
+    dispositivo: Dict[str, Any],
+    faixa: Faixa,
+    inicio: datetime,
+    fim: datetime,
+    tamanho_lote: int = 0,
+) -> Iterator[str]:
+    """
+    Gera o CSV do relatório em pedaços, para StreamingResponse (Excel abre).
+
+    O cabeçalho sai antes de qualquer consulta; a série é lida por cursor no
+    servidor (stream_results) em lotes de `tamanho_lote` linhas, e cada lote
+    vira um pedaço do CSV. A memória fica constante, qualquer que seja o período.
+
+    Usa uma sessão própria: a do request (get_db) já foi fechada quando o
+    corpo da resposta começa a ser enviado.
+    """
+    tamanho_lote = tamanho_lote or settings.RELATORIO_CSV_LOTE
+
+    yield _csv(
+        [
+            ["Relatório do dispositivo"],
+            ["ID", dispositivo.get("id")],
+            ["Nome", dispositivo.get("nome")],
+            ["Tipo", dispositivo.get("tipo")],
+            ["Lugar", dispositivo.get("lugar_nome")],
+            [],
+            ["Período", f"{inicio} até {fim}"],
+            [],
+        ]
+    )
+
+    dispositivo_id = UUID(dispositivo["id"])
+    db = SessionLocal()
+    try:
+        agregado = agregar_umidade(db, {dispositivo_id: faixa}, inicio, fim)[dispositivo_id]
+        m = metricas_relatorio(agregado, faixa)
+        yield _csv(
+            [
+                ["Métrica", "Valor"],
+                ["Umidade mínima", m.umidade_min],
+                ["Umidade máxima", m.umidade_max],
+                ["Umidade média", m.umidade_media],
+                ["Faixa alvo", f"{_ou_traco(faixa[0])} a {_ou_traco(faixa[1])} %"],
+                [
+                    "% leituras dentro da faixa",
+                    m.percentual_dentro_faixa if m.percentual_dentro_faixa is not None else "",
+                ],
+                ["Total de leituras", m.leituras_total],
+                ["Leituras com umidade", m.leituras_com_umidade],
+                [],
+                ["Timestamp", "Umidade (%)"],
+            ]
+        )
+
+        resultado = db.execute(
+            select(Leitura.timestamp, Leitura.umidade)
+            .where(
+                Leitura.dispositivo_id == dispositivo_id,
+                Leitura.timestamp >= inicio,
+                Leitura.timestamp <= fim,
+                Leitura.umidade.isnot(None),
+            )
+            .order_by(Leitura.timestamp.asc())
+            .execution_options(stream_results=True, yield_per=tamanho_lote)
+        )
+        for lote in resultado.partitions():
+            yield _csv([timestamp.isoformat(), u] for timestamp, u in lote)
+    finally:
+        db.close()
+
+
+def comprimir_gzip(pedacos: Iterable[str], nivel: int = 6) -> Iterator[bytes]:
+    """
+    Comprime um fluxo de texto em gzip à medida que ele é gerado
+    (wbits=31 -> cabeçalho/rodapé gzip), sem juntar o conteúdo em memória.
+    Cada pedaço é descarregado (Z_SYNC_FLUSH) para o cliente já receber o
+    cabeçalho, em vez de esperar o buffer interno do zlib encher.
+    """
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for pedaco in pedacos:
+        yield compressor.compress(pedaco.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def csv_relatorio_frota(rel: RelatorioFrotaOut) -> str:
+    """
+    CSV do relatório de um lugar / geral: uma linha por dispositivo e uma de total.
+    Tamanho proporcional ao número de dispositivos, então é montado de uma vez.
+    """
+    escopo = rel.escopo
+    cabecalho = [
+        ["Relatório de umidade - " + ("geral" if escopo.get("tipo") == "geral" else f"lugar {escopo.get('nome')}")],
+        ["Período", f"{rel.periodo['inicio']} até {rel.periodo['fim']}"],
+        [],
+        [
+            "Dispositivo", "ID", "Tipo", "Lugar", "Faixa alvo",
+            "Umidade mínima", "Umidade máxima", "Umidade média",
+            "% leituras dentro da faixa", "Total de leituras", "Leituras com umidade",
+        ],
+    ]
+
+    def _linha(nome, id_, tipo, lugar, faixa, m) -> List[Any]:
+        return [
+            nome, id_, tipo, lugar, faixa,
+            m.umidade_min, m.umidade_max, m.umidade_media,
+            m.percentual_dentro_faixa if m.percentual_dentro_faixa is not None else "",
+            m.leituras_total, m.leituras_com_umidade,
+        ]
+
+    linhas = [
+        _linha(
+            item.dispositivo.get("nome"),
+            item.dispositivo.get("id"),
+            item.dispositivo.get("tipo"),
+            item.dispositivo.get("lugar_nome"),
+            f"{_ou_traco(item.parametros_alvo.get('umidadeMinima'))} a {_ou_traco(item.parametros_alvo.get('umidadeMaxima'))} %",
+            item.metricas,
+        )
+        for item in rel.dispositivos
+    ]
+    linhas.append(_linha("TOTAL", "", "", "", "", rel.total))
+    return _csv(cabecalho + linhas)
@@ -0,0 +1,297 @@
+# app/services/relatorio_jobs.py
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+
+def chave_relatorio(*partes: Any) -> str:
+    """
+    Chave de cache de um relatório: hash de tudo o que define o conteúdo
+    (ex: dispositivo, período e a config/dados exibidos do dispositivo).
+    """
+    bruto = json.dumps(partes, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+class CachePdf:
+    """
+    Cache em disco dos PDFs prontos, com despejo LRU por tamanho total.
+
+    Um arquivo `<chave>.pdf` por relatório. A ordem de uso fica em memória
+    (carregada do mtime dos arquivos no startup); cada acerto atualiza o mtime,
+    então a ordem sobrevive a reinícios. Gravação atômica (tmp + os.replace).
+    """
+
+    def __init__(self, diretorio: str, max_bytes: int):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[str, int]" = OrderedDict()   # chave -> bytes, do menos para o mais recente
+        self._total = 0
+        self._contadores = {"hits": 0, "misses": 0, "gravados": 0, "despejados": 0}
+
+        os.makedirs(diretorio, exist_ok=True)
+        arquivos = []
+        for entrada in os.scandir(diretorio):
+            if entrada.is_file() and entrada.name.endswith(".pdf"):
+                info = entrada.stat()
+                arquivos.append((info.st_mtime, entrada.name[: -len(".pdf")], info.st_size))
+        for _, chave, tamanho in sorted(arquivos):
+            self._entradas[chave] = tamanho
+            self._total += tamanho
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, f"{chave}.pdf")
+
+    def contem(self, chave: str) -> bool:
+        """Se a chave está no cache (conta como uso para o LRU, não como leitura)."""
+        with self._lock:
+            if chave not in self._entradas:
+                return False
+            if not os.path.exists(self._caminho(chave)):
+                self._total -= self._entradas.pop(chave)
+                return False
+            self._entradas.move_to_end(chave)
+            return True
+
+    def ler(self, chave: str) -> Optional[bytes]:
+        # só a ordem do LRU fica sob o lock; o disco é lido fora dele, para
+        # uma leitura lenta não segurar as outras (nem as gravações)
+        with self._lock:
+            if chave not in self._entradas:
+                self._contadores["misses"] += 1
+                return None
+            self._entradas.move_to_end(chave)
+        caminho = self._caminho(chave)
+
+        try:
+            with open(caminho, "rb") as f:
+                conteudo = f.read()
+            os.utime(caminho)
+        except FileNotFoundError:
+            # apagado por fora (outro processo / limpeza do tmp) ou despejado nesse meio tempo
+            with self._lock:
+                self._total -= self._entradas.pop(chave, 0)
+                self._contadores["misses"] += 1
+            return None
+
+        with self._lock:
+            self._contadores["hits"] += 1
+        return conteudo
+
+    def gravar(self, chave: str, conteudo: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(conteudo)
+        os.replace(tmp, self._caminho(chave))
+
+        with self._lock:
+            self._total -= self._entradas.pop(chave, 0)
+            self._entradas[chave] = len(conteudo)
+            self._total += len(conteudo)
+            self._contadores["gravados"] += 1
+
+            # o recém-gravado nunca é despejado, mesmo maior que o limite
+            while self._total > self.max_bytes and len(self._entradas) > 1:
+                antiga, tamanho = self._entradas.popitem(last=False)
+                self._total -= tamanho
+                self._contadores["despejados"] += 1
+                try:
+                    os.remove(self._caminho(antiga))
+                except FileNotFoundError:
+                    pass
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._contadores)
+            stats["arquivos"] = len(self._entradas)
+            stats["bytes"] = self._total
+            stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+@dataclass
+class JobPdf:
+    id: str
+    chave: str
+    usuario_id: Any
+    nome_arquivo: str
+    status: str = "pendente"              # pendente | concluido | erro
+    criado_em: datetime = field(default_factory=datetime.utcnow)
+    concluido_em: Optional[datetime] = None
+    erro: Optional[str] = None
+    future: Optional[Future] = None
+
+
+class FilaRelatoriosPdf:
+    """
+    Renderização de PDFs fora do worker da API.
+
+    O relatório é montado (consultas) no request; só a renderização, que é
+    CPU pura com ReportLab, vai para um pool de processos. O resultado vai
+    para o CachePdf, e o job só guarda status e a chave do cache. Pedidos
+    iguais (mesma chave) enquanto um job está em andamento reaproveitam o job.
+
+    O pool usa "spawn": os processos filhos não herdam as threads do MQTT/writer
+    e só importam o módulo de renderização.
+    """
+
+    def __init__(self, workers: int, cache: CachePdf, ttl_jobs_s: int):
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.ttl_jobs = timedelta(seconds=ttl_jobs_s)
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, JobPdf] = {}
+        self._em_andamento: Dict[str, JobPdf] = {}     # chave -> job pendente
+        self._lock = threading.Lock()
+        self._contadores = {"jobs": 0, "do_cache": 0, "reaproveitados": 0, "renderizados": 0, "erros": 0}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _limpar_jobs_antigos(self) -> None:
+        limite = datetime.utcnow() - self.ttl_jobs
+        for job_id in [j.id for j in self._jobs.values() if j.status != "pendente" and j.criado_em < limite]:
+            del self._jobs[job_id]
+
+    def job_do_cache(self, chave: str, usuario_id: Any, nome_arquivo: str) -> Optional[JobPdf]:
+        """Job já concluído, se o PDF dessa chave estiver no cache."""
+        if not self.cache.contem(chave):
+            return None
+        job = JobPdf(
+            id=uuid.uuid4().hex,
+            chave=chave,
+            usuario_id=usuario_id,
+            nome_arquivo=nome_arquivo,
+            status="concluido",
+            concluido_em=datetime.utcnow(),
+        )
+        with self._lock:
+            self._limpar_jobs_antigos()
+            self._jobs[job.id] = job
+            self._contadores["jobs"] += 1
+            self._contadores["do_cache"] += 1
+        return job
+
+    def enviar(
+        self,
+        chave: str,
+        renderizar: Callable[[Dict[str, Any]], bytes],
+        dados: Dict[str, Any],
+        usuario_id: Any,
+        nome_arquivo: str,
+    ) -> JobPdf:
+        """
+        Agenda `renderizar(dados)` no pool (função de módulo e dados
+        serializáveis por pickle). Se a mesma chave já está sendo renderizada,
+        devolve um job que acompanha a mesma renderização.
+        """
+        nova = False
+        with self._lock:
+            self._limpar_jobs_antigos()
+            self._contadores["jobs"] += 1
+
+            job = JobPdf(id=uuid.uuid4().hex, chave=chave, usuario_id=usuario_id, nome_arquivo=nome_arquivo)
+            atual = self._em_andamento.get(chave)
+            if atual is not None:
+                self._contadores["reaproveitados"] += 1
+                job.future = atual.future
+            else:
+                job.future = self._pool().submit(renderizar, dados)
+                self._em_andamento[chave] = job
+                nova = True
+            self._jobs[job.id] = job
+
+        # fora do lock: se o future já terminou, o callback roda aqui mesmo
+        if nova:
+            job.future.add_done_callback(lambda f: self._finalizar_renderizacao(chave, f))
+        job.future.add_done_callback(lambda f: self._finalizar_job(job, f))
+        return job
+
+    def _finalizar_renderizacao(self, chave: str, future: Future) -> None:
+        # roda antes dos callbacks dos jobs: quando um job vira "concluido", o PDF já está no cache
+        try:
+            self.cache.gravar(chave, future.result())
+            with self._lock:
+                self._contadores["renderizados"] += 1
+        except Exception as e:
+            with self._lock:
+                self._contadores["erros"] += 1
+            print(f"[RELATORIOS-PDF] Erro ao renderizar relatório {chave[:12]}: {e}")
+        finally:
+            with self._lock:
+                self._em_andamento.pop(chave, None)
+
+    def _finalizar_job(self, job: JobPdf, future: Future) -> None:
+        erro = None
+        try:
+            future.result()
+        except Exception as e:
+            erro = str(e) or e.__class__.__name__
+        with self._lock:
+            job.status = "erro" if erro else "concluido"
+            job.erro = erro
+            job.concluido_em = datetime.utcnow()
+            job.future = None       # o PDF fica só no cache, não preso no job
+
+    def buscar(self, job_id: str) -> Optional[JobPdf]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def conteudo(self, job: JobPdf) -> Optional[bytes]:
+        if job.status != "concluido":
+            return None
+        return self.cache.ler(job.chave)
+
+    async def aguardar(self, job: JobPdf) -> JobPdf:
+        """Espera o job terminar sem bloquear o event loop."""
+        if job.future is not None and job.status == "pendente":
+            try:
+                # os callbacks do job (cache + status) foram registrados antes
+                # e rodam antes deste, na thread do pool
+                await asyncio.wrap_future(job.future)
+            except Exception:
+                pass
+        return job
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contadores)
+            stats["em_andamento"] = len(self._em_andamento)
+            stats["jobs_guardados"] = len(self._jobs)
+            stats["workers"] = self.workers
+        stats["cache"] = self.cache.estatisticas()
+        return stats
+
+    def encerrar(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+fila_relatorios_pdf = FilaRelatoriosPdf(
+    workers=settings.RELATORIO_PDF_WORKERS,
+    cache=CachePdf(
+        settings.RELATORIO_PDF_CACHE_DIR or os.path.join(tempfile.gettempdir(), "sial_relatorios_pdf"),
+        settings.RELATORIO_PDF_CACHE_MB * 1024 * 1024,
+    ),
+    ttl_jobs_s=settings.RELATORIO_PDF_JOB_TTL_S,
+)
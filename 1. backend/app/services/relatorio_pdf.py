@@ -0,0 +1,176 @@
+# app/services/relatorio_pdf.py
+"""
+Renderização do relatório em PDF (ReportLab).
+
+Roda dentro dos processos do pool de relatórios (app/services/relatorio_jobs.py),
+por isso só depende do ReportLab e recebe o relatório já montado, como dict
+(RelatorioDispositivoOut.model_dump()): nada de banco nem de settings aqui.
+"""
+import hashlib
+from io import BytesIO
+from typing import Any, Dict
+
+# Monkey patch para o md5 do ReportLab funcionar no Anaconda/Windows
+_original_md5 = hashlib.md5
+
+def md5_compat(*args, **kwargs):
+    # ignora o argumento "usedforsecurity", se for passado
+    kwargs.pop("usedforsecurity", None)
+    return _original_md5(*args, **kwargs)
+
+hashlib.md5 = md5_compat
+
+# se você não tiver o reportlab instalado, vai precisar instalar no ambiente:
+# pip install reportlab
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+# o PDF lista só alguns pontos: a série chega já reduzida (médias ao longo do período)
+PDF_MAX_PONTOS = 40
+
+
+def renderizar_pdf_dispositivo(rel: Dict[str, Any]) -> bytes:
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    y = height - 50
+
+    dispositivo = rel["dispositivo"]
+
+    # Cabeçalho
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, y, "Relatório do Dispositivo")
+    y -= 30
+
+    c.setFont("Helvetica", 10)
+    c.drawString(50, y, f"Dispositivo: {dispositivo.get('nome') or dispositivo.get('id')}")
+    y -= 15
+    c.drawString(50, y, f"Tipo: {dispositivo.get('tipo')}")
+    y -= 15
+    c.drawString(50, y, f"Lugar: {dispositivo.get('lugar_nome')}")
+    y -= 15
+
+    periodo = rel["periodo"]
+    c.drawString(50, y, f"Período: {periodo['inicio']}  até  {periodo['fim']}")
+    y -= 25
+
+    # Métricas
+    m = rel["metricas"]
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y, "Resumo de umidade")
+    y -= 20
+    c.setFont("Helvetica", 10)
+
+    c.drawString(50, y, f"Umidade mínima: {m['umidade_min'] if m['umidade_min'] is not None else '--'}")
+    y -= 15
+    c.drawString(50, y, f"Umidade máxima: {m['umidade_max'] if m['umidade_max'] is not None else '--'}")
+    y -= 15
+    c.drawString(50, y, f"Umidade média: {m['umidade_media'] if m['umidade_media'] is not None else '--'}")
+    y -= 15
+
+    alvo = rel["parametros_alvo"]
+    c.drawString(
+        50,
+        y,
+        f"Faixa alvo: {alvo.get('umidadeMinima', '--')}% a {alvo.get('umidadeMaxima', '--')}%",
+    )
+    y -= 15
+
+    if m["percentual_dentro_faixa"] is not None:
+        c.drawString(
+            50,
+            y,
+            f"% de leituras dentro da faixa: {m['percentual_dentro_faixa']:.1f}%",
+        )
+        y -= 15
+
+    c.drawString(50, y, f"Total de leituras: {m['leituras_total']}")
+    y -= 15
+    c.drawString(50, y, f"Leituras com umidade: {m['leituras_com_umidade']}")
+    y -= 25
+
+    # Tabela simples de alguns pontos de umidade
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(50, y, "Alguns pontos de umidade (timestamp / %):")
+    y -= 20
+    c.setFont("Helvetica", 9)
+
+    for ponto in rel["series"]["umidade"][:PDF_MAX_PONTOS]:  # limita pra não explodir uma página
+        if y < 50:
+            c.showPage()
+            y = height - 50
+            c.setFont("Helvetica", 9)
+        c.drawString(50, y, f"{ponto['timestamp']}  -  {ponto['umidade']:.1f}%")
+        y -= 12
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _valor(v: Any) -> str:
+    return "--" if v is None else f"{v:.1f}"
+
+
+def renderizar_pdf_frota(rel: Dict[str, Any]) -> bytes:
+    """PDF do relatório de um lugar / geral: tabela com uma linha por dispositivo e o total."""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    y = height - 50
+
+    escopo = rel["escopo"]
+    titulo = "Relatório geral" if escopo.get("tipo") == "geral" else f"Relatório do lugar: {escopo.get('nome')}"
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, y, titulo)
+    y -= 25
+
+    c.setFont("Helvetica", 10)
+    periodo = rel["periodo"]
+    c.drawString(50, y, f"Período: {periodo['inicio']}  até  {periodo['fim']}")
+    y -= 15
+    c.drawString(50, y, f"Dispositivos: {len(rel['dispositivos'])}")
+    y -= 25
+
+    colunas = [(50, "Dispositivo"), (230, "Mín"), (275, "Máx"), (320, "Média"), (370, "% faixa"), (430, "Leituras")]
+
+    def _cabecalho_tabela(y: float) -> float:
+        c.setFont("Helvetica-Bold", 9)
+        for x, texto in colunas:
+            c.drawString(x, y, texto)
+        c.setFont("Helvetica", 9)
+        return y - 14
+
+    def _linha(y: float, nome: str, m: Dict[str, Any]) -> float:
+        valores = [
+            nome[:34],
+            _valor(m["umidade_min"]),
+            _valor(m["umidade_max"]),
+            _valor(m["umidade_media"]),
+            _valor(m["percentual_dentro_faixa"]),
+            str(m["leituras_total"]),
+        ]
+        for (x, _), texto in zip(colunas, valores):
+            c.drawString(x, y, texto)
+        return y - 12
+
+    y = _cabecalho_tabela(y)
+    for item in rel["dispositivos"]:
+        if y < 60:
+            c.showPage()
+            y = _cabecalho_tabela(height - 50)
+        d = item["dispositivo"]
+        y = _linha(y, d.get("nome") or d.get("id"), item["metricas"])
+
+    if y < 60:
+        c.showPage()
+        y = _cabecalho_tabela(height - 50)
+    c.setFont("Helvetica-Bold", 9)
+    _linha(y - 4, "TOTAL", rel["total"])
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
@@ -0,0 +1,428 @@
+# app/services/relatorio_service.py
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Float, and_, cast, false, func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.dispositivo import Dispositivo
+from app.models.leitura import Leitura
+from app.schemas.leitura import (
+    PontoUmidade,
+    RelatorioDispositivoMetricas,
+    RelatorioDispositivoOut,
+    RelatorioDispositivoResumo,
+    RelatorioFrotaOut,
+    SeriesRelatorioDispositivo,
+)
+from app.services.dispositivo_service import faixa_umidade
+from app.services.rollups_leituras import RESOLUCOES, truncar
+
+Faixa = Tuple[Optional[float], Optional[float]]
+
+# timestamp do Postgres tem resolução de microssegundo: [inicio, fim] == [inicio, fim + 1µs)
+_MICROSSEGUNDO = timedelta(microseconds=1)
+_EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class AgregadoUmidade:
+    """Métricas de umidade de um dispositivo num período."""
+
+    leituras_total: int = 0
+    umidade_count: int = 0
+    umidade_soma: float = 0.0
+    umidade_min: Optional[float] = None
+    umidade_max: Optional[float] = None
+    dentro_faixa: int = 0
+
+    @property
+    def umidade_media(self) -> Optional[float]:
+        if not self.umidade_count:
+            return None
+        return self.umidade_soma / self.umidade_count
+
+    def somar(self, total, count, soma, minimo, maximo) -> None:
+        self.leituras_total += int(total or 0)
+        self.umidade_count += int(count or 0)
+        self.umidade_soma += float(soma or 0.0)
+        if minimo is not None:
+            self.umidade_min = minimo if self.umidade_min is None else min(self.umidade_min, minimo)
+        if maximo is not None:
+            self.umidade_max = maximo if self.umidade_max is None else max(self.umidade_max, maximo)
+
+    def somar_agregado(self, outro: "AgregadoUmidade") -> None:
+        self.somar(outro.leituras_total, outro.umidade_count, outro.umidade_soma, outro.umidade_min, outro.umidade_max)
+        self.dentro_faixa += outro.dentro_faixa
+
+
+def utc_sem_fuso(ts: datetime) -> datetime:
+    """As leituras são gravadas em UTC sem fuso (datetime.utcnow)."""
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def decompor_periodo(inicio: datetime, fim: datetime) -> List[Tuple[Optional[Any], datetime, datetime]]:
+    """
+    Divide [inicio, fim) em trechos (tabela, de, até): o miolo alinhado em dias
+    vai para o rollup de 1 dia, as sobras alinhadas em horas para o de 1 hora,
+    depois 1 minuto, e só as pontas de menos de um minuto (tabela None) ficam
+    para o histórico bruto.
+    """
+    trechos: List[Tuple[Optional[Any], datetime, datetime]] = []
+
+    def _dividir(de: datetime, ate: datetime, nivel: int) -> None:
+        if de >= ate:
+            return
+        if nivel == len(RESOLUCOES):
+            trechos.append((None, de, ate))
+            return
+
+        _, passo, modelo = RESOLUCOES[nivel]
+        alinhado_de = truncar(de, passo)
+        if alinhado_de < de:
+            alinhado_de += passo
+        alinhado_ate = truncar(ate, passo)
+
+        if alinhado_de >= alinhado_ate:
+            _dividir(de, ate, nivel + 1)
+            return
+
+        _dividir(de, alinhado_de, nivel + 1)
+        trechos.append((modelo, alinhado_de, alinhado_ate))
+        _dividir(alinhado_ate, ate, nivel + 1)
+
+    _dividir(inicio, fim, 0)
+    return trechos
+
+
+def _filtro_dentro_faixa(faixas: Dict[UUID, Faixa]):
+    """
+    Condição "umidade dentro da faixa do seu dispositivo", agrupando os
+    dispositivos por faixa (normalmente poucas faixas distintas).
+    """
+    por_faixa: Dict[Tuple[float, float], List[UUID]] = {}
+    for dispositivo_id, (faixa_min, faixa_max) in faixas.items():
+        if faixa_min is not None and faixa_max is not None:
+            por_faixa.setdefault((faixa_min, faixa_max), []).append(dispositivo_id)
+
+    if not por_faixa:
+        return false()
+    return or_(
+        *[
+            and_(Leitura.dispositivo_id.in_(ids), Leitura.umidade.between(faixa_min, faixa_max))
+            for (faixa_min, faixa_max), ids in por_faixa.items()
+        ]
+    )
+
+
+def _consultar_bruto(db: Session, faixas: Dict[UUID, Faixa], de: datetime, ate: datetime):
+    return (
+        db.query(
+            Leitura.dispositivo_id,
+            func.count(),
+            func.count(Leitura.umidade),
+            func.sum(cast(Leitura.umidade, Float)),
+            func.min(Leitura.umidade),
+            func.max(Leitura.umidade),
+            func.count().filter(_filtro_dentro_faixa(faixas)),
+        )
+        .filter(
+            Leitura.dispositivo_id.in_(list(faixas)),
+            Leitura.timestamp >= de,
+            Leitura.timestamp < ate,
+        )
+        .group_by(Leitura.dispositivo_id)
+        .all()
+    )
+
+
+def _somar_rollup(
+    db: Session,
+    modelo: Any,
+    faixas: Dict[UUID, Faixa],
+    de: datetime,
+    ate: datetime,
+    resultado: Dict[UUID, AgregadoUmidade],
+) -> List[UUID]:
+    """
+    Soma os buckets de [de, ate) no resultado. Devolve os dispositivos cujo
+    `dentro_faixa` não pôde vir do rollup (algum bucket contado com outra
+    faixa ou com faixa mista); esses são recontados no histórico bruto.
+    """
+    linhas = (
+        db.query(
+            modelo.dispositivo_id,
+            modelo.faixa_min,
+            modelo.faixa_max,
+            modelo.faixa_mista,
+            func.sum(modelo.leituras_total),
+            func.sum(modelo.umidade_count),
+            func.sum(modelo.umidade_soma),
+            func.min(modelo.umidade_min),
+            func.max(modelo.umidade_max),
+            func.sum(modelo.dentro_faixa),
+        )
+        .filter(
+            modelo.dispositivo_id.in_(list(faixas)),
+            modelo.bucket >= de,
+            modelo.bucket < ate,
+        )
+        .group_by(modelo.dispositivo_id, modelo.faixa_min, modelo.faixa_max, modelo.faixa_mista)
+        .all()
+    )
+
+    dentro: Dict[UUID, int] = {}
+    divergentes: set = set()
+    for dispositivo_id, faixa_min, faixa_max, mista, total, count, soma, minimo, maximo, qtd_dentro in linhas:
+        resultado[dispositivo_id].somar(total, count, soma, minimo, maximo)
+
+        faixa = faixas[dispositivo_id]
+        if faixa[0] is None or faixa[1] is None:
+            continue
+        if mista or (faixa_min, faixa_max) != faixa:
+            divergentes.add(dispositivo_id)
+        else:
+            dentro[dispositivo_id] = dentro.get(dispositivo_id, 0) + int(qtd_dentro or 0)
+
+    for dispositivo_id, qtd in dentro.items():
+        if dispositivo_id not in divergentes:
+            resultado[dispositivo_id].dentro_faixa += qtd
+    return list(divergentes)
+
+
+def agregar_umidade(
+    db: Session,
+    faixas: Dict[UUID, Faixa],
+    inicio: datetime,
+    fim: datetime,
+    usar_rollups: Optional[bool] = None,
+) -> Dict[UUID, AgregadoUmidade]:
+    """
+    Métricas de umidade de cada dispositivo em `faixas` no período [inicio, fim].
+
+    Com rollups (padrão: RELATORIOS_USAR_ROLLUPS), usa sempre a resolução mais
+    grossa que cobre cada trecho do período (1d > 1h > 1m) e o histórico bruto
+    só nas pontas. Min, max, soma e contagens somam exatamente entre buckets;
+    a contagem dentro da faixa também, desde que os buckets tenham sido
+    contados com a faixa pedida. Caso contrário esse trecho é recontado no bruto.
+
+    Sem rollups, é uma única agregação SQL sobre o histórico bruto.
+    """
+    resultado = {dispositivo_id: AgregadoUmidade() for dispositivo_id in faixas}
+    if not faixas:
+        return resultado
+
+    if usar_rollups is None:
+        usar_rollups = settings.RELATORIOS_USAR_ROLLUPS
+
+    inicio = utc_sem_fuso(inicio)
+    fim_exclusivo = utc_sem_fuso(fim) + _MICROSSEGUNDO
+
+    if usar_rollups:
+        trechos = decompor_periodo(inicio, fim_exclusivo)
+    else:
+        trechos = [(None, inicio, fim_exclusivo)]
+
+    for modelo, de, ate in trechos:
+        if modelo is None:
+            for dispositivo_id, total, count, soma, minimo, maximo, qtd_dentro in _consultar_bruto(db, faixas, de, ate):
+                agregado = resultado[dispositivo_id]
+                agregado.somar(total, count, soma, minimo, maximo)
+                agregado.dentro_faixa += int(qtd_dentro or 0)
+            continue
+
+        divergentes = _somar_rollup(db, modelo, faixas, de, ate, resultado)
+        if divergentes:
+            recontar = {dispositivo_id: faixas[dispositivo_id] for dispositivo_id in divergentes}
+            for linha in _consultar_bruto(db, recontar, de, ate):
+                resultado[linha[0]].dentro_faixa += int(linha[-1] or 0)
+
+    return resultado
+
+
+def serie_umidade(
+    db: Session,
+    dispositivo_id: UUID,
+    inicio: datetime,
+    fim: datetime,
+    max_pontos: int = 0,
+) -> List[PontoUmidade]:
+    """
+    Série de umidade do dispositivo em [inicio, fim], em ordem de tempo.
+
+    Com `max_pontos` > 0, divide o período em `max_pontos` intervalos iguais
+    e devolve um ponto por intervalo com leituras: média da umidade no
+    timestamp médio das leituras (agregado no banco, resposta limitada).
+    Intervalo com uma leitura só devolve a própria leitura.
+    """
+    filtros = (
+        Leitura.dispositivo_id == dispositivo_id,
+        Leitura.timestamp >= inicio,
+        Leitura.timestamp <= fim,
+        Leitura.umidade.isnot(None),
+    )
+
+    if max_pontos <= 0:
+        return [
+            PontoUmidade(timestamp=timestamp, umidade=u)
+            for timestamp, u in (
+                db.query(Leitura.timestamp, Leitura.umidade)
+                .filter(*filtros)
+                .order_by(Leitura.timestamp.asc())
+            )
+        ]
+
+    largura_s = max((fim - inicio).total_seconds() / max_pontos, 1e-6)
+    epoch = func.extract("epoch", Leitura.timestamp)
+    pontos = (
+        db.query(
+            func.least(
+                func.floor((epoch - (inicio - _EPOCH).total_seconds()) / largura_s),
+                max_pontos - 1,
+            ).label("intervalo"),
+            epoch.label("epoch"),
+            cast(Leitura.umidade, Float).label("umidade"),
+        )
+        .filter(*filtros)
+        .subquery()
+    )
+    linhas = (
+        db.query(func.avg(pontos.c.epoch), func.avg(pontos.c.umidade))
+        .group_by(pontos.c.intervalo)
+        .order_by(pontos.c.intervalo)
+    )
+    return [
+        PontoUmidade(timestamp=_EPOCH + timedelta(seconds=float(segundos)), umidade=u)
+        for segundos, u in linhas
+    ]
+
+
+def metricas_relatorio(agregado: AgregadoUmidade, faixa: Faixa) -> RelatorioDispositivoMetricas:
+    """Métricas do relatório a partir do agregado e da faixa alvo."""
+    umid_min_alvo, umid_max_alvo = faixa
+    leituras_com_umidade = agregado.umidade_count
+    dentro_faixa = 0
+    fora_faixa = 0
+    if umid_min_alvo is not None and umid_max_alvo is not None:
+        dentro_faixa = agregado.dentro_faixa
+        fora_faixa = leituras_com_umidade - dentro_faixa
+
+    percentual_dentro_faixa: Optional[float] = None
+    if leituras_com_umidade > 0 and (dentro_faixa + fora_faixa) > 0:
+        percentual_dentro_faixa = (dentro_faixa / (dentro_faixa + fora_faixa)) * 100.0
+
+    return RelatorioDispositivoMetricas(
+        umidade_min=agregado.umidade_min,
+        umidade_max=agregado.umidade_max,
+        umidade_media=agregado.umidade_media,
+        leituras_total=agregado.leituras_total,
+        leituras_com_umidade=leituras_com_umidade,
+        dentro_faixa=dentro_faixa if leituras_com_umidade > 0 else None,
+        fora_faixa=fora_faixa if leituras_com_umidade > 0 else None,
+        percentual_dentro_faixa=percentual_dentro_faixa,
+    )
+
+
+def info_dispositivo(dispositivo: Dispositivo) -> Dict[str, Any]:
+    return {
+        "id": str(dispositivo.id),
+        "nome": getattr(dispositivo, "nome", None),
+        "tipo": getattr(dispositivo, "tipo", None),
+        "cliente_nome": getattr(getattr(dispositivo, "usuario", None), "nome", None),
+        "lugar_nome": getattr(getattr(dispositivo, "lugar", None), "nome", None),
+    }
+
+
+def parametros_alvo(faixa: Faixa) -> Dict[str, Optional[float]]:
+    return {"umidadeMinima": faixa[0], "umidadeMaxima": faixa[1]}
+
+
+def montar_relatorio_dispositivo(
+    db: Session,
+    dispositivo: Dispositivo,
+    inicio: datetime,
+    fim: datetime,
+    max_pontos: int = 0,
+) -> RelatorioDispositivoOut:
+    """
+    Relatório de umidade de um dispositivo (usado pelo JSON e pelo PDF).
+    Métricas agregadas no banco; série completa ou reduzida a `max_pontos`.
+    Permissão e validação do período ficam com a rota.
+    """
+    faixa = faixa_umidade(dispositivo.config)
+    agregado = agregar_umidade(db, {dispositivo.id: faixa}, inicio, fim)[dispositivo.id]
+
+    return RelatorioDispositivoOut(
+        dispositivo=info_dispositivo(dispositivo),
+        periodo={"inicio": inicio, "fim": fim},
+        parametros_alvo=parametros_alvo(faixa),
+        metricas=metricas_relatorio(agregado, faixa),
+        series=SeriesRelatorioDispositivo(
+            umidade=serie_umidade(db, dispositivo.id, inicio, fim, max_pontos)
+        ),
+    )
+
+
+def montar_relatorio_frota(
+    db: Session,
+    dispositivos: List[Dispositivo],
+    escopo: Dict[str, Any],
+    inicio: datetime,
+    fim: datetime,
+) -> RelatorioFrotaOut:
+    """
+    Relatório de vários dispositivos (um lugar ou todos): as métricas de todos
+    saem da mesma agregação agrupada por dispositivo (uma consulta por trecho
+    do período, não uma por dispositivo), mais uma linha com o total.
+
+    No total, a faixa de cada dispositivo vale para as leituras dele; quem
+    não tem faixa não entra em dentro/fora.
+    """
+    faixas = {d.id: faixa_umidade(d.config) for d in dispositivos}
+    agregados = agregar_umidade(db, faixas, inicio, fim)
+
+    total = AgregadoUmidade()
+    dentro_total = 0
+    fora_total = 0
+    itens: List[RelatorioDispositivoResumo] = []
+    for dispositivo in dispositivos:
+        faixa = faixas[dispositivo.id]
+        agregado = agregados[dispositivo.id]
+        metricas = metricas_relatorio(agregado, faixa)
+
+        total.somar_agregado(agregado)
+        dentro_total += metricas.dentro_faixa or 0
+        fora_total += metricas.fora_faixa or 0
+        itens.append(
+            RelatorioDispositivoResumo(
+                dispositivo=info_dispositivo(dispositivo),
+                parametros_alvo=parametros_alvo(faixa),
+                metricas=metricas,
+            )
+        )
+
+    com_umidade = total.umidade_count
+    metricas_total = RelatorioDispositivoMetricas(
+        umidade_min=total.umidade_min,
+        umidade_max=total.umidade_max,
+        umidade_media=total.umidade_media,
+        leituras_total=total.leituras_total,
+        leituras_com_umidade=com_umidade,
+        dentro_faixa=dentro_total if com_umidade > 0 else None,
+        fora_faixa=fora_total if com_umidade > 0 else None,
+        percentual_dentro_faixa=(
+            dentro_total / (dentro_total + fora_total) * 100.0 if (dentro_total + fora_total) > 0 else None
+        ),
+    )
+
+    return RelatorioFrotaOut(
+        escopo=escopo,
+        periodo={"inicio": inicio, "fim": fim},
+        dispositivos=itens,
+        total=metricas_total,
+    )
@@ -0,0 +1,195 @@
+# app/services/rollups_leituras.py
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import or_, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.leitura_rollup import LeituraRollup1d, LeituraRollup1h, LeituraRollup1m
+from app.services.roteamento_dispositivos import indice_roteamento
+
+# (nome, tamanho do bucket, tabela), da resolução mais grossa para a mais fina
+RESOLUCOES: Tuple[Tuple[str, timedelta, Any], ...] = (
+    ("1d", timedelta(days=1), LeituraRollup1d),
+    ("1h", timedelta(hours=1), LeituraRollup1h),
+    ("1m", timedelta(minutes=1), LeituraRollup1m),
+)
+
+
+def truncar(ts: datetime, passo: timedelta) -> datetime:
+    """Início do bucket de `passo` que contém `ts` (igual ao date_trunc do Postgres)."""
+    return ts - ((ts - datetime.min) % passo)
+
+
+def _faixa(dispositivo_id: UUID) -> Tuple[Optional[float], Optional[float]]:
+    rota = indice_roteamento.buscar_por_id(dispositivo_id)
+    if rota is None:
+        return None, None
+    return rota.umidade_minima, rota.umidade_maxima
+
+
+def _novo_bucket(dispositivo_id: UUID, bucket: datetime, faixa_min, faixa_max) -> Dict[str, Any]:
+    return {
+        "dispositivo_id": dispositivo_id,
+        "bucket": bucket,
+        "leituras_total": 0,
+        "umidade_count": 0,
+        "umidade_soma": 0.0,
+        "umidade_min": None,
+        "umidade_max": None,
+        "dentro_faixa": 0,
+        "faixa_min": faixa_min,
+        "faixa_max": faixa_max,
+        "faixa_mista": False,
+    }
+
+
+def _rollup_minutos(lote: List[Dict[str, Any]]) -> Dict[Tuple[UUID, datetime], Dict[str, Any]]:
+    faixas: Dict[UUID, Tuple[Optional[float], Optional[float]]] = {}
+    buckets: Dict[Tuple[UUID, datetime], Dict[str, Any]] = {}
+    passo = RESOLUCOES[-1][1]
+
+    for item in lote:
+        dispositivo_id = item["dispositivo_id"]
+        chave = (dispositivo_id, truncar(item["timestamp"], passo))
+        b = buckets.get(chave)
+        if b is None:
+            if dispositivo_id not in faixas:
+                faixas[dispositivo_id] = _faixa(dispositivo_id)
+            b = buckets[chave] = _novo_bucket(*chave, *faixas[dispositivo_id])
+
+        b["leituras_total"] += 1
+        u = item["umidade"]
+        if u is None:
+            continue
+        b["umidade_count"] += 1
+        b["umidade_soma"] += u
+        b["umidade_min"] = u if b["umidade_min"] is None else min(b["umidade_min"], u)
+        b["umidade_max"] = u if b["umidade_max"] is None else max(b["umidade_max"], u)
+        if b["faixa_min"] is not None and b["faixa_max"] is not None and b["faixa_min"] <= u <= b["faixa_max"]:
+            b["dentro_faixa"] += 1
+
+    return buckets
+
+
+def _reagrupar(
+    buckets: Dict[Tuple[UUID, datetime], Dict[str, Any]],
+    passo: timedelta,
+) -> Dict[Tuple[UUID, datetime], Dict[str, Any]]:
+    """Junta buckets de uma resolução mais fina nos buckets de `passo`."""
+    maiores: Dict[Tuple[UUID, datetime], Dict[str, Any]] = {}
+    for (dispositivo_id, inicio), b in buckets.items():
+        chave = (dispositivo_id, truncar(inicio, passo))
+        m = maiores.get(chave)
+        if m is None:
+            maiores[chave] = {**b, "bucket": chave[1]}
+            continue
+        m["leituras_total"] += b["leituras_total"]
+        m["umidade_count"] += b["umidade_count"]
+        m["umidade_soma"] += b["umidade_soma"]
+        m["dentro_faixa"] += b["dentro_faixa"]
+        for coluna, escolher in (("umidade_min", min), ("umidade_max", max)):
+            if b[coluna] is not None:
+                m[coluna] = b[coluna] if m[coluna] is None else escolher(m[coluna], b[coluna])
+    return maiores
+
+
+def _upsert_rollup(modelo):
+    stmt = pg_insert(modelo)
+    tabela = modelo.__table__
+    novo = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[tabela.c.dispositivo_id, tabela.c.bucket],
+        set_={
+            "leituras_total": tabela.c.leituras_total + novo.leituras_total,
+            "umidade_count": tabela.c.umidade_count + novo.umidade_count,
+            "umidade_soma": tabela.c.umidade_soma + novo.umidade_soma,
+            # least/greatest do Postgres ignoram NULL
+            "umidade_min": func.least(tabela.c.umidade_min, novo.umidade_min),
+            "umidade_max": func.greatest(tabela.c.umidade_max, novo.umidade_max),
+            "dentro_faixa": tabela.c.dentro_faixa + novo.dentro_faixa,
+            # faixa mudou dentro do bucket: dentro_faixa deixa de valer para uma faixa só
+            "faixa_mista": or_(
+                tabela.c.faixa_mista,
+                novo.faixa_mista,
+                tabela.c.faixa_min.is_distinct_from(novo.faixa_min),
+                tabela.c.faixa_max.is_distinct_from(novo.faixa_max),
+            ),
+        },
+    )
+
+
+def instrucoes_rollups(lote: List[Dict[str, Any]]) -> List[Tuple[Any, List[Dict[str, Any]]]]:
+    """
+    Upserts incrementais dos rollups de 1 minuto, 1 hora e 1 dia para um lote
+    de leituras (chamado por `instrucoes_lote`, na mesma transação do INSERT).
+    Cada resolução é derivada da anterior em memória; linhas ordenadas pela
+    chave para que writers concorrentes travem na mesma ordem.
+    """
+    if not lote:
+        return []
+
+    instrucoes: List[Tuple[Any, List[Dict[str, Any]]]] = []
+    buckets = _rollup_minutos(lote)
+    for _, passo, modelo in reversed(RESOLUCOES):
+        if passo != RESOLUCOES[-1][1]:
+            buckets = _reagrupar(buckets, passo)
+        linhas = [buckets[chave] for chave in sorted(buckets, key=lambda c: (str(c[0]), c[1]))]
+        instrucoes.append((_upsert_rollup(modelo), linhas))
+    return instrucoes
+
+
+_COLUNAS_ROLLUP = (
+    "dispositivo_id, bucket, leituras_total, umidade_count, umidade_soma, "
+    "umidade_min, umidade_max, dentro_faixa, faixa_min, faixa_max, faixa_mista"
+)
+
+
+def reconstruir_rollups(
+    db: Session,
+    dispositivo_id: UUID,
+    faixa_min: Optional[float],
+    faixa_max: Optional[float],
+) -> None:
+    """
+    Recalcula do zero os rollups de um dispositivo a partir do histórico bruto,
+    com a faixa informada. Para leituras gravadas fora do writer (carga
+    direta no banco, benchmarks) ou reparo. Não faz commit.
+    """
+    for _, _, modelo in RESOLUCOES:
+        db.query(modelo).filter(modelo.dispositivo_id == dispositivo_id).delete(synchronize_session=False)
+
+    parametros = {"dispositivo_id": str(dispositivo_id), "faixa_min": faixa_min, "faixa_max": faixa_max}
+
+    db.execute(
+        text(
+            f"""
+            INSERT INTO leituras_rollup_1m ({_COLUNAS_ROLLUP})
+            SELECT dispositivo_id, date_trunc('minute', "timestamp"), count(*), count(umidade),
+                   COALESCE(sum(umidade::float8), 0), min(umidade), max(umidade),
+                   count(*) FILTER (WHERE umidade BETWEEN CAST(:faixa_min AS float8) AND CAST(:faixa_max AS float8)),
+                   CAST(:faixa_min AS float8), CAST(:faixa_max AS float8), false
+            FROM leituras
+            WHERE dispositivo_id = CAST(:dispositivo_id AS uuid)
+            GROUP BY dispositivo_id, date_trunc('minute', "timestamp")
+            """
+        ),
+        parametros,
+    )
+    for origem, destino, unidade in (("1m", "1h", "hour"), ("1h", "1d", "day")):
+        db.execute(
+            text(
+                f"""
+                INSERT INTO leituras_rollup_{destino} ({_COLUNAS_ROLLUP})
+                SELECT dispositivo_id, date_trunc('{unidade}', bucket), sum(leituras_total), sum(umidade_count),
+                       sum(umidade_soma), min(umidade_min), max(umidade_max), sum(dentro_faixa),
+                       CAST(:faixa_min AS float8), CAST(:faixa_max AS float8), false
+                FROM leituras_rollup_{origem}
+                WHERE dispositivo_id = CAST(:dispositivo_id AS uuid)
+                GROUP BY dispositivo_id, date_trunc('{unidade}', bucket)
+                """
+            ),
+            parametros,
+        )
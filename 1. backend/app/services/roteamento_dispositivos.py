@@ -0,0 +1,216 @@
+# app/services/roteamento_dispositivos.py
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import case, func
+
+from app.core.config import settings
+from app.db.session import SessionIngestao
+from app.models.dispositivo import Dispositivo
+from app.services.dispositivo_service import extrair_base_topic, faixa_umidade
+
+MQTT_TOPIC_ROOT = settings.MQTT_TOPIC_ROOT.rstrip("/")
+
+
+@dataclass(frozen=True)
+class RotaDispositivo:
+    dispositivo_id: UUID
+    tipo: str
+    lugar_id: UUID
+    umidade_minima: Optional[float]
+    umidade_maxima: Optional[float]
+    criado_em: Optional[datetime] = None
+
+    def antiguidade(self) -> Tuple[datetime, UUID]:
+        # dois dispositivos com o mesmo base_topic: o menor fica com o tópico
+        return (self.criado_em or datetime.min, self.dispositivo_id)
+
+
+def base_topic_de(tipo: Optional[str], config: Optional[Dict[str, Any]]) -> Optional[str]:
+    base = extrair_base_topic(config)
+    if base:
+        return base
+    # umidificador 3P sem tópico configurado usa os tópicos fixos da raiz
+    if tipo == "umidificador_3p":
+        return MQTT_TOPIC_ROOT
+    return None
+
+
+def expressao_base_topic():
+    """A mesma regra de `base_topic_de`, em SQL (para checar duplicados no banco)."""
+    def _valor(chave: str):
+        return func.nullif(func.btrim(Dispositivo.config[("mqtt", chave)].astext), "")
+
+    configurado = func.rtrim(func.coalesce(_valor("topic"), _valor("baseTopic")), "/")
+    return case(
+        (configurado.isnot(None), configurado),
+        (Dispositivo.tipo == "umidificador_3p", MQTT_TOPIC_ROOT),
+        else_=None,
+    )
+
+
+def _base_topic_do_dispositivo(dispositivo: Dispositivo) -> Optional[str]:
+    return base_topic_de(dispositivo.tipo, dispositivo.config)
+
+
+def _rota_do_dispositivo(dispositivo: Dispositivo) -> RotaDispositivo:
+    umid_min, umid_max = faixa_umidade(dispositivo.config)
+    return RotaDispositivo(
+        dispositivo_id=dispositivo.id,
+        tipo=dispositivo.tipo,
+        lugar_id=dispositivo.lugar_id,
+        umidade_minima=umid_min,
+        umidade_maxima=umid_max,
+        criado_em=dispositivo.criado_em,
+    )
+
+
+class IndiceRoteamento:
+    """
+    Tabela em memória base_topic -> dispositivo, usada no caminho quente da
+    ingestão no lugar da busca por config->'mqtt' (JSONB sem índice) a cada mensagem.
+
+    É carregada no startup e mantida pelas rotas de dispositivos
+    (criar / atualizar / mudar-lugar / excluir). Como é local ao processo,
+    uma recarga periódica (ROTEAMENTO_REFRESH_S) cobre alterações feitas por
+    outros processos.
+    """
+
+    def __init__(self):
+        self._por_topico: Dict[str, RotaDispositivo] = {}
+        self._topico_por_id: Dict[UUID, str] = {}
+        self._lock = threading.Lock()
+        # alterações das rotas feitas durante cada `carregar` em andamento
+        # (reaplicadas por cima do snapshot, que pode ter sido lido antes delas)
+        self._diarios: List[List[Tuple[UUID, Optional[str], Optional[RotaDispositivo]]]] = []
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._contadores = {"hits": 0, "misses": 0, "refreshes": 0, "atualizacoes": 0}
+
+    # ========= Leitura (caminho quente) =========
+
+    def buscar(self, base_topic: str) -> Optional[RotaDispositivo]:
+        with self._lock:
+            rota = self._por_topico.get(base_topic)
+            self._contadores["hits" if rota else "misses"] += 1
+        return rota
+
+    def buscar_por_id(self, dispositivo_id: UUID) -> Optional[RotaDispositivo]:
+        """
+        Rota de um dispositivo pelo id (usado pelo writer para a faixa alvo
+        dos rollups). Não conta em hits/misses.
+        """
+        with self._lock:
+            base = self._topico_por_id.get(dispositivo_id)
+            return self._por_topico.get(base) if base is not None else None
+
+    # ========= Manutenção =========
+
+    def carregar(self) -> None:
+        """
+        (Re)carrega o índice inteiro a partir dos dispositivos ativos.
+
+        A consulta roda sem o lock; o que as rotas mudarem enquanto isso vai
+        para um diário, reaplicado depois da troca, para a recarga não
+        desfazer um criar / excluir que chegou no meio dela.
+        """
+        diario: List[Tuple[UUID, Optional[str], Optional[RotaDispositivo]]] = []
+        with self._lock:
+            self._diarios.append(diario)
+        try:
+            por_topico, topico_por_id = self._ler_banco()
+        except Exception:
+            with self._lock:
+                self._diarios.remove(diario)
+            raise
+
+        with self._lock:
+            self._diarios.remove(diario)
+            self._por_topico = por_topico
+            self._topico_por_id = topico_por_id
+            for dispositivo_id, base, rota in diario:
+                self._aplicar(dispositivo_id, base, rota)
+            self._contadores["refreshes"] += 1
+
+    def _ler_banco(self) -> Tuple[Dict[str, RotaDispositivo], Dict[UUID, str]]:
+        db = SessionIngestao()
+        try:
+            dispositivos = (
+                db.query(Dispositivo)
+                .filter(Dispositivo.ativo == True)
+                .order_by(Dispositivo.criado_em.asc(), Dispositivo.id.asc())
+                .all()
+            )
+
+            por_topico: Dict[str, RotaDispositivo] = {}
+            topico_por_id: Dict[UUID, str] = {}
+            for dispositivo in dispositivos:
+                base = _base_topic_do_dispositivo(dispositivo)
+                if not base or base in por_topico:
+                    # mesmo critério do .first(): o mais antigo fica com o tópico
+                    continue
+                por_topico[base] = _rota_do_dispositivo(dispositivo)
+                topico_por_id[dispositivo.id] = base
+        finally:
+            db.close()
+        return por_topico, topico_por_id
+
+    def _aplicar(self, dispositivo_id: UUID, base: Optional[str], rota: Optional[RotaDispositivo]) -> None:
+        # chamado com self._lock; base/rota None = dispositivo sai do índice
+        antigo = self._topico_por_id.pop(dispositivo_id, None)
+        if antigo is not None:
+            self._por_topico.pop(antigo, None)
+
+        if base and rota is not None:
+            anterior = self._por_topico.get(base)
+            if anterior is None or rota.antiguidade() < anterior.antiguidade():
+                if anterior is not None:
+                    self._topico_por_id.pop(anterior.dispositivo_id, None)
+                self._por_topico[base] = rota
+                self._topico_por_id[dispositivo_id] = base
+
+    def _registrar(self, dispositivo_id: UUID, base: Optional[str], rota: Optional[RotaDispositivo]) -> None:
+        with self._lock:
+            self._aplicar(dispositivo_id, base, rota)
+            for diario in self._diarios:
+                diario.append((dispositivo_id, base, rota))
+            self._contadores["atualizacoes"] += 1
+
+    def atualizar_dispositivo(self, dispositivo: Dispositivo) -> None:
+        """
+        Reflete no índice o estado atual (já commitado) de um dispositivo.
+        Se outro dispositivo já tem o base_topic, vale a regra do `carregar`:
+        o mais antigo fica com ele (as rotas recusam duplicados, mas o banco
+        pode ter dados de antes disso).
+        """
+        base = _base_topic_do_dispositivo(dispositivo) if dispositivo.ativo else None
+        self._registrar(dispositivo.id, base, _rota_do_dispositivo(dispositivo) if base else None)
+
+    def remover_dispositivo(self, dispositivo_id: UUID) -> None:
+        self._registrar(dispositivo_id, None, None)
+
+    def iniciar_refresh_periodico(self, intervalo_s: int) -> None:
+        if intervalo_s <= 0 or self._refresh_thread is not None:
+            return
+
+        def _loop():
+            evento = threading.Event()
+            while not evento.wait(intervalo_s):
+                try:
+                    self.carregar()
+                except Exception as e:
+                    print(f"[ROTEAMENTO] Erro ao recarregar índice: {e}")
+
+        self._refresh_thread = threading.Thread(target=_loop, name="roteamento-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._contadores)
+            stats["topicos"] = len(self._por_topico)
+        return stats
+
+
+indice_roteamento = IndiceRoteamento()
@@ -0,0 +1,46 @@
+"""
+Requests direto no app ASGI, sem rede nem cliente HTTP: os benchmarks de API
+medem só o FastAPI + dependências + rota.
+"""
+from typing import Iterable, Optional, Tuple
+
+
+async def requisitar(
+    app,
+    metodo: str,
+    caminho: str,
+    headers: Optional[Iterable[Tuple[str, str]]] = None,
+    corpo: bytes = b"",
+) -> int:
+    """Faz um request e devolve o status da resposta (o corpo é descartado)."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": metodo,
+        "scheme": "http",
+        "path": caminho,
+        "raw_path": caminho.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")] + [(k.lower().encode(), v.encode()) for k, v in (headers or [])],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    status = 0
+    enviado = False
+
+    async def receive():
+        nonlocal enviado
+        if enviado:
+            return {"type": "http.disconnect"}
+        enviado = True
+        return {"type": "http.request", "body": corpo, "more_body": False}
+
+    async def send(mensagem):
+        nonlocal status
+        if mensagem["type"] == "http.response.start":
+            status = mensagem["status"]
+
+    await app(scope, receive, send)
+    return status
@@ -0,0 +1,115 @@
+"""
+Benchmark da autenticação: requests/s em uma rota autenticada que não faz nada.
+
+Compara, com o mesmo token:
+  - "antes": python-jose + consulta do usuário a cada request (caches desligados)
+  - "jose + caches": python-jose, com cache de tokens e de usuários
+  - "hmac": verificação direta com hmac da stdlib, sem caches
+  - "hmac + caches": o padrão (AUTH_JWT_RAPIDO + cache_tokens + cache_usuarios)
+e, isoladamente, decodificações/s do python-jose x verificação direta.
+
+Os requests vão direto no app ASGI (sem rede nem cliente HTTP), então o
+número mede o custo do FastAPI + dependências de autenticação.
+
+Precisa de um Postgres de testes em DATABASE_URL (o usuário do token é
+buscado no banco quando não está no cache). Cria um usuário/lugar/dispositivo
+temporários e apaga tudo no final.
+
+Uso (a partir de "1. backend"):
+    python -m benchmarks.bench_auth --requests 5000 --concorrencia 8
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import Depends, FastAPI
+from jose import jwt
+
+from app.core.cache_usuarios import UsuarioAutenticado, cache_usuarios
+from app.core.config import settings
+from app.core.deps import get_usuario_logado
+from app.core.security import _decodificar_hmac, cache_tokens, criar_token_acesso
+from app.db.session import SessionLocal
+from app.models.lugar import Lugar
+from benchmarks.asgi import requisitar
+from benchmarks.fixtures import criar_fixture, remover_fixture
+
+app = FastAPI()
+
+
+@app.get("/noop")
+def noop(usuario: UsuarioAutenticado = Depends(get_usuario_logado)):
+    return {"ok": True}
+
+
+async def _rodar(token: str, qtd: int, concorrencia: int) -> float:
+    restantes = iter(range(qtd))
+
+    async def cliente():
+        for _ in restantes:
+            status = await requisitar(app, "GET", "/noop", [("Authorization", f"Bearer {token}")])
+            if status != 200:
+                raise SystemExit(f"rota autenticada respondeu {status}")
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concorrencia)))
+    return qtd / (time.perf_counter() - inicio)
+
+
+def configurar(jwt_rapido: bool, caches: bool) -> None:
+    settings.AUTH_JWT_RAPIDO = jwt_rapido
+    cache_tokens.max_itens = settings.AUTH_CACHE_TOKENS_MAX if caches else 0
+    cache_usuarios.max_itens = settings.AUTH_CACHE_USUARIOS_MAX if caches else 0
+    cache_tokens.limpar()
+    cache_usuarios.limpar()
+
+
+def decodificacoes_por_s(funcao, token: str, qtd: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(qtd):
+        funcao(token)
+    return qtd / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--decodificacoes", type=int, default=50000)
+    args = parser.parse_args()
+
+    dispositivos = criar_fixture(1)
+    try:
+        db = SessionLocal()
+        try:
+            usuario_id = db.query(Lugar.usuario_id).filter(Lugar.id == dispositivos[0].lugar_id).scalar()
+        finally:
+            db.close()
+        token = criar_token_acesso(sub=str(usuario_id), extra={"role": "CLIENTE"})
+
+        jose = decodificacoes_por_s(
+            lambda t: jwt.decode(t, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]), token, args.decodificacoes
+        )
+        direto = decodificacoes_por_s(_decodificar_hmac, token, args.decodificacoes)
+        print(f"decodificação python-jose: {jose:12,.0f} /s")
+        print(f"decodificação hmac       : {direto:12,.0f} /s  ({direto / jose:.1f}x)")
+
+        antes = None
+        for nome, jwt_rapido, caches in (
+            ("antes", False, False),
+            ("jose + caches", False, True),
+            ("hmac", True, False),
+            ("hmac + caches", True, True),
+        ):
+            configurar(jwt_rapido, caches)
+            asyncio.run(_rodar(token, min(200, args.requests), args.concorrencia))   # aquecimento
+            rps = asyncio.run(_rodar(token, args.requests, args.concorrencia))
+            antes = antes or rps
+            print(f"{nome:<14}: {rps:10,.0f} req/s  ({rps / antes:.1f}x)")
+    finally:
+        configurar(True, True)
+        remover_fixture(dispositivos)
+
+
+if __name__ == "__main__":
+    main()
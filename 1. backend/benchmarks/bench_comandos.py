@@ -0,0 +1,75 @@
+"""
+Benchmark do envio de comandos em lote: um por um x publicar_varios.
+
+Publica --dispositivos comandos QoS 1 no broker de MQTT_BROKER_HOST, em
+tópicos descartáveis (bench-sial/<execução>/<n>/comando), de dois jeitos:
+  - "um por um": publicar + espera do PUBACK a cada comando (como N chamadas
+    de POST /dispositivos/{id}/comando?aguardar_ack=true)
+  - "lote": publicador_mqtt.publicar_varios com um prazo único para os acks
+    (o que POST /dispositivos/comandos faz)
+Mostra comandos/s, confirmados e as métricas do publicador.
+
+Precisa só do broker (não usa banco).
+
+Uso (a partir de "1. backend"):
+    python -m benchmarks.bench_comandos --dispositivos 2000
+"""
+import argparse
+import time
+import uuid
+
+from app.services.mqtt_publisher import publicador_mqtt
+
+
+def esperar_conexao(timeout: float) -> None:
+    prazo = time.monotonic() + timeout
+    while not publicador_mqtt.estatisticas()["conectado"]:
+        if time.monotonic() > prazo:
+            raise SystemExit("sem conexão com o broker MQTT")
+        time.sleep(0.1)
+
+
+def um_por_um(mensagens, timeout: float):
+    confirmados = 0
+    inicio = time.perf_counter()
+    for topic, payload in mensagens:
+        try:
+            publicador_mqtt.publicar(topic, payload, aguardar_ack=True, timeout_s=timeout)
+            confirmados += 1
+        except Exception:
+            pass
+    return time.perf_counter() - inicio, confirmados
+
+
+def lote(mensagens, timeout: float):
+    inicio = time.perf_counter()
+    resultados = publicador_mqtt.publicar_varios(mensagens, aguardar_ack=True, timeout_s=timeout)
+    duracao = time.perf_counter() - inicio
+    return duracao, sum(1 for r in resultados if not isinstance(r, Exception))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dispositivos", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=30.0, help="prazo dos acks (s)")
+    args = parser.parse_args()
+
+    execucao = uuid.uuid4().hex[:8]
+    mensagens = [(f"bench-sial/{execucao}/{n}/comando", "desligar") for n in range(args.dispositivos)]
+
+    publicador_mqtt.iniciar()
+    try:
+        esperar_conexao(10)
+        for nome, funcao in (("um por um", um_por_um), ("lote", lote)):
+            duracao, confirmados = funcao(mensagens, args.timeout)
+            print(
+                f"{nome:<9}: {len(mensagens) / duracao:10,.0f} comandos/s  "
+                f"({confirmados}/{len(mensagens)} confirmados em {duracao:.2f}s)"
+            )
+        print(f"publicador: {publicador_mqtt.estatisticas()}")
+    finally:
+        publicador_mqtt.encerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark do resumo do dashboard: latência p50 / p99 de GET /dashboard/resumo.
+
+Cria --clientes clientes, um lugar cada, e --dispositivos dispositivos
+espalhados entre eles (metade online), e compara, para o admin e para
+clientes sorteados:
+  - "antes": os count() separados, um por contador (como era)
+  - "uma consulta": o resumo numa consulta só, sem cache
+  - "uma consulta + cache": a rota de verdade (cache por tenant)
+
+Precisa de um Postgres de testes em DATABASE_URL. Apaga tudo no final.
+
+Uso (a partir de "1. backend"):
+    python -m benchmarks.bench_dashboard --clientes 1000 --dispositivos 10000 --requests 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.api import dashboard
+from app.core.cache_usuarios import UsuarioAutenticado
+from app.core.config import settings
+from app.core.deps import get_db, get_usuario_logado
+from app.core.security import criar_token_acesso
+from app.db.session import SessionLocal
+from app.models.dispositivo import Dispositivo
+from app.models.lugar import Lugar
+from app.models.usuario import Usuario
+from app.schemas.dashboard import ResumoDashboard
+from app.services.cache_dashboard import cache_dashboard
+from benchmarks.asgi import requisitar
+
+app = FastAPI()
+app.include_router(dashboard.router)
+
+
+@app.get("/resumo-antes", response_model=ResumoDashboard)
+def resumo_antes(db: Session = Depends(get_db), usuario_logado: UsuarioAutenticado = Depends(get_usuario_logado)):
+    """O resumo como era: um count() por contador."""
+    is_admin = (usuario_logado.role or "").upper() == "ADMIN"
+    q_lugares = db.query(func.count(Lugar.id)).filter(Lugar.ativo == True)
+    q_disp_on = db.query(func.count(Dispositivo.id)).filter(Dispositivo.ativo == True, Dispositivo.status == "online")
+    q_disp_off = db.query(func.count(Dispositivo.id)).filter(Dispositivo.ativo == True, Dispositivo.status != "online")
+    if not is_admin:
+        q_lugares = q_lugares.filter(Lugar.usuario_id == usuario_logado.id)
+        q_disp_on = q_disp_on.join(Lugar, Lugar.id == Dispositivo.lugar_id).filter(Lugar.usuario_id == usuario_logado.id)
+        q_disp_off = q_disp_off.join(Lugar, Lugar.id == Dispositivo.lugar_id).filter(Lugar.usuario_id == usuario_logado.id)
+        clientes_ativos = 1
+    else:
+        clientes_ativos = db.query(func.count(Usuario.id)).filter(
+            Usuario.ativo == True, func.lower(Usuario.role) == "cliente"
+        ).scalar()
+    return ResumoDashboard(
+        clientes_ativos=clientes_ativos or 0,
+        lugares_ativos=q_lugares.scalar() or 0,
+        dispositivos_online=q_disp_on.scalar() or 0,
+        dispositivos_offline=q_disp_off.scalar() or 0,
+    )
+
+
+def criar_dados(qtd_clientes: int, qtd_dispositivos: int):
+    execucao = uuid.uuid4().hex[:8]
+    usuarios = [
+        {
+            "id": uuid.uuid4(), "nome": f"bench-{i}", "email": f"bench-dash-{execucao}-{i}@bench.local",
+            "senha_hash": "-", "role": "CLIENTE" if i else "ADMIN", "ativo": True,
+        }
+        for i in range(qtd_clientes + 1)    # o primeiro é o admin
+    ]
+    lugares = [
+        {
+            "id": uuid.uuid4(), "nome": "bench", "cep": "-", "rua": "-", "numero": "-", "bairro": "-",
+            "cidade": "-", "estado": "-", "usuario_id": u["id"], "ativo": True,
+        }
+        for u in usuarios[1:]
+    ]
+    dispositivos = [
+        {
+            "id": uuid.uuid4(), "nome": f"bench-{i}", "lugar_id": lugares[i % len(lugares)]["id"],
+            "tipo": "tomada_inteligente", "status": "online" if i % 2 else "offline", "ativo": True,
+        }
+        for i in range(qtd_dispositivos)
+    ]
+    db = SessionLocal()
+    try:
+        db.execute(insert(Usuario), usuarios)
+        db.execute(insert(Lugar), lugares)
+        db.execute(insert(Dispositivo), dispositivos)
+        db.commit()
+    finally:
+        db.close()
+    return usuarios, lugares, dispositivos
+
+
+def remover_dados(usuarios, lugares, dispositivos) -> None:
+    db = SessionLocal()
+    try:
+        db.query(Dispositivo).filter(Dispositivo.id.in_([d["id"] for d in dispositivos])).delete(synchronize_session=False)
+        db.query(Lugar).filter(Lugar.id.in_([lg["id"] for lg in lugares])).delete(synchronize_session=False)
+        db.query(Usuario).filter(Usuario.id.in_([u["id"] for u in usuarios])).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def medir(caminho: str, tokens, qtd: int, concorrencia: int):
+    restantes = iter(range(qtd))
+    latencias = []
+
+    async def cliente():
+        for n in restantes:
+            t0 = time.perf_counter()
+            status = await requisitar(app, "GET", caminho, [("Authorization", f"Bearer {tokens[n % len(tokens)]}")])
+            latencias.append(time.perf_counter() - t0)
+            if status != 200:
+                raise SystemExit(f"{caminho} respondeu {status}")
+
+    await asyncio.gather(*(cliente() for _ in range(concorrencia)))
+    return latencias
+
+
+def percentil(valores, p: float) -> float:
+    if len(valores) < 2:
+        return valores[0] if valores else 0.0
+    return statistics.quantiles(valores, n=100)[int(p) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, default=1000)
+    parser.add_argument("--dispositivos", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    args = parser.parse_args()
+
+    usuarios, lugares, dispositivos = criar_dados(args.clientes, args.dispositivos)
+    try:
+        admin = [criar_token_acesso(sub=str(usuarios[0]["id"]), extra={"role": "ADMIN"})]
+        sorteados = random.Random(42).sample(usuarios[1:], min(200, args.clientes))
+        clientes = [criar_token_acesso(sub=str(u["id"]), extra={"role": "CLIENTE"}) for u in sorteados]
+        print(f"{args.clientes} clientes, {args.dispositivos} dispositivos, {args.requests} requests por cenário")
+
+        for nome, caminho, cache in (
+            ("antes", "/resumo-antes", False),
+            ("uma consulta", "/dashboard/resumo", False),
+            ("uma consulta + cache", "/dashboard/resumo", True),
+        ):
+            cache_dashboard.max_itens = settings.DASHBOARD_CACHE_MAX if cache else 0
+            cache_dashboard.limpar()
+            for papel, tokens in (("admin", admin), ("cliente", clientes)):
+                asyncio.run(medir(caminho, tokens, min(100, args.requests), args.concorrencia))   # aquecimento
+                lat = asyncio.run(medir(caminho, tokens, args.requests, args.concorrencia))
+                print(
+                    f"{nome:<21} {papel:<8}: p50 {percentil(lat, 50) * 1000:7.2f} ms  "
+                    f"p99 {percentil(lat, 99) * 1000:7.2f} ms"
+                )
+        print(f"cache: {cache_dashboard.estatisticas()}")
+    finally:
+        cache_dashboard.max_itens = settings.DASHBOARD_CACHE_MAX
+        remover_dados(usuarios, lugares, dispositivos)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark de ingestão: mensagens/s no modo "thread" x modo "async".
+
+Um "broker" falso injeta N mensagens de umidade, o mais rápido possível,
+direto no ponto de entrada de cada modo (callback do paho no modo thread,
+`IngestorAsync.processar` no modo async). O tempo medido vai da primeira
+mensagem até o writer terminar de gravar tudo no banco.
+
+Precisa de um Postgres de testes em DATABASE_URL (e asyncpg para o modo async).
+Cria um usuário/lugar/dispositivos temporários e apaga tudo no final.
+
+Uso (a partir de "1. backend"):
+    python -m benchmarks.bench_ingestao --mensagens 50000 --dispositivos 200
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services import mqtt_ingestor
+from app.services.leitura_writer import leitura_writer
+from app.services.mqtt_ingestor_async import IngestorAsync
+from benchmarks.fixtures import TOPIC_BENCH, criar_fixture, remover_fixture
+
+
+def mensagens(qtd: int, qtd_dispositivos: int):
+    for i in range(qtd):
+        topic = f"{TOPIC_BENCH}/dev{i % qtd_dispositivos}/umidade"
+        yield topic, f"{50 + (i % 300) / 10:.1f}".encode()
+
+
+def bench_thread(qtd: int, qtd_dispositivos: int) -> float:
+    leitura_writer.iniciar()
+    mqtt_ingestor._despachante.iniciar()
+
+    inicio = time.perf_counter()
+    for topic, payload in mensagens(qtd, qtd_dispositivos):
+        mqtt_ingestor._on_message(None, None, SimpleNamespace(topic=topic, payload=payload))
+    mqtt_ingestor._despachante.parar()
+    leitura_writer.parar()
+    return time.perf_counter() - inicio
+
+
+async def bench_async(qtd: int, qtd_dispositivos: int) -> float:
+    ingestor = IngestorAsync(
+        tamanho_lote=settings.INGEST_FLUSH_SIZE,
+        intervalo_flush_ms=settings.INGEST_FLUSH_INTERVAL_MS,
+        tamanho_fila=settings.INGEST_QUEUE_MAXSIZE,
+    )
+    await ingestor.iniciar(conectar=False)
+
+    inicio = time.perf_counter()
+    for topic, payload in mensagens(qtd, qtd_dispositivos):
+        await ingestor.processar(topic, payload)
+    await ingestor.parar()
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mensagens", type=int, default=50000)
+    parser.add_argument("--dispositivos", type=int, default=200)
+    parser.add_argument("--modos", default="thread,async")
+    args = parser.parse_args()
+
+    dispositivos = criar_fixture(args.dispositivos)
+    try:
+        for modo in args.modos.split(","):
+            if modo == "thread":
+                duracao = bench_thread(args.mensagens, args.dispositivos)
+            elif modo == "async":
+                duracao = asyncio.run(bench_async(args.mensagens, args.dispositivos))
+            else:
+                raise SystemExit(f"modo desconhecido: {modo}")
+            print(
+                f"{modo:>6}: {args.mensagens} mensagens em {duracao:.2f}s "
+                f"-> {args.mensagens / duracao:,.0f} msg/s"
+            )
+    finally:
+        remover_fixture(dispositivos)
+
+
+if __name__ == "__main__":
+    main()
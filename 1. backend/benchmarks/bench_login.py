@@ -0,0 +1,130 @@
+"""
+Teste de carga de logins simultâneos: bcrypt no threadpool x no pool de senhas.
+
+Dispara --logins logins com --concorrencia clientes ao mesmo tempo e, em
+paralelo, um cliente que chama uma rota síncrona trivial (/ping) para medir
+quanto o resto da API sofre durante a rajada. Dois cenários:
+  - "antes": login síncrono com o bcrypt na thread do request (como era)
+  - "pool": POST /api/auth/login (bcrypt no pool de processos)
+Mostra logins/s, recusas (503), latência do /ping (p50 / p99) e as
+métricas do pool de senhas.
+
+Precisa de um Postgres de testes em DATABASE_URL (e python-multipart, para o
+formulário do login). Cria um usuário/lugar/dispositivo temporários e apaga
+tudo no final.
+
+Uso (a partir de "1. backend"):
+    python -m benchmarks.bench_login --logins 200 --concorrencia 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlencode
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.orm import Session
+
+from app.api import auth
+from app.core.deps import get_db
+from app.core.pool_senhas import PoolSenhasOcupado, pool_senhas
+from app.core.security import criar_token_acesso, gerar_hash_senha, verificar_senha
+from app.db.session import SessionLocal
+from app.main import pool_senhas_ocupado
+from app.models.lugar import Lugar
+from app.models.usuario import Usuario
+from benchmarks.asgi import requisitar
+from benchmarks.fixtures import criar_fixture, remover_fixture
+
+SENHA = "senha-do-bench"
+
+app = FastAPI()
+app.include_router(auth.router)
+app.add_exception_handler(PoolSenhasOcupado, pool_senhas_ocupado)
+
+
+@app.post("/login-antes")
+def login_antes(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    """O login como era: consulta + bcrypt na thread do request."""
+    usuario = db.query(Usuario).filter(Usuario.email == form_data.username).first()
+    if not usuario or not verificar_senha(form_data.password, usuario.senha_hash):
+        raise HTTPException(status_code=401, detail="Credenciais inválidas")
+    return {"access_token": criar_token_acesso(sub=str(usuario.id)), "token_type": "bearer"}
+
+
+@app.get("/ping")
+def ping():
+    return {"ok": True}
+
+
+async def rajada(caminho: str, email: str, qtd: int, concorrencia: int):
+    corpo = urlencode({"username": email, "password": SENHA}).encode()
+    headers = [("Content-Type", "application/x-www-form-urlencoded")]
+    restantes = iter(range(qtd))
+    status = {}
+    latencias_ping = []
+    terminou = asyncio.Event()
+
+    async def cliente():
+        for _ in restantes:
+            s = await requisitar(app, "POST", caminho, headers, corpo)
+            status[s] = status.get(s, 0) + 1
+
+    async def sonda():
+        while not terminou.is_set():
+            t0 = time.perf_counter()
+            await requisitar(app, "GET", "/ping")
+            latencias_ping.append(time.perf_counter() - t0)
+            await asyncio.sleep(0.01)
+
+    tarefa_sonda = asyncio.create_task(sonda())
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    terminou.set()
+    await tarefa_sonda
+    return duracao, status, latencias_ping
+
+
+def percentil(valores, p: float) -> float:
+    if len(valores) < 2:
+        return valores[0] if valores else 0.0
+    return statistics.quantiles(valores, n=100)[int(p) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=50)
+    args = parser.parse_args()
+
+    dispositivos = criar_fixture(1)
+    try:
+        db = SessionLocal()
+        try:
+            usuario_id = db.query(Lugar.usuario_id).filter(Lugar.id == dispositivos[0].lugar_id).scalar()
+            usuario = db.query(Usuario).get(usuario_id)
+            usuario.senha_hash = gerar_hash_senha(SENHA)
+            email = usuario.email
+            db.commit()
+        finally:
+            db.close()
+
+        print(f"bcrypt custo {pool_senhas.custo}, pool com {pool_senhas.workers} processos e fila de {pool_senhas.fila_max}")
+        for nome, caminho in (("antes", "/login-antes"), ("pool", "/api/auth/login")):
+            asyncio.run(rajada(caminho, email, pool_senhas.workers, 1))   # aquecimento (sobe o pool)
+            duracao, status, ping = asyncio.run(rajada(caminho, email, args.logins, args.concorrencia))
+            ok = status.get(200, 0)
+            print(
+                f"{nome:<6}: {ok / duracao:7.1f} logins/s  status {dict(sorted(status.items()))}  "
+                f"/ping p50 {percentil(ping, 50) * 1000:7.1f} ms  p99 {percentil(ping, 99) * 1000:7.1f} ms"
+            )
+        print(f"pool de senhas: {pool_senhas.estatisticas()}")
+    finally:
+        pool_senhas.encerrar()
+        remover_fixture(dispositivos)
+
+
+if __name__ == "__main__":
+    main()
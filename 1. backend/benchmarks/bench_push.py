@@ -0,0 +1,135 @@
+"""
+Benchmark do push do estado ao vivo: N assinantes simultâneos num processo.
+
+Uma thread faz o papel da ingestão e atualiza o estado ao vivo de
+--dispositivos dispositivos a --taxa mensagens/s (estado_dispositivos.atualizar,
+o mesmo ponto que o writer chama). --assinantes conexões, cada uma
+acompanhando --por-assinante dispositivos, consomem pelo hub de push e
+formatam os eventos SSE como a rota /leituras/stream. Uma fração
+(--lentos) demora --atraso-lento-ms para ler cada rodada.
+
+Mostra eventos entregues/s, latência (mensagem -> evento formatado) dos
+assinantes rápidos e lentos, e quantas atualizações foram juntadas
+(coalescência) ou descartadas.
+
+Não precisa de banco nem de broker.
+
+Uso (a partir de "1. backend"):
+    python -m benchmarks.bench_push --assinantes 2000 --dispositivos 500 --taxa 2000 --segundos 10
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from app.services.estado_dispositivos import estado_dispositivos
+from app.services.leitura_writer import nova_leitura
+from app.services.push_leituras import formatar_evento, hub_push
+
+
+def ingestao(ids, taxa: int, parar: threading.Event) -> int:
+    enviados = 0
+    intervalo = 1.0 / taxa
+    proximo = time.perf_counter()
+    while not parar.is_set():
+        dispositivo_id = ids[enviados % len(ids)]
+        estado_dispositivos.atualizar(
+            nova_leitura(dispositivo_id, {"umidade": 40 + (enviados % 300) / 10}, datetime.utcnow())
+        )
+        enviados += 1
+        proximo += intervalo
+        espera = proximo - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+    return enviados
+
+
+async def assinante(ids, lento: bool, atraso_s: float, latencias, fim: float) -> int:
+    assinatura = hub_push.assinar(ids)
+    eventos = 0
+    try:
+        loop = asyncio.get_running_loop()
+        while loop.time() < fim:
+            estados = await assinatura.proximos(0.5)
+            agora = datetime.utcnow()
+            "".join(formatar_evento(e) for e in estados)    # o que a rota SSE faz com cada rodada
+            for e in estados:
+                latencias.append((agora - e.visto_em).total_seconds())
+            eventos += len(estados)
+            if lento and estados:
+                await asyncio.sleep(atraso_s)
+    finally:
+        hub_push.cancelar(assinatura)
+    return eventos
+
+
+def percentil(valores, p: float) -> float:
+    if len(valores) < 2:
+        return valores[0] if valores else 0.0
+    return statistics.quantiles(valores, n=100)[int(p) - 1]
+
+
+async def rodar(args) -> None:
+    ids = [uuid.uuid4() for _ in range(args.dispositivos)]
+    rnd = random.Random(42)
+    qtd_lentos = int(args.assinantes * args.lentos)
+    lat_rapidos, lat_lentos = [], []
+
+    hub_push.max_conexoes = max(hub_push.max_conexoes, args.assinantes)
+    fim = asyncio.get_running_loop().time() + args.segundos
+    tarefas = [
+        assinante(
+            rnd.sample(ids, min(args.por_assinante, len(ids))),
+            i < qtd_lentos,
+            args.atraso_lento_ms / 1000,
+            lat_lentos if i < qtd_lentos else lat_rapidos,
+            fim,
+        )
+        for i in range(args.assinantes)
+    ]
+
+    parar = threading.Event()
+    resultado = {}
+    produtor = threading.Thread(target=lambda: resultado.setdefault("enviados", ingestao(ids, args.taxa, parar)))
+    inicio = time.perf_counter()
+    produtor.start()
+    eventos = await asyncio.gather(*tarefas)
+    parar.set()
+    produtor.join()
+    duracao = time.perf_counter() - inicio
+
+    stats = hub_push.estatisticas()
+    print(f"{args.assinantes} assinantes ({qtd_lentos} lentos), {args.dispositivos} dispositivos, {args.segundos}s")
+    print(f"mensagens ingeridas : {resultado['enviados'] / duracao:10,.0f} /s")
+    print(f"eventos entregues   : {sum(eventos) / duracao:10,.0f} /s")
+    print(
+        f"latência rápidos    : p50 {percentil(lat_rapidos, 50) * 1000:7.1f} ms  "
+        f"p99 {percentil(lat_rapidos, 99) * 1000:7.1f} ms"
+    )
+    if lat_lentos:
+        print(
+            f"latência lentos     : p50 {percentil(lat_lentos, 50) * 1000:7.1f} ms  "
+            f"p99 {percentil(lat_lentos, 99) * 1000:7.1f} ms"
+        )
+    print(f"juntadas (coalescidas): {stats['coalescidas']:,}   descartadas: {stats['descartadas']:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assinantes", type=int, default=2000)
+    parser.add_argument("--dispositivos", type=int, default=500)
+    parser.add_argument("--por-assinante", type=int, default=20)
+    parser.add_argument("--taxa", type=int, default=2000, help="mensagens/s da ingestão simulada")
+    parser.add_argument("--segundos", type=int, default=10)
+    parser.add_argument("--lentos", type=float, default=0.1, help="fração de assinantes lentos")
+    parser.add_argument("--atraso-lento-ms", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(rodar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Benchmark do relatório de umidade sobre um histórico sintético de um dispositivo.
+
+Compara, no mesmo período:
+  - "python": o caminho antigo (todas as linhas trazidas + laço em Python)
+  - "sql": uma agregação SQL sobre o histórico bruto (RELATORIOS_USAR_ROLLUPS=False)
+  - "rollups": rollups 1d/1h/1m + bruto só nas pontas (padrão)
+a série de umidade completa x reduzida a --max-pontos, e o CSV em streaming
+(tempo até o primeiro pedaço, tempo total e pico de memória). Confere que
+as métricas dos três caminhos batem.
+
+Precisa de um Postgres de testes em DATABASE_URL. As leituras são geradas
+direto no banco (generate_series) e os rollups reconstruídos a partir delas.
+Cria um usuário/lugar/dispositivo temporários e apaga tudo no final.
+
+Uso (a partir de "1. backend"):
+    python -m benchmarks.bench_relatorio --linhas 1000000 --dias 30 --max-pontos 1000
+"""
+import argparse
+import math
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.db.session import SessionLocal
+from app.models.leitura import Leitura
+from app.services.relatorio_csv import comprimir_gzip, csv_relatorio_dispositivo
+from app.services.relatorio_service import agregar_umidade, serie_umidade
+from app.services.rollups_leituras import reconstruir_rollups
+from benchmarks.fixtures import criar_fixture, remover_fixture
+
+FAIXA = (45.0, 65.0)
+
+
+def carregar_historico(dispositivo_id, linhas: int, inicio: datetime, dias: int) -> None:
+    passo_s = dias * 86400 / linhas
+    db = SessionLocal()
+    try:
+        db.execute(
+            text(
+                """
+                INSERT INTO leituras (dispositivo_id, "timestamp", umidade)
+                SELECT CAST(:dispositivo_id AS uuid),
+                       CAST(:inicio AS timestamp) + make_interval(secs => i * :passo_s),
+                       CASE WHEN i % 50 = 0 THEN NULL ELSE 40 + (i % 300) / 10.0 END
+                FROM generate_series(0, :linhas - 1) AS i
+                """
+            ),
+            {"dispositivo_id": str(dispositivo_id), "inicio": inicio, "passo_s": passo_s, "linhas": linhas},
+        )
+        reconstruir_rollups(db, dispositivo_id, *FAIXA)
+        db.commit()
+        db.execute(text("ANALYZE leituras"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def metricas_python(db, dispositivo_id, inicio: datetime, fim: datetime):
+    """Mesmo cálculo do relatório antes dos rollups/agregação SQL."""
+    leituras = (
+        db.query(Leitura.timestamp, Leitura.umidade)
+        .filter(
+            Leitura.dispositivo_id == dispositivo_id,
+            Leitura.timestamp >= inicio,
+            Leitura.timestamp <= fim,
+        )
+        .order_by(Leitura.timestamp.asc())
+        .all()
+    )
+    umidades = [u for _, u in leituras if u is not None]
+    dentro = sum(1 for u in umidades if FAIXA[0] <= u <= FAIXA[1])
+    return {
+        "leituras_total": len(leituras),
+        "umidade_count": len(umidades),
+        "umidade_min": min(umidades) if umidades else None,
+        "umidade_max": max(umidades) if umidades else None,
+        "umidade_media": sum(umidades) / len(umidades) if umidades else None,
+        "dentro_faixa": dentro,
+    }
+
+
+def metricas_agregadas(db, dispositivo_id, inicio: datetime, fim: datetime, usar_rollups: bool):
+    a = agregar_umidade(db, {dispositivo_id: FAIXA}, inicio, fim, usar_rollups=usar_rollups)[dispositivo_id]
+    return {
+        "leituras_total": a.leituras_total,
+        "umidade_count": a.umidade_count,
+        "umidade_min": a.umidade_min,
+        "umidade_max": a.umidade_max,
+        "umidade_media": a.umidade_media,
+        "dentro_faixa": a.dentro_faixa,
+    }
+
+
+def medir(funcao, repeticoes: int):
+    melhor = math.inf
+    resultado = None
+    for _ in range(repeticoes):
+        db = SessionLocal()
+        try:
+            t0 = time.perf_counter()
+            resultado = funcao(db)
+            melhor = min(melhor, time.perf_counter() - t0)
+        finally:
+            db.close()
+    return melhor, resultado
+
+
+def medir_csv(dispositivo_id, inicio: datetime, fim: datetime, gzip: bool):
+    pedacos = csv_relatorio_dispositivo({"id": str(dispositivo_id)}, FAIXA, inicio, fim)
+    if gzip:
+        pedacos = comprimir_gzip(pedacos)
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    primeiro = None
+    total_bytes = 0
+    for pedaco in pedacos:
+        if primeiro is None:
+            primeiro = time.perf_counter() - t0
+        total_bytes += len(pedaco)
+    total = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return primeiro, total, total_bytes, pico
+
+
+def conferir(referencia: dict, outro: dict, nome: str) -> None:
+    for chave, valor in referencia.items():
+        if chave == "umidade_media" and valor is not None:
+            ok = math.isclose(valor, outro[chave], rel_tol=1e-9)
+        else:
+            ok = valor == outro[chave]
+        if not ok:
+            raise SystemExit(f"{nome}: {chave} diverge ({outro[chave]} != {valor})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--max-pontos", type=int, default=1000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    inicio_dados = datetime(2026, 1, 1)
+    # período desalinhado de propósito, para exercitar as pontas no bruto
+    inicio = inicio_dados + timedelta(seconds=37, microseconds=250)
+    fim = inicio_dados + timedelta(days=args.dias) - timedelta(seconds=13)
+
+    dispositivos = criar_fixture(1, {"umidadeMinima": FAIXA[0], "umidadeMaxima": FAIXA[1]})
+    dispositivo_id = dispositivos[0].id
+    try:
+        t0 = time.perf_counter()
+        carregar_historico(dispositivo_id, args.linhas, inicio_dados, args.dias)
+        print(f"carga: {args.linhas:,} leituras + rollups em {time.perf_counter() - t0:.1f}s")
+
+        t_py, ref = medir(lambda db: metricas_python(db, dispositivo_id, inicio, fim), args.repeticoes)
+        t_sql, sql = medir(lambda db: metricas_agregadas(db, dispositivo_id, inicio, fim, False), args.repeticoes)
+        t_rol, rol = medir(lambda db: metricas_agregadas(db, dispositivo_id, inicio, fim, True), args.repeticoes)
+        conferir(ref, sql, "sql")
+        conferir(ref, rol, "rollups")
+
+        print(f"métricas  python : {t_py * 1000:9.1f} ms")
+        print(f"métricas  sql    : {t_sql * 1000:9.1f} ms  ({t_py / t_sql:,.0f}x)")
+        print(f"métricas  rollups: {t_rol * 1000:9.1f} ms  ({t_py / t_rol:,.0f}x)")
+        print(f"  ({ref['leituras_total']:,} leituras, {ref['dentro_faixa']:,} dentro da faixa; os três batem)")
+
+        t_cheia, cheia = medir(lambda db: serie_umidade(db, dispositivo_id, inicio, fim), args.repeticoes)
+        t_red, red = medir(
+            lambda db: serie_umidade(db, dispositivo_id, inicio, fim, args.max_pontos), args.repeticoes
+        )
+        print(f"série completa   : {t_cheia * 1000:9.1f} ms  ({len(cheia):,} pontos)")
+        print(f"série reduzida   : {t_red * 1000:9.1f} ms  ({len(red):,} pontos)")
+
+        for gzip in (False, True):
+            primeiro, total, tamanho, pico = medir_csv(dispositivo_id, inicio, fim, gzip)
+            print(
+                f"csv{'.gz' if gzip else '   '} streaming: 1º pedaço em {primeiro * 1000:.1f} ms, "
+                f"total {total:.1f}s, {tamanho / 1e6:.1f} MB, pico de memória {pico / 1e6:.1f} MB"
+            )
+    finally:
+        remover_fixture(dispositivos)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Dados temporários compartilhados pelos benchmarks: um usuário, um lugar e
+N dispositivos (já registrados no índice de roteamento), e a limpeza de tudo
+o que eles geraram (leituras, estado atual e rollups).
+"""
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.db.session import SessionLocal
+from app.models.dispositivo import Dispositivo
+from app.models.leitura import Leitura, LeituraUltima
+from app.models.lugar import Lugar
+from app.models.usuario import Usuario
+from app.services.rollups_leituras import RESOLUCOES
+from app.services.roteamento_dispositivos import indice_roteamento
+
+TOPIC_BENCH = "bench/umidificador"
+
+
+def criar_fixture(qtd_dispositivos: int, config_extra: Optional[Dict[str, Any]] = None) -> List[Dispositivo]:
+    db = SessionLocal()
+    try:
+        usuario = Usuario(
+            nome="bench",
+            email=f"bench-{uuid.uuid4().hex[:8]}@bench.local",
+            senha_hash="-",
+            role="CLIENTE",
+        )
+        db.add(usuario)
+        db.flush()
+
+        lugar = Lugar(
+            nome="bench", cep="-", rua="-", numero="-", bairro="-",
+            cidade="-", estado="-", usuario_id=usuario.id,
+        )
+        db.add(lugar)
+        db.flush()
+
+        dispositivos = []
+        for i in range(qtd_dispositivos):
+            d = Dispositivo(
+                nome=f"bench-{i}",
+                lugar_id=lugar.id,
+                tipo="tomada_inteligente",
+                config={"mqtt": {"baseTopic": f"{TOPIC_BENCH}/dev{i}"}, **(config_extra or {})},
+                ativo=True,
+            )
+            db.add(d)
+            dispositivos.append(d)
+        db.commit()
+
+        for d in dispositivos:
+            db.refresh(d)
+            indice_roteamento.atualizar_dispositivo(d)
+        db.expunge_all()
+        return dispositivos
+    finally:
+        db.close()
+
+
+def remover_fixture(dispositivos: List[Dispositivo]) -> None:
+    ids = [d.id for d in dispositivos]
+    db = SessionLocal()
+    try:
+        lugar_id = dispositivos[0].lugar_id
+        usuario_id = db.query(Lugar.usuario_id).filter(Lugar.id == lugar_id).scalar()
+        for _, _, modelo in RESOLUCOES:
+            db.query(modelo).filter(modelo.dispositivo_id.in_(ids)).delete(synchronize_session=False)
+        db.query(LeituraUltima).filter(LeituraUltima.dispositivo_id.in_(ids)).delete(synchronize_session=False)
+        db.query(Leitura).filter(Leitura.dispositivo_id.in_(ids)).delete(synchronize_session=False)
+        db.query(Dispositivo).filter(Dispositivo.id.in_(ids)).delete(synchronize_session=False)
+        db.query(Lugar).filter(Lugar.id == lugar_id).delete(synchronize_session=False)
+        db.query(Usuario).filter(Usuario.id == usuario_id).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    for i in ids:
+        indice_roteamento.remover_dispositivo(i)